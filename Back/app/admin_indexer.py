@@ -12,11 +12,17 @@ from typing import Dict, List, Tuple, Any
 
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 
 # Add project root to path for config import
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
+# Add rag module to path for the shared embedding backends
+sys.path.insert(0, str(Path(__file__).parent / "rag"))
+
+from embeddings import get_embedding_backend
+from vector_index import build_faiss_index as _build_index, get_index_type
+from index_manifest import write_index_stats, read_index_stats, index_stats_path
+from json_store import get_json_store
 
 try:
     from config import (
@@ -38,13 +44,6 @@ except ImportError:
     DOCUMENTS_METADATA_PATH = os.path.join(DATA_DIR, "documents_metadata.json")
     UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
 
-MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
-# Chemin du modèle pré-chargé sur GCP (même que dans rag.py)
-GCP_MODEL_CACHE_PATH = '/root/.cache/huggingface/hub/models--sentence-transformers--paraphrase-multilingual-MiniLM-L12-v2/snapshots/86741b4e3f5cb7765a600d3a3d55a0f6a6cb443d'
-
-# Cloud Storage bucket name
-GCS_BUCKET = "esilv-chatbot-data"
-
 # Chunking parameters
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 100
@@ -53,29 +52,33 @@ MIN_CHUNK_SIZE = 150
 
 def sync_to_cloud_storage():
     """
-    Synchronize local index files to Cloud Storage using Python SDK
-    This ensures that new instances can access the updated index
+    Synchronize local index files to Cloud Storage
+    Only the segments that changed since the last sync are uploaded (see cloud_sync),
+    so adding a document does not resend the whole index and mapping
     """
     try:
-        from google.cloud import storage
-        
-        client = storage.Client()
-        bucket = client.bucket(GCS_BUCKET)
+        from cloud_sync import push_files
         
-        # Upload faiss_index.bin
-        blob = bucket.blob("data/faiss_index.bin")
-        blob.upload_from_filename(INDEX_PATH)
+        files = {
+            "data/faiss_index.bin": INDEX_PATH,
+            "data/faiss_mapping.json": MAPPING_PATH,
+        }
         
-        # Upload faiss_mapping.json
-        blob = bucket.blob("data/faiss_mapping.json")
-        blob.upload_from_filename(MAPPING_PATH)
+        # Stats manifest read by the admin pages
+        if os.path.exists(index_stats_path(INDEX_PATH)):
+            files["data/faiss_stats.json"] = index_stats_path(INDEX_PATH)
         
         # Upload processed_documents.json if it exists
         if os.path.exists(DOCUMENTS_METADATA_PATH):
-            blob = bucket.blob("data/processed_documents.json")
-            blob.upload_from_filename(DOCUMENTS_METADATA_PATH)
+            files["data/processed_documents.json"] = DOCUMENTS_METADATA_PATH
+        
+        report = push_files(files)
         
-        print("✅ Index synchronisé avec Cloud Storage")
+        print(
+            f"✅ Index synchronisé avec Cloud Storage "
+            f"({len(report['uploaded_files'])} fichier(s), {report['segments_uploaded']} segment(s), "
+            f"{report['bytes_uploaded']} octets envoyés)"
+        )
         return True
     except Exception as e:
         print(f"❌ Erreur lors de la synchronisation avec Cloud Storage: {str(e)}")
@@ -90,23 +93,19 @@ def ensure_data_dir():
 def _load_documents_metadata() -> Dict[str, Any]:
     """Load documents metadata from file"""
     ensure_data_dir()
-    
-    if not os.path.exists(DOCUMENTS_METADATA_PATH):
-        return {}
-    
-    try:
-        with open(DOCUMENTS_METADATA_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return {}
+    return get_json_store(DOCUMENTS_METADATA_PATH).load()
 
 
 def _save_documents_metadata(metadata: Dict[str, Any]):
-    """Save documents metadata to file"""
+    """Save documents metadata to file (atomic write under an inter-process lock)"""
     ensure_data_dir()
-    
-    with open(DOCUMENTS_METADATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    get_json_store(DOCUMENTS_METADATA_PATH).replace(metadata)
+
+
+def _update_documents_metadata(mutate):
+    """Apply a read-modify-write to the metadata file without losing concurrent updates"""
+    ensure_data_dir()
+    return get_json_store(DOCUMENTS_METADATA_PATH).update(mutate)
 
 
 def get_indexed_documents() -> List[Dict[str, Any]]:
@@ -146,8 +145,6 @@ def add_document_metadata(
     Returns:
         The created metadata dictionary
     """
-    metadata = _load_documents_metadata()
-    
     doc_metadata = {
         "id": doc_id,
         "filename": filename,
@@ -158,8 +155,7 @@ def add_document_metadata(
         "status": "indexed"
     }
     
-    metadata[doc_id] = doc_metadata
-    _save_documents_metadata(metadata)
+    _update_documents_metadata(lambda metadata: metadata.__setitem__(doc_id, doc_metadata))
     
     return doc_metadata
 
@@ -174,14 +170,7 @@ def remove_document_metadata(doc_id: str) -> bool:
     Returns:
         True if removed, False if not found
     """
-    metadata = _load_documents_metadata()
-    
-    if doc_id in metadata:
-        del metadata[doc_id]
-        _save_documents_metadata(metadata)
-        return True
-    
-    return False
+    return _update_documents_metadata(lambda metadata: metadata.pop(doc_id, None) is not None)
 
 
 def load_documents(path: str = JSON_PATH) -> Dict[str, str]:
@@ -357,7 +346,8 @@ def chunk_documents(
 
 def make_embeddings(texts: List[str], batch_size: int = 64) -> np.ndarray:
     """
-    Generate embeddings for texts using sentence-transformers
+    Generate embeddings for texts with the configured embedding backend
+    (EMBEDDING_BACKEND: torch or onnx, see rag/embeddings.py)
     
     Args:
         texts: List of texts to embed
@@ -366,43 +356,31 @@ def make_embeddings(texts: List[str], batch_size: int = 64) -> np.ndarray:
     Returns:
         NumPy array of embeddings
     """
-    # Charger le modèle : GCP cache si disponible, sinon HuggingFace
-    if os.path.exists(GCP_MODEL_CACHE_PATH):
-        print("Admin: Chargement du modèle depuis le cache GCP")
-        model = SentenceTransformer(GCP_MODEL_CACHE_PATH)
-    else:
-        print(f"Admin: Chargement du modèle {MODEL_NAME} depuis HuggingFace")
-        model = SentenceTransformer(MODEL_NAME)
+    backend = get_embedding_backend()
+    print(f"Admin: Génération des embeddings avec le backend {backend.name}")
     
     all_embeddings = []
     
     for i in range(0, len(texts), batch_size):
         batch = texts[i:i+batch_size]
-        embeddings = model.encode(
-            batch,
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-            show_progress_bar=False
-        )
+        embeddings = backend.encode(batch, batch_size=batch_size)
         all_embeddings.append(embeddings)
     
     return np.vstack(all_embeddings)
 
 
-def build_faiss_index(embeddings: np.ndarray) -> faiss.Index:
+def build_faiss_index(embeddings: np.ndarray, index_type: str = None) -> faiss.Index:
     """
     Build a FAISS index from embeddings
     
     Args:
         embeddings: NumPy array of embeddings
+        index_type: Vector storage ("flat", "fp16" or "sq8"), defaults to FAISS_INDEX_TYPE
         
     Returns:
-        FAISS index
+        FAISS index (inner product for cosine similarity)
     """
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)  # Inner product for cosine similarity
-    index.add(embeddings)
-    return index
+    return _build_index(embeddings, index_type)
 
 
 def archive_old_index():
@@ -494,11 +472,15 @@ def rebuild_index(
         with open(MAPPING_PATH, "w", encoding="utf-8") as f:
             json.dump(mapping_data, f, ensure_ascii=False, indent=2)
         
+        manifest = write_index_stats(index, urls, doc_indices, INDEX_PATH, MAPPING_PATH)
+        
         # Prepare stats
         stats = {
             "document_count": len(documents),
             "chunk_count": len(chunks),
             "embedding_dim": embeddings.shape[1],
+            "index_type": get_index_type(index),
+            "generation": manifest["generation"],
             "indexed_at": datetime.now().isoformat()
         }
         
@@ -605,6 +587,8 @@ def add_document_to_index(
         with open(MAPPING_PATH, "w", encoding="utf-8") as f:
             json.dump(updated_mapping, f, ensure_ascii=False, indent=2)
         
+        write_index_stats(index, urls, doc_indices, INDEX_PATH, MAPPING_PATH)
+        
         if progress_callback:
             progress_callback(0.95, "Synchronisation", "Synchronisation avec Cloud Storage...")
         
@@ -632,6 +616,10 @@ def get_index_stats() -> Dict[str, Any]:
     """
     Get statistics about the current index
     
+    Reads the stats manifest written next to the index (O(1) in the corpus size).
+    The index and mapping are only loaded when the manifest is missing or does not
+    match the files on disk, and the manifest is then regenerated.
+    
     Returns:
         Dictionary with index statistics
     """
@@ -641,23 +629,23 @@ def get_index_stats() -> Dict[str, Any]:
         "document_count": 0,
         "chunk_count": 0,
         "embedding_dim": 0,
+        "index_type": None,
     }
     
+    if not (stats["index_exists"] and stats["mapping_exists"]):
+        return stats
+    
     try:
-        if stats["mapping_exists"]:
+        manifest = read_index_stats(INDEX_PATH, MAPPING_PATH)
+        if manifest is None:
+            # No manifest yet (index built by an older version or downloaded without it)
+            index = faiss.read_index(INDEX_PATH)
             with open(MAPPING_PATH, "r", encoding="utf-8") as f:
                 mapping = json.load(f)
-            
-            stats["chunk_count"] = len(mapping.get("texts", []))
-            
-            # Count unique documents
-            doc_indices = mapping.get("doc_indices", [])
-            if doc_indices:
-                stats["document_count"] = len(set(doc_indices))
-        
-        if stats["index_exists"]:
-            index = faiss.read_index(INDEX_PATH)
-            stats["embedding_dim"] = index.d
+            manifest = write_index_stats(
+                index, mapping.get("urls", []), mapping.get("doc_indices", []), INDEX_PATH, MAPPING_PATH
+            )
+        stats.update(manifest)
     
     except Exception as e:
         stats["error"] = str(e)
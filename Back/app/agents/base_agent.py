@@ -1,8 +1,23 @@
 """
 Classe de base pour tous les agents
 """
+import os
+import sys
+import asyncio
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Optional
+
+# Back/app (pools de threads partagés)
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _APP_DIR not in sys.path:
+    sys.path.append(_APP_DIR)
+
+from workers import run_cpu, run_io
+
+# Eléments d'un flux produits d'avance par le thread avant d'attendre le consommateur
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "64"))
 
 
 class BaseAgent(ABC):
@@ -39,6 +54,115 @@ class BaseAgent(ABC):
         """
         pass
     
+    def prefetch(self, query: str, context: Dict[str, Any] = None) -> Optional[Any]:
+        """
+        Travail préparatoire lancé par l'orchestrateur en parallèle de l'analyse
+        d'intention, avant de savoir si cet agent sera choisi
+        
+        Args:
+            query: La requête utilisateur
+            context: Contexte additionnel (optionnel)
+            
+        Returns:
+            Résultat transmis à process/process_stream via context["prefetched"],
+            ou None si l'agent n'a rien à anticiper
+        """
+        return None
+    
+    async def aprocess(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Version asyncio de process()
+        Par défaut, process() est exécuté dans le pool I/O (appels LLM bloquants)
+        pour ne pas bloquer la boucle
+        """
+        return await run_io(self.process, query, context)
+    
+    async def aprocess_stream(self, query: str, context: Dict[str, Any] = None):
+        """
+        Version asyncio de process_stream()
+        Par défaut, le générateur synchrone est consommé dans un thread ; sans
+        process_stream, le résultat de aprocess() est produit en un seul chunk
+        """
+        if not hasattr(self, 'process_stream'):
+            yield await self.aprocess(query, context)
+            return
+        
+        async for chunk in iterate_in_thread(self.process_stream(query, context)):
+            yield chunk
+    
+    async def aprefetch(self, query: str, context: Dict[str, Any] = None) -> Optional[Any]:
+        """Version asyncio de prefetch() (exécuté dans le pool CPU)"""
+        return await run_cpu(self.prefetch, query, context)
+    
     def get_description(self) -> str:
         """Retourne une description de l'agent"""
         return f"Agent: {self.name}"
+
+
+def overrides(agent, method: str) -> bool:
+    """True si l'agent redéfinit une méthode de BaseAgent (prefetch, aprefetch...)"""
+    return getattr(type(agent), method, None) is not getattr(BaseAgent, method)
+
+
+_END = object()
+
+
+async def iterate_in_thread(generator):
+    """
+    Consomme un générateur synchrone (bloquant) dans un thread dédié et produit
+    ses éléments dans la boucle asyncio au fur et à mesure
+    
+    La file est bornée (STREAM_BUFFER_SIZE) : le thread attend un consommateur
+    lent au lieu d'accumuler tout le flux. Si le consommateur s'arrête (client
+    déconnecté, tâche annulée), le thread s'arrête avant l'élément suivant et
+    ferme le générateur (appel LLM en cours abandonné).
+    
+    Args:
+        generator: Générateur synchrone
+        
+    Yields:
+        Eléments du générateur
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_SIZE)
+    stop = threading.Event()
+    
+    def put(entry) -> bool:
+        """Dépose un élément dans la file, False si le consommateur est parti"""
+        try:
+            future = asyncio.run_coroutine_threadsafe(queue.put(entry), loop)
+        except RuntimeError:
+            # Boucle fermée
+            return False
+        while not stop.is_set():
+            try:
+                future.result(timeout=0.1)
+                return True
+            except FutureTimeoutError:
+                continue
+        future.cancel()
+        return False
+    
+    def pump():
+        try:
+            for item in generator:
+                if stop.is_set() or not put((item, None)):
+                    return
+            put((_END, None))
+        except Exception as e:
+            put((_END, e))
+        finally:
+            generator.close()
+    
+    threading.Thread(target=pump, name="agent-stream", daemon=True).start()
+    
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
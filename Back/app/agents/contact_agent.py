@@ -2,17 +2,26 @@
 Agent de contact pour gérer les demandes de contact avec l'ESILV
 """
 import os
+import sys
 import json
-import vertexai
-from vertexai.generative_models import GenerativeModel
 from typing import Dict, Any
 from datetime import datetime
 from dotenv import load_dotenv
 
+# Back/app (client LLM partagé, leads_manager)
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _APP_DIR not in sys.path:
+    sys.path.append(_APP_DIR)
+
+from llm_client import get_llm_client
+from lead_queue import get_lead_queue
+
 try:
     from .base_agent import BaseAgent
+    from .form_extractor import FormExtractor
 except ImportError:
     from base_agent import BaseAgent
+    from form_extractor import FormExtractor
 
 load_dotenv()
 
@@ -56,18 +65,16 @@ class ContactAgent(BaseAgent):
     def __init__(self):
         super().__init__("Contact Agent")
         
-        # Configuration Vertex AI
-        project_id = os.getenv("VERTEX_PROJECT", "esilv-smart-assistant")
-        location = os.getenv("VERTEX_LOCATION", "us-central1")
-        
+        # Client Vertex AI partagé par les agents et les sessions (voir llm_client.py)
         try:
-            vertexai.init(project=project_id, location=location)
-            model_name = os.getenv("VERTEX_MODEL", "gemini-2.0-flash-exp")
-            self.llm = GenerativeModel(model_name)
+            self.llm = get_llm_client()
         except Exception as e:
             print(f"Erreur initialisation Vertex AI: {e}")
             self.llm = None
         
+        # Remplissage du formulaire : règles locales, LLM seulement pour les champs ambigus
+        self.form_extractor = FormExtractor(self.llm)
+        
         print(f"{self.name} initialisé avec succès")
     
     def can_handle(self, query: str, context: Dict[str, Any] = None) -> bool:
@@ -216,8 +223,7 @@ Génère une réponse courte et amicale en français qui:
 
 Réponse:"""
                 
-                response = self.llm.generate_content(prompt)
-                return response.text.strip()
+                return self.llm.generate(prompt).strip()
             except Exception as e:
                 print(f"Erreur Vertex AI: {e}")
         
@@ -254,56 +260,18 @@ Réponse:"""
                 "missing_fields": missing_fields
             }
         
-        # Sauvegarder le formulaire dans un fichier
-        self._save_form_to_file(form_data)
+        # Mise en file : l'enregistrement et la notification du service se font en arrière-plan
+        if get_lead_queue().submit(form_data) is None:
+            print("Formulaire incomplet - nom ou email manquant")
         
         return {
             "success": True,
             "response": f"Votre demande a été transmise au service {form_data.get('service', 'concerné')}!\n"
                       f"Vous recevrez une réponse à l'adresse: {form_data.get('email')}\n\n"
-                      f"Email de contact: {form_data.get('service_email', 'contact@esilv.fr')}\n\n"
-                      f"Le formulaire a été sauvegardé dans: contact_forms.json",
+                      f"Email de contact: {form_data.get('service_email', 'contact@esilv.fr')}",
             "form_data": form_data
         }
     
-    def _save_form_to_file(self, form_data: Dict[str, Any]):
-        """Sauvegarde le formulaire via le leads_manager"""
-        try:
-            # Importer le leads_manager
-            import sys
-            from pathlib import Path
-            
-            # Ajouter le chemin vers Back/app
-            back_app_path = Path(__file__).parent.parent
-            if str(back_app_path) not in sys.path:
-                sys.path.insert(0, str(back_app_path))
-            
-            from leads_manager import add_lead
-            
-            # Créer le lead avec les bons paramètres
-            name = f"{form_data.get('prenom', '')} {form_data.get('nom', '')}".strip()
-            email = form_data.get("email", "")
-            
-            if not name or not email:
-                print("Formulaire incomplet - nom ou email manquant")
-                return
-            
-            # Sauvegarder via le leads_manager
-            lead = add_lead(
-                name=name,
-                email=email,
-                education=None,
-                program_of_interest=form_data.get("objet"),
-                message=form_data.get("message", "")
-            )
-            
-            print(f"Formulaire de contact sauvegardé: ID {lead.get('id')}")
-            
-        except Exception as e:
-            print(f"Erreur lors de la sauvegarde du formulaire: {e}")
-            import traceback
-            traceback.print_exc()
-    
     def get_description(self) -> str:
         """Retourne une description de l'agent"""
         return f"{self.name}: Crée des formulaires de contact pour l'ESILV"
\ No newline at end of file
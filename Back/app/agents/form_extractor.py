@@ -0,0 +1,283 @@
+"""
+Remplissage du formulaire de contact à partir des messages de l'utilisateur
+
+Chaque tour de formulaire envoyait le message et l'état complet au LLM puis
+cherchait le JSON dans le texte libre de la réponse. FormExtractor :
+- extrait localement les champs reconnaissables (email, téléphone, "Prénom Nom",
+  champs annotés "objet: ...", "message: ...") ;
+- n'appelle le LLM que si un reste de texte peut correspondre à plusieurs champs
+  encore manquants, en ne demandant que ces champs, avec une sortie JSON
+  contrainte par un schéma ;
+- garde les résultats en cache par (message, état du formulaire).
+"""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+FORM_FIELDS = ["nom", "prenom", "email", "telephone", "objet", "message"]
+# Champs qu'un texte libre peut remplir (email et téléphone ne sont reconnus que par motif)
+FREE_TEXT_FIELDS = ["prenom", "nom", "objet", "message"]
+
+# Taille du cache (message, état du formulaire) -> champs extraits
+FORM_EXTRACTION_CACHE_SIZE = int(os.getenv("FORM_EXTRACTION_CACHE_SIZE", "256"))
+# Longueur maximale d'un texte libre considéré comme un objet plutôt qu'un message
+OBJET_MAX_CHARS = 80
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_PATTERN = re.compile(
+    r"(?<![\w+])(?:(?:\+|00)33\s?(?:\(0\)\s?)?|0)[1-9](?:[\s.-]?\d{2}){4}(?!\d)"
+    r"|(?<![\w+])\+\d{1,3}(?:[\s.-]?\d{2,4}){2,5}(?!\d)"
+)
+LABEL_PATTERN = re.compile(
+    r"(?i)\b(nom de famille|nom|pr[ée]nom|e-?mail|courriel|t[ée]l[ée]phone|t[ée]l|portable|objet|sujet|message)\s*[:=]\s*"
+)
+LABEL_FIELDS = {
+    "nom de famille": "nom", "nom": "nom", "prenom": "prenom", "prénom": "prenom",
+    "email": "email", "e-mail": "email", "courriel": "email",
+    "telephone": "telephone", "téléphone": "telephone", "tel": "telephone", "tél": "telephone", "portable": "telephone",
+    "objet": "objet", "sujet": "objet", "message": "message",
+}
+_NAME_WORD = r"[A-ZÀ-ÖØ-Ý][A-Za-zÀ-ÖØ-öø-ÿ'-]+"
+INTRO_NAME_PATTERN = re.compile(
+    r"(?i:je m'appelle|je me nomme|mon nom est|moi c'est|je suis)\s+(" + _NAME_WORD + r"(?:\s+" + _NAME_WORD + r"){0,3})"
+)
+NAME_SEGMENT_PATTERN = re.compile(r"^" + _NAME_WORD + r"(?:\s+" + _NAME_WORD + r"){1,3}$")
+# Mots capitalisés qui ne sont pas des noms en début de segment
+NOT_NAMES = {"bonjour", "bonsoir", "salut", "merci", "cordialement", "madame", "monsieur", "je", "mon", "ma", "objet", "message"}
+# Mots de liaison qui restent autour des valeurs extraites ("et mon mail est ...")
+FILLER_WORDS = NOT_NAMES | {
+    "et", "ou", "mes", "est", "c'est", "voici", "voilà", "mail", "email", "adresse", "numéro", "numero",
+    "téléphone", "telephone", "tel", "tél", "portable", "suis", "m'appelle", "nom", "prénom", "prenom",
+    "le", "la", "les", "de", "du", "des", "aussi", "oui", "ok", "d'accord", "svp", "vous", "plaît", "plait", "s'il",
+}
+
+SCHEMA_DESCRIPTIONS = {
+    "prenom": "prénom de l'utilisateur",
+    "nom": "nom de famille de l'utilisateur",
+    "objet": "objet court de la demande",
+    "message": "message détaillé de la demande",
+}
+
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    value = value.strip(" \t\r\n,;.")
+    return value if value and value.lower() not in ("null", "none", "non fourni") else None
+
+
+def split_name(full_name: str) -> Tuple[str, str]:
+    """Premier mot = prénom, le reste = nom (même règle que le prompt d'origine)"""
+    words = full_name.split()
+    return words[0], " ".join(words[1:])
+
+
+def extract_local_fields(text: str, current_fields: Dict[str, Any]) -> Tuple[Dict[str, str], str]:
+    """
+    Champs reconnus sans LLM
+
+    Args:
+        text: Message de l'utilisateur
+        current_fields: Etat actuel du formulaire
+
+    Returns:
+        (champs trouvés, reste du texte non attribué)
+    """
+    found: Dict[str, str] = {}
+    spans: List[Tuple[int, int]] = []
+
+    # Champs annotés : la valeur court jusqu'à l'annotation suivante ou la fin de ligne
+    labels = list(LABEL_PATTERN.finditer(text))
+    for i, match in enumerate(labels):
+        end = labels[i + 1].start() if i + 1 < len(labels) else len(text)
+        if LABEL_FIELDS[match.group(1).lower()] != "message":
+            newline = text.find("\n", match.end(), end)
+            end = newline if newline != -1 else end
+        value = _clean(text[match.end():end])
+        if value:
+            found[LABEL_FIELDS[match.group(1).lower()]] = value
+            spans.append((match.start(), end))
+
+    def free(start: int, end: int) -> bool:
+        return not any(s < end and start < e for s, e in spans)
+
+    if "email" not in found:
+        match = EMAIL_PATTERN.search(text)
+        if match and free(*match.span()):
+            found["email"] = match.group()
+            spans.append(match.span())
+
+    if "telephone" not in found:
+        match = PHONE_PATTERN.search(text)
+        if match and free(*match.span()):
+            found["telephone"] = match.group().strip()
+            spans.append(match.span())
+
+    if "prenom" not in found and "nom" not in found:
+        match = INTRO_NAME_PATTERN.search(text)
+        if match and free(*match.span()):
+            found["prenom"], nom = split_name(match.group(1))
+            if nom:
+                found["nom"] = nom
+            spans.append(match.span())
+        elif not current_fields.get("nom") and not current_fields.get("prenom"):
+            # Segment isolé "Prénom Nom" (ex. "Jean Dupont, jean@mail.com")
+            offset = 0
+            for segment in re.split(r"([,;\n])", text):
+                start = offset
+                offset += len(segment)
+                candidate = segment.strip()
+                if (NAME_SEGMENT_PATTERN.match(candidate) and candidate.split()[0].lower() not in NOT_NAMES
+                        and free(start, offset)):
+                    found["prenom"], found["nom"] = split_name(candidate)
+                    spans.append((start, offset))
+                    break
+
+    residual, last = [], 0
+    for start, end in sorted(spans):
+        residual.append(text[last:start])
+        last = max(last, end)
+    residual.append(text[last:])
+    residual_text = re.sub(r"\s+", " ", " ".join(residual)).strip(" \t,;.:-")
+    return found, residual_text
+
+
+def _is_meaningful(residual: str) -> bool:
+    """Le reste contient-il autre chose que des politesses et de la ponctuation ?"""
+    words = [w for w in re.findall(r"[A-Za-zÀ-ÖØ-öø-ÿ']+", residual.lower()) if w not in FILLER_WORDS]
+    return any(len(w) >= 3 for w in words)
+
+
+def assign_free_text(residual: str, missing: List[str]) -> Dict[str, str]:
+    """Attribution du texte libre sans LLM : objet s'il est court et manquant, sinon message"""
+    if "objet" in missing and (len(residual) <= OBJET_MAX_CHARS or "message" not in missing):
+        return {"objet": residual}
+    if "message" in missing:
+        return {"message": residual}
+    return {}
+
+
+class FormExtractor:
+    """
+    Extraction des champs du formulaire de contact, LLM en dernier recours
+
+    Args:
+        llm: Client LLM (llm_client.LLMClient) ou None pour n'utiliser que les règles locales
+        cache_size: Nombre de résultats gardés en cache
+    """
+
+    def __init__(self, llm=None, cache_size: int = FORM_EXTRACTION_CACHE_SIZE):
+        self.llm = llm
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple, Dict[str, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"turns": 0, "cache_hits": 0, "local_only": 0, "llm_calls": 0, "llm_errors": 0}
+
+    @property
+    def llm_avoided_rate(self) -> float:
+        """Proportion des tours traités sans appel au LLM"""
+        turns = self.stats["turns"]
+        return 1.0 - self.stats["llm_calls"] / turns if turns else 0.0
+
+    def extract(self, user_input: str, current_fields: Dict[str, Any]) -> Dict[str, Optional[str]]:
+        """
+        Nouvelles valeurs des champs du formulaire contenues dans le message
+
+        Args:
+            user_input: Message de l'utilisateur
+            current_fields: Etat actuel du formulaire
+
+        Returns:
+            Dictionnaire {champ: valeur ou None} pour tous les champs de FORM_FIELDS
+        """
+        text = re.sub(r"[ \t]+", " ", user_input).strip()
+        key = (text, tuple((f, current_fields.get(f) or "") for f in FORM_FIELDS))
+
+        with self._lock:
+            self.stats["turns"] += 1
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return dict(cached)
+
+        found, residual = extract_local_fields(text, current_fields)
+        missing = [f for f in FREE_TEXT_FIELDS if not current_fields.get(f) and f not in found]
+        used_llm = False
+        llm_failed = False
+
+        if residual and missing and _is_meaningful(residual):
+            if len(missing) == 1 and missing[0] in ("objet", "message"):
+                # Un seul champ possible : pas d'ambiguïté
+                found[missing[0]] = residual
+            else:
+                used_llm = self.llm is not None
+                llm_fields = self._extract_with_llm(text, missing, current_fields)
+                llm_failed = used_llm and llm_fields is None
+                found.update(llm_fields if llm_fields is not None else assign_free_text(residual, missing))
+
+        result = {field: found.get(field) for field in FORM_FIELDS}
+        if not llm_failed:
+            # Repli après une erreur du LLM non gardé : le même message réinterroge le LLM
+            self._store(key, result, used_llm)
+        return dict(result)
+
+    def _store(self, key: Tuple, result: Dict[str, Optional[str]], used_llm: bool):
+        with self._lock:
+            if not used_llm:
+                self.stats["local_only"] += 1
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _extract_with_llm(
+        self,
+        text: str,
+        fields: List[str],
+        current_fields: Dict[str, Any]
+    ) -> Optional[Dict[str, str]]:
+        """
+        Demande au LLM uniquement les champs manquants, en JSON contraint par un schéma
+
+        Returns:
+            Champs trouvés, ou None si le LLM est indisponible ou sa réponse invalide
+        """
+        if self.llm is None:
+            return None
+
+        known = ", ".join(f"{k}: {v}" for k, v in current_fields.items() if v) or "aucun"
+        prompt = (
+            "Formulaire de contact de l'ESILV. Extrais du message de l'utilisateur uniquement les champs "
+            f"{', '.join(fields)} (null si absent). Déjà connus : {known}.\n"
+            "Si l'utilisateur donne \"Prénom Nom\", le premier mot est le prénom. "
+            "Un texte court sur le sujet de la demande est l'objet, une explication détaillée est le message.\n\n"
+            f"Message : \"{text}\""
+        )
+        schema = {
+            "type": "object",
+            "properties": {f: {"type": "string", "nullable": True, "description": SCHEMA_DESCRIPTIONS[f]} for f in fields},
+            "required": fields,
+        }
+
+        with self._lock:
+            self.stats["llm_calls"] += 1
+        try:
+            response = self.llm.generate(
+                prompt,
+                generation_config={"response_mime_type": "application/json", "response_schema": schema, "temperature": 0},
+            )
+            data = json.loads(response)
+        except Exception as e:
+            with self._lock:
+                self.stats["llm_errors"] += 1
+            print(f"Erreur LLM extraction: {e}")
+            return None
+
+        if not isinstance(data, dict):
+            return None
+        values = {f: _clean(data.get(f)) for f in fields}
+        return {f: value for f, value in values.items() if value}
@@ -0,0 +1,120 @@
+"""
+Classifieur d'intention local (plus proche centroïde sur les embeddings MiniLM)
+
+Chaque intention est représentée par le centroïde normalisé des embeddings de
+ses exemples annotés (data/intent_examples.json). Une requête est classée en
+une multiplication matricielle ; l'orchestrateur ne fait appel au LLM que si
+la confiance est sous le seuil.
+"""
+import json
+import os
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Ajouter le chemin du module rag (backend d'embedding partagé avec le RAG)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'rag'))
+
+INTENT_EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_examples.json")
+# Probabilité minimale pour se passer du LLM
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.6"))
+# Température du softmax sur les similarités cosinus
+INTENT_TEMPERATURE = 0.05
+
+
+class IntentClassifier:
+    """Classifieur par plus proche centroïde, entraîné à partir d'exemples annotés"""
+
+    def __init__(self, examples_path: str = INTENT_EXAMPLES_PATH, backend=None):
+        """
+        Args:
+            examples_path: Fichier JSON {intention: [exemples]}
+            backend: Backend d'embedding (celui du processus par défaut)
+        """
+        self.examples_path = examples_path
+        self.backend = backend
+        self.labels: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def _fit(self):
+        """Calcule les centroïdes (une seule fois, à la première classification)"""
+        if self.backend is None:
+            from embeddings import get_embedding_backend
+            self.backend = get_embedding_backend()
+
+        with open(self.examples_path, "r", encoding="utf-8") as f:
+            examples: Dict[str, List[str]] = json.load(f)
+
+        labels, centroids = [], []
+        for label, texts in examples.items():
+            if not texts:
+                continue
+            centroid = self.backend.encode(texts).mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+            labels.append(label)
+
+        self.labels = labels
+        self.centroids = np.vstack(centroids).astype("float32")
+
+    def ensure_fitted(self):
+        if self.centroids is None:
+            with self._lock:
+                if self.centroids is None:
+                    self._fit()
+
+    def predict_proba(self, query: str) -> Dict[str, float]:
+        """
+        Probabilité de chaque intention pour la requête
+
+        Args:
+            query: La requête utilisateur
+
+        Returns:
+            Dictionnaire {intention: probabilité}
+        """
+        self.ensure_fitted()
+        scores = self.centroids @ self.backend.encode([query])[0]
+        logits = (scores - scores.max()) / INTENT_TEMPERATURE
+        probs = np.exp(logits) / np.exp(logits).sum()
+        return {label: float(p) for label, p in zip(self.labels, probs)}
+
+    def classify(self, query: str) -> Tuple[str, float]:
+        """
+        Intention la plus probable
+
+        Args:
+            query: La requête utilisateur
+
+        Returns:
+            Tuple (intention, confiance entre 0 et 1)
+        """
+        probs = self.predict_proba(query)
+        intent = max(probs, key=probs.get)
+        return intent, probs[intent]
+
+
+_classifier_lock = threading.Lock()
+_classifier: Optional[IntentClassifier] = None
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """
+    Classifieur du processus, partagé par tous les orchestrateurs (une session
+    Streamlit = un orchestrateur) ; les centroïdes ne sont calculés qu'une fois
+
+    Returns:
+        Instance partagée du classifieur
+    """
+    global _classifier
+
+    if _classifier is not None:
+        return _classifier
+
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = IntentClassifier()
+
+    return _classifier
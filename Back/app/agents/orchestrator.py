@@ -3,18 +3,72 @@ Agent orchestrateur qui route les requêtes vers les agents appropriés
 """
 import os
 import re
-import vertexai
-from vertexai.generative_models import GenerativeModel
+import sys
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 
+# Back/app (client LLM partagé)
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _APP_DIR not in sys.path:
+    sys.path.append(_APP_DIR)
+
+from llm_client import get_llm_client
+from telemetry import get_logger, run_in_context, set_attribute, span, start_trace
+from workers import run_cpu
+
 try:
-    from .base_agent import BaseAgent
+    from .base_agent import BaseAgent, overrides
+    from .intent_classifier import get_intent_classifier, INTENT_CONFIDENCE_THRESHOLD
 except ImportError:
-    from base_agent import BaseAgent
+    from base_agent import BaseAgent, overrides
+    from intent_classifier import get_intent_classifier, INTENT_CONFIDENCE_THRESHOLD
 
 load_dotenv()
 
+logger = get_logger("orchestrator")
+
+# Recherche anticipée des agents pendant l'analyse d'intention (désactiver avec SPECULATIVE_RETRIEVAL=0)
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "1") != "0"
+# Threads de prefetch du processus, partagés par toutes les sessions
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+
+# Réponse du LLM générique quand aucun agent spécialisé ne peut traiter la requête
+FALLBACK_PROMPT = """Tu es un assistant virtuel de l'ESILV (École Supérieure d'Ingénieurs Léonard de Vinci).
+Réponds de manière professionnelle et courtoise à cette question, même si tu n'as pas toutes les informations.
+Si tu ne peux pas répondre précisément, oriente vers le site web de l'ESILV ou propose de contacter l'école.
+
+Question: {query}
+
+Réponse:"""
+
+# Si même le LLM échoue, message professionnel
+FALLBACK_RESPONSE = (
+    "Je vous remercie pour votre question. Pour obtenir une réponse précise, je vous invite à "
+    "consulter le site www.esilv.fr ou à contacter directement notre équipe d'admission."
+)
+
+_prefetch_lock = threading.Lock()
+_prefetch_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_prefetch_executor() -> ThreadPoolExecutor:
+    """Pool de prefetch du processus, créé à la première utilisation"""
+    global _prefetch_executor
+
+    if _prefetch_executor is not None:
+        return _prefetch_executor
+
+    with _prefetch_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=PREFETCH_WORKERS, thread_name_prefix="orchestrator-prefetch"
+            )
+
+    return _prefetch_executor
+
 
 class OrchestratorAgent:
     """
@@ -29,15 +83,14 @@ class OrchestratorAgent:
             agents: Liste des agents disponibles
         """
         self.agents = agents or []
+        # Classifieur local consulté avant le LLM, partagé par les sessions
+        # (centroïdes calculés à la première requête du processus)
+        self.intent_classifier = get_intent_classifier()
+        self.speculative = SPECULATIVE_RETRIEVAL
         
-        # Configurer Vertex AI
-        project_id = os.getenv("VERTEX_PROJECT", "esilv-smart-assistant")
-        location = os.getenv("VERTEX_LOCATION", "us-central1")
-        
+        # Client Vertex AI partagé par les agents et les sessions (voir llm_client.py)
         try:
-            vertexai.init(project=project_id, location=location)
-            model_name = os.getenv("VERTEX_MODEL", "gemini-2.0-flash-exp")
-            self.llm = GenerativeModel(model_name)
+            self.llm = get_llm_client()
         except Exception as e:
             print(f"Erreur initialisation Vertex AI: {e}")
             self.llm = None
@@ -47,15 +100,15 @@ class OrchestratorAgent:
         self.agents.append(agent)
         print(f"Agent enregistré: {agent.name}")
     
-    def _analyze_intent(self, query: str) -> str:
+    def _local_intent(self, query: str) -> Optional[str]:
         """
-        Analyse l'intention de la requête utilisateur
+        Analyse l'intention sans LLM (mots-clés puis classifieur local)
         
         Args:
             query: La requête utilisateur
             
         Returns:
-            Type d'intention détecté: 'information', 'contact', 'other'
+            Intention détectée, ou None si seul le LLM peut trancher
         """
         query_lower = query.lower()
         
@@ -74,35 +127,123 @@ class OrchestratorAgent:
             'programme', 'cours', 'formation', 'admission', 'étudier'
         ]
         
-        # Détection basée sur les mots-clés
-        has_contact = any(keyword in query_lower for keyword in contact_keywords)
-        has_info = any(keyword in query_lower for keyword in info_keywords)
+        # Logique de décision basée sur les mots-clés
+        if any(keyword in query_lower for keyword in contact_keywords):
+            return 'contact'
+        if any(keyword in query_lower for keyword in info_keywords):
+            return 'information'
+        
+        # Sans mot-clé : classifieur local, le LLM n'est appelé que s'il hésite
+        try:
+            intent, confidence = self.intent_classifier.classify(query)
+            if confidence >= INTENT_CONFIDENCE_THRESHOLD:
+                return intent
+        except Exception as e:
+            print(f"Erreur du classifieur d'intention: {e}")
         
-        # Utiliser Gemini pour une analyse plus fine si disponible
-        if self.llm and not (has_contact or has_info):
-            try:
-                prompt = f"""Analyse cette requête et détermine l'intention principale.
+        return None
+    
+    def _intent_prompt(self, query: str) -> str:
+        return f"""Analyse cette requête et détermine l'intention principale.
 Réponds UNIQUEMENT par un seul mot: 'information', 'contact', ou 'other'
 
 Requête: {query}
 
 Intention:"""
-                response = self.llm.generate_content(prompt)
-                intent = response.text.strip().lower()
+    
+    def _analyze_intent(self, query: str) -> str:
+        """
+        Analyse l'intention de la requête utilisateur
+        
+        Args:
+            query: La requête utilisateur
+            
+        Returns:
+            Type d'intention détecté: 'information', 'contact', 'other'
+        """
+        intent = self._local_intent(query)
+        if intent:
+            return intent
+        
+        # Utiliser Gemini pour une analyse plus fine si disponible
+        if self.llm:
+            try:
+                intent = self.llm.generate(self._intent_prompt(query)).strip().lower()
                 
                 if intent in ['information', 'contact', 'other']:
                     return intent
             except Exception as e:
                 print(f"Erreur lors de l'analyse d'intention avec LLM: {e}")
         
-        # Logique de décision basée sur les mots-clés
-        if has_contact:
-            return 'contact'
-        elif has_info:
-            return 'information'
-        else:
-            # Par défaut, considérer comme une demande d'information
-            return 'information'
+        # Par défaut, considérer comme une demande d'information
+        return 'information'
+    
+    async def _aanalyze_intent(self, query: str) -> str:
+        """Version asyncio de _analyze_intent() (classifieur dans le pool CPU, LLM asynchrone)"""
+        intent = await run_cpu(self._local_intent, query)
+        if intent:
+            return intent
+        
+        if self.llm:
+            try:
+                intent = (await self.llm.agenerate(self._intent_prompt(query))).strip().lower()
+                
+                if intent in ['information', 'contact', 'other']:
+                    return intent
+            except Exception as e:
+                print(f"Erreur lors de l'analyse d'intention avec LLM: {e}")
+        
+        return 'information'
+    
+    def _start_prefetch(self, query: str, context: Dict[str, Any] = None) -> Dict[BaseAgent, Future]:
+        """
+        Lance le prefetch de chaque agent en arrière-plan, avant l'analyse d'intention
+        
+        Returns:
+            Dictionnaire {agent: future}
+        """
+        if not self.speculative:
+            return {}
+        
+        return {
+            agent: get_prefetch_executor().submit(run_in_context(agent.prefetch, query, context))
+            for agent in self.agents
+            # Le prefetch de BaseAgent ne fait rien : inutile d'occuper le pool partagé
+            if overrides(agent, 'prefetch')
+        }
+    
+    def _agent_context(self, agent: BaseAgent, context: Dict[str, Any], prefetches: Dict[BaseAgent, Future]) -> Dict[str, Any]:
+        """
+        Contexte transmis à l'agent choisi, complété par son prefetch s'il a abouti
+        Les prefetch des autres agents sont annulés ou ignorés
+        """
+        for other, future in prefetches.items():
+            if other is not agent:
+                future.cancel()
+        
+        future = prefetches.get(agent)
+        # Prefetch encore en file d'attente (pool partagé occupé) : l'agent
+        # fait sa recherche lui-même plutôt que d'attendre un thread libre
+        if future is None or future.cancel():
+            return context
+        
+        try:
+            prefetched = future.result()
+        except Exception as e:
+            print(f"Erreur lors du prefetch de {agent.name}: {e}")
+            return context
+        
+        if prefetched is None:
+            return context
+        
+        return {**(context or {}), "prefetched": prefetched}
+    
+    def _trace_result(self, trace, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Ajoute l'identifiant de requête à la réponse et l'agent utilisé à la trace"""
+        result["request_id"] = trace.request_id
+        if result.get("agent_used"):
+            set_attribute("agent", result["agent_used"])
+        return result
     
     def route(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -115,6 +256,55 @@ Intention:"""
         Returns:
             Réponse de l'agent sélectionné
         """
+        with start_trace("route", (context or {}).get("request_id")) as trace:
+            return self._trace_result(trace, self._route(query, context))
+    
+    def route_stream(self, query: str, context: Dict[str, Any] = None):
+        """
+        Route la requête vers l'agent approprié en mode streaming
+        
+        Args:
+            query: La requête utilisateur
+            context: Contexte additionnel (optionnel)
+            
+        Yields:
+            Chunks de la réponse de l'agent sélectionné
+        """
+        with start_trace("route_stream", (context or {}).get("request_id")) as trace:
+            for chunk in self._route_stream(query, context):
+                yield self._trace_result(trace, chunk)
+    
+    async def aroute(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Version asyncio de route() : aucun thread n'est bloqué pendant les appels LLM
+        
+        Args:
+            query: La requête utilisateur
+            context: Contexte additionnel (optionnel)
+            
+        Returns:
+            Réponse de l'agent sélectionné
+        """
+        with start_trace("aroute", (context or {}).get("request_id")) as trace:
+            return self._trace_result(trace, await self._aroute(query, context))
+    
+    async def aroute_stream(self, query: str, context: Dict[str, Any] = None):
+        """
+        Version asyncio de route_stream()
+        
+        Args:
+            query: La requête utilisateur
+            context: Contexte additionnel (optionnel)
+            
+        Yields:
+            Chunks de la réponse de l'agent sélectionné
+        """
+        with start_trace("aroute_stream", (context or {}).get("request_id")) as trace:
+            async for chunk in self._aroute_stream(query, context):
+                yield self._trace_result(trace, chunk)
+    
+    def _route(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Corps de route() (étapes mesurées dans la trace ouverte par route)"""
         if not self.agents:
             return {
                 "success": False,
@@ -122,16 +312,21 @@ Intention:"""
                 "agent": "orchestrator"
             }
         
+        # Recherche anticipée en parallèle de l'analyse d'intention (souvent un appel LLM)
+        prefetches = self._start_prefetch(query, context)
+        
         # Analyser l'intention
-        intent = self._analyze_intent(query)
-        print(f"\nIntention détectée: {intent}")
+        with span("intent"):
+            intent = self._analyze_intent(query)
+        set_attribute("intent", intent)
+        logger.debug(f"Intention détectée: {intent}")
         
         # Trouver le premier agent capable de traiter la requête
         for agent in self.agents:
             if agent.can_handle(query, context):
-                print(f"Routage vers: {agent.name}")
+                logger.debug(f"Routage vers: {agent.name}")
                 try:
-                    result = agent.process(query, context)
+                    result = agent.process(query, self._agent_context(agent, context, prefetches))
                     result["agent_used"] = agent.name
                     result["intent"] = intent
                     return result
@@ -140,22 +335,17 @@ Intention:"""
                     continue
         
         # Aucun agent spécialisé n'a pu traiter - utiliser le LLM générique comme fallback
+        for future in prefetches.values():
+            future.cancel()
         print("Aucun agent spécialisé disponible - utilisation du LLM générique")
         try:
             if self.llm:
-                prompt = f"""Tu es un assistant virtuel de l'ESILV (École Supérieure d'Ingénieurs Léonard de Vinci).
-Réponds de manière professionnelle et courtoise à cette question, même si tu n'as pas toutes les informations.
-Si tu ne peux pas répondre précisément, oriente vers le site web de l'ESILV ou propose de contacter l'école.
-
-Question: {query}
-
-Réponse:"""
-                response = self.llm.generate_content(prompt)
+                response_text = self.llm.generate(FALLBACK_PROMPT.format(query=query))
                 return {
                     "success": True,
                     "agent_used": "llm_fallback",
                     "intent": intent,
-                    "response": response.text,
+                    "response": response_text,
                     "chunks": []
                 }
         except Exception as e:
@@ -166,21 +356,12 @@ Réponse:"""
             "success": True,
             "agent_used": "fallback",
             "intent": intent,
-            "response": "Je vous remercie pour votre question. Pour obtenir une réponse précise, je vous invite à consulter le site www.esilv.fr ou à contacter directement notre équipe d'admission.",
+            "response": FALLBACK_RESPONSE,
             "chunks": []
         }
     
-    def route_stream(self, query: str, context: Dict[str, Any] = None):
-        """
-        Route la requête vers l'agent approprié en mode streaming
-        
-        Args:
-            query: La requête utilisateur
-            context: Contexte additionnel (optionnel)
-            
-        Yields:
-            Chunks de la réponse de l'agent sélectionné
-        """
+    def _route_stream(self, query: str, context: Dict[str, Any] = None):
+        """Corps de route_stream() (étapes mesurées dans la trace ouverte par route_stream)"""
         if not self.agents:
             yield {
                 "success": False,
@@ -189,25 +370,31 @@ Réponse:"""
             }
             return
         
+        # Recherche anticipée en parallèle de l'analyse d'intention (souvent un appel LLM)
+        prefetches = self._start_prefetch(query, context)
+        
         # Analyser l'intention
-        intent = self._analyze_intent(query)
-        print(f"\nIntention détectée: {intent}")
+        with span("intent"):
+            intent = self._analyze_intent(query)
+        set_attribute("intent", intent)
+        logger.debug(f"Intention détectée: {intent}")
         
         # Trouver le premier agent capable de traiter la requête
         for agent in self.agents:
             if agent.can_handle(query, context):
-                print(f"Routage vers: {agent.name}")
+                logger.debug(f"Routage vers: {agent.name}")
                 try:
+                    agent_context = self._agent_context(agent, context, prefetches)
                     # Vérifier si l'agent supporte le streaming
                     if hasattr(agent, 'process_stream'):
-                        for chunk in agent.process_stream(query, context):
+                        for chunk in agent.process_stream(query, agent_context):
                             chunk["agent_used"] = agent.name
                             chunk["intent"] = intent
                             yield chunk
                         return
                     else:
                         # Fallback sur process normal si pas de streaming
-                        result = agent.process(query, context)
+                        result = agent.process(query, agent_context)
                         result["agent_used"] = agent.name
                         result["intent"] = intent
                         yield result
@@ -217,22 +404,17 @@ Réponse:"""
                     continue
         
         # Aucun agent spécialisé n'a pu traiter - utiliser le LLM générique comme fallback
+        for future in prefetches.values():
+            future.cancel()
         print("Aucun agent spécialisé disponible - utilisation du LLM générique")
         try:
             if self.llm:
-                prompt = f"""Tu es un assistant virtuel de l'ESILV (École Supérieure d'Ingénieurs Léonard de Vinci).
-Réponds de manière professionnelle et courtoise à cette question, même si tu n'as pas toutes les informations.
-Si tu ne peux pas répondre précisément, oriente vers le site web de l'ESILV ou propose de contacter l'école.
-
-Question: {query}
-
-Réponse:"""
-                response = self.llm.generate_content(prompt)
+                response_text = self.llm.generate(FALLBACK_PROMPT.format(query=query))
                 yield {
                     "success": True,
                     "agent_used": "llm_fallback",
                     "intent": intent,
-                    "response": response.text,
+                    "response": response_text,
                     "chunks": []
                 }
                 return
@@ -244,10 +426,131 @@ Réponse:"""
             "success": True,
             "agent_used": "fallback",
             "intent": intent,
-            "response": "Je vous remercie pour votre question. Pour obtenir une réponse précise, je vous invite à consulter le site www.esilv.fr ou à contacter directement notre équipe d'admission.",
+            "response": FALLBACK_RESPONSE,
+            "chunks": []
+        }
+    
+    def _astart_prefetch(self, query: str, context: Dict[str, Any] = None) -> Dict[BaseAgent, asyncio.Task]:
+        """Version asyncio de _start_prefetch() : une tâche par agent"""
+        if not self.speculative:
+            return {}
+        
+        return {
+            agent: asyncio.create_task(agent.aprefetch(query, context))
+            for agent in self.agents
+            if overrides(agent, 'prefetch') or overrides(agent, 'aprefetch')
+        }
+    
+    async def _aagent_context(self, agent: BaseAgent, context: Dict[str, Any], prefetches: Dict[BaseAgent, asyncio.Task]) -> Dict[str, Any]:
+        """Version asyncio de _agent_context()"""
+        for other, task in prefetches.items():
+            if other is not agent:
+                task.cancel()
+        
+        task = prefetches.get(agent)
+        if task is None:
+            return context
+        
+        try:
+            prefetched = await task
+        except Exception as e:
+            print(f"Erreur lors du prefetch de {agent.name}: {e}")
+            return context
+        
+        if prefetched is None:
+            return context
+        
+        return {**(context or {}), "prefetched": prefetched}
+    
+    async def _afallback(self, query: str, intent: str) -> Dict[str, Any]:
+        """Réponse du LLM générique (ou message par défaut) sans bloquer la boucle"""
+        print("Aucun agent spécialisé disponible - utilisation du LLM générique")
+        try:
+            if self.llm:
+                response_text = await self.llm.agenerate(FALLBACK_PROMPT.format(query=query))
+                return {
+                    "success": True,
+                    "agent_used": "llm_fallback",
+                    "intent": intent,
+                    "response": response_text,
+                    "chunks": []
+                }
+        except Exception as e:
+            print(f"Erreur LLM fallback: {e}")
+        
+        return {
+            "success": True,
+            "agent_used": "fallback",
+            "intent": intent,
+            "response": FALLBACK_RESPONSE,
             "chunks": []
         }
     
+    async def _aroute(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Corps de aroute() (étapes mesurées dans la trace ouverte par aroute)"""
+        if not self.agents:
+            return {
+                "success": False,
+                "error": "Aucun agent disponible",
+                "agent": "orchestrator"
+            }
+        
+        prefetches = self._astart_prefetch(query, context)
+        with span("intent"):
+            intent = await self._aanalyze_intent(query)
+        set_attribute("intent", intent)
+        logger.debug(f"Intention détectée: {intent}")
+        
+        for agent in self.agents:
+            if agent.can_handle(query, context):
+                logger.debug(f"Routage vers: {agent.name}")
+                try:
+                    result = await agent.aprocess(query, await self._aagent_context(agent, context, prefetches))
+                    result["agent_used"] = agent.name
+                    result["intent"] = intent
+                    return result
+                except Exception as e:
+                    print(f"Erreur lors du traitement par {agent.name}: {e}")
+                    continue
+        
+        for task in prefetches.values():
+            task.cancel()
+        return await self._afallback(query, intent)
+    
+    async def _aroute_stream(self, query: str, context: Dict[str, Any] = None):
+        """Corps de aroute_stream() (étapes mesurées dans la trace ouverte par aroute_stream)"""
+        if not self.agents:
+            yield {
+                "success": False,
+                "error": "Aucun agent disponible",
+                "agent": "orchestrator"
+            }
+            return
+        
+        prefetches = self._astart_prefetch(query, context)
+        with span("intent"):
+            intent = await self._aanalyze_intent(query)
+        set_attribute("intent", intent)
+        logger.debug(f"Intention détectée: {intent}")
+        
+        for agent in self.agents:
+            if agent.can_handle(query, context):
+                logger.debug(f"Routage vers: {agent.name}")
+                try:
+                    agent_context = await self._aagent_context(agent, context, prefetches)
+                    async for chunk in agent.aprocess_stream(query, agent_context):
+                        chunk["agent_used"] = agent.name
+                        chunk["intent"] = intent
+                        yield chunk
+                    return
+                except Exception as e:
+                    print(f"Erreur lors du traitement par {agent.name}: {e}")
+                    continue
+        
+        for task in prefetches.values():
+            task.cancel()
+        yield await self._afallback(query, intent)
+    
     def list_agents(self) -> List[str]:
         """Retourne la liste des agents enregistrés"""
         return [agent.name for agent in self.agents]
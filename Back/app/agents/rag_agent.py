@@ -91,6 +91,19 @@ class RAGAgent(BaseAgent):
         
         return not is_contact_request
     
+    def prefetch(self, query: str, context: Dict[str, Any] = None):
+        """
+        Recherche FAISS anticipée (embedding + recherche dans les index)
+        
+        Returns:
+            Documents retrouvés, ou None si le RAG n'est pas disponible
+        """
+        if not self.rag_system:
+            return None
+        
+        k = context.get('k', 5) if context else 5
+        return self.rag_system.retrieve(query, k=k)
+    
     def process(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Traite la requête en utilisant le système RAG
@@ -112,9 +125,11 @@ class RAGAgent(BaseAgent):
         try:
             # Récupérer le nombre de chunks à rechercher depuis le contexte
             k = context.get('k', 5) if context else 5
+            # Documents déjà recherchés par l'orchestrateur pendant l'analyse d'intention
+            docs = context.get('prefetched') if context else None
             
             # Utiliser la méthode answer() du système RAG
-            response, chunks = self.rag_system.answer(query, k=k)
+            response, chunks = self.rag_system.answer(query, k=k, docs=docs)
             
             return {
                 "success": True,
@@ -153,12 +168,14 @@ class RAGAgent(BaseAgent):
         try:
             # Récupérer le nombre de chunks à rechercher depuis le contexte
             k = context.get('k', 5) if context else 5
+            # Documents déjà recherchés par l'orchestrateur pendant l'analyse d'intention
+            docs = context.get('prefetched') if context else None
             
             # Utiliser la méthode answer_stream() du système RAG
             full_response = ""
             chunks = []
             
-            for chunk in self.rag_system.answer_stream(query, k=k):
+            for chunk in self.rag_system.answer_stream(query, k=k, docs=docs):
                 # Vérifier si c'est les docs finaux
                 if isinstance(chunk, tuple) and chunk[0] == "__DOCS__":
                     chunks = chunk[1]
@@ -187,6 +204,88 @@ class RAGAgent(BaseAgent):
                 "response": "Désolé, une erreur s'est produite lors de la recherche d'informations."
             }
     
+    async def aprefetch(self, query: str, context: Dict[str, Any] = None):
+        """Version asyncio de prefetch() (recherche FAISS dans un thread)"""
+        if not self.rag_system:
+            return None
+        
+        k = context.get('k', 5) if context else 5
+        return await self.rag_system.aretrieve(query, k=k)
+    
+    async def aprocess(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Version asyncio de process() : l'appel LLM n'occupe pas de thread"""
+        if not self.rag_system:
+            return {
+                "success": False,
+                "error": "Le système RAG n'est pas disponible",
+                "response": "Désolé, le système de réponse n'est pas disponible actuellement."
+            }
+        
+        try:
+            k = context.get('k', 5) if context else 5
+            docs = context.get('prefetched') if context else None
+            
+            response, chunks = await self.rag_system.aanswer(query, k=k, docs=docs)
+            
+            return {
+                "success": True,
+                "response": response,
+                "chunks": chunks,
+                "num_chunks": len(chunks)
+            }
+        
+        except Exception as e:
+            print(f"Erreur lors du traitement RAG: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "response": "Désolé, une erreur s'est produite lors de la recherche d'informations."
+            }
+    
+    async def aprocess_stream(self, query: str, context: Dict[str, Any] = None):
+        """Version asyncio de process_stream() : l'appel LLM n'occupe pas de thread"""
+        if not self.rag_system:
+            yield {
+                "success": False,
+                "error": "Le système RAG n'est pas disponible",
+                "response": "Désolé, le système de réponse n'est pas disponible actuellement."
+            }
+            return
+        
+        try:
+            k = context.get('k', 5) if context else 5
+            docs = context.get('prefetched') if context else None
+            
+            full_response = ""
+            chunks = []
+            
+            async for chunk in self.rag_system.aanswer_stream(query, k=k, docs=docs):
+                if isinstance(chunk, tuple) and chunk[0] == "__DOCS__":
+                    chunks = chunk[1]
+                else:
+                    full_response += chunk
+                    yield {
+                        "success": True,
+                        "chunk": chunk,
+                        "is_final": False
+                    }
+            
+            yield {
+                "success": True,
+                "response": full_response,
+                "chunks": chunks,
+                "num_chunks": len(chunks),
+                "is_final": True
+            }
+        
+        except Exception as e:
+            print(f"Erreur lors du traitement RAG en streaming: {e}")
+            yield {
+                "success": False,
+                "error": str(e),
+                "response": "Désolé, une erreur s'est produite lors de la recherche d'informations."
+            }
+    
     def get_description(self) -> str:
         """Retourne une description de l'agent"""
         return f"{self.name}: Répond aux questions sur l'ESILV en utilisant le système RAG"
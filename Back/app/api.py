@@ -0,0 +1,198 @@
+"""
+Service HTTP (ASGI) exposant l'orchestrateur aux clients autres que Streamlit
+
+Endpoints :
+- POST /ask         : réponse complète (une question, ou un lot de questions traitées en parallèle)
+- POST /ask/stream  : réponse en streaming (Server-Sent Events)
+- POST /contact     : soumission du formulaire de contact
+- GET  /health      : état du service (agents, préchauffage du modèle)
+- GET  /metrics     : histogrammes des étapes et des requêtes (format texte Prometheus)
+- GET  /metrics.json: mêmes métriques (p50/p95/p99) et dernières traces en JSON
+
+L'en-tête X-Request-ID, s'il est fourni, sert d'identifiant à la trace de la requête.
+
+Un seul OrchestratorAgent est partagé par toutes les requêtes du processus.
+Lancement :
+    python Back/app/api.py
+"""
+import asyncio
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+# Ajouter les chemins nécessaires (même ordre que Front/streamlit_app.py)
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(APP_DIR))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.join(APP_DIR, "agents"))
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from orchestrator import OrchestratorAgent
+from rag_agent import RAGAgent
+from contact_agent import ContactAgent
+from rag import RAG_WARMUP, start_warmup, get_warmup_status
+from telemetry import metrics_json, metrics_prometheus, recent_traces
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Durée de maintien des connexions inactives, supérieure au délai des load balancers (60s en général)
+API_KEEP_ALIVE = int(os.getenv("API_KEEP_ALIVE", "75"))
+# Nombre maximal de questions dans un lot /ask
+API_MAX_BATCH = int(os.getenv("API_MAX_BATCH", "16"))
+
+
+class AskRequest(BaseModel):
+    query: Optional[str] = None
+    queries: Optional[List[str]] = None
+    k: int = 5
+
+
+class StreamRequest(BaseModel):
+    query: str
+    k: int = 5
+
+
+class ContactRequest(BaseModel):
+    nom: str
+    prenom: str
+    email: str
+    objet: str
+    message: str
+    telephone: Optional[str] = None
+    service: Optional[str] = None
+    service_email: Optional[str] = None
+
+
+_state: Dict[str, Any] = {}
+
+
+def build_orchestrator():
+    """Crée l'orchestrateur partagé et enregistre les agents"""
+    orchestrator = OrchestratorAgent()
+
+    try:
+        rag_agent = RAGAgent()
+        orchestrator.register_agent(rag_agent)
+    except Exception as e:
+        print(f"Impossible d'initialiser le RAG Agent: {e}")
+
+    contact_agent = ContactAgent()
+    orchestrator.register_agent(contact_agent)
+    return orchestrator, contact_agent
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if RAG_WARMUP:
+        start_warmup()
+    _state["orchestrator"], _state["contact_agent"] = await asyncio.to_thread(build_orchestrator)
+    yield
+    _state.clear()
+
+
+app = FastAPI(title="ESILV Smart Assistant API", lifespan=lifespan)
+
+
+def get_orchestrator() -> OrchestratorAgent:
+    orchestrator = _state.get("orchestrator")
+    if orchestrator is None:
+        raise HTTPException(status_code=503, detail="Service en cours de démarrage")
+    return orchestrator
+
+
+@app.post("/ask")
+async def ask(request: AskRequest, x_request_id: Optional[str] = Header(None)):
+    """Réponse complète ; un lot de questions est traité en parallèle"""
+    orchestrator = get_orchestrator()
+    context = {"k": request.k, "request_id": x_request_id}
+
+    if request.queries is not None:
+        if not request.queries or len(request.queries) > API_MAX_BATCH:
+            raise HTTPException(status_code=400, detail=f"Entre 1 et {API_MAX_BATCH} questions par lot")
+        results = await asyncio.gather(*(
+            orchestrator.aroute(q, {**context, "request_id": f"{x_request_id}-{i}" if x_request_id else None})
+            for i, q in enumerate(request.queries)
+        ))
+        return {"results": results}
+
+    if not request.query or not request.query.strip():
+        raise HTTPException(status_code=400, detail="Champ 'query' requis")
+    return await orchestrator.aroute(request.query, context)
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {payload}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(request: StreamRequest, x_request_id: Optional[str] = Header(None)):
+    """Réponse en Server-Sent Events : un événement par chunk, puis un événement 'done'"""
+    orchestrator = get_orchestrator()
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Champ 'query' requis")
+
+    async def events():
+        try:
+            async for chunk in orchestrator.aroute_stream(request.query, {"k": request.k, "request_id": x_request_id}):
+                yield _sse(chunk)
+        except Exception as e:
+            yield _sse({"success": False, "error": str(e)}, event="error")
+        yield _sse({}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/contact")
+async def contact(request: ContactRequest):
+    """Valide et enregistre une demande de contact"""
+    contact_agent = _state.get("contact_agent")
+    if contact_agent is None:
+        raise HTTPException(status_code=503, detail="Service en cours de démarrage")
+
+    form_data = {key: value for key, value in request.model_dump().items() if value is not None}
+    result = await asyncio.to_thread(contact_agent.validate_and_submit_form, form_data)
+    if not result.get("success"):
+        raise HTTPException(status_code=400, detail=result)
+    return result
+
+
+@app.get("/health")
+async def health():
+    """Etat du service : 'ok' quand le modèle d'embedding est prêt"""
+    orchestrator = _state.get("orchestrator")
+    embedding = get_warmup_status()
+    return {
+        "status": "ok" if orchestrator is not None and embedding == "ready" else "starting",
+        "agents": orchestrator.list_agents() if orchestrator is not None else [],
+        "embedding_model": embedding,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métriques au format texte d'exposition Prometheus"""
+    return PlainTextResponse(metrics_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics.json")
+async def metrics_as_json(traces: int = 20):
+    """Percentiles par étape et dernières traces (durée de chaque étape par requête)"""
+    return {**metrics_json(), "traces": recent_traces(traces)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=API_HOST, port=API_PORT, timeout_keep_alive=API_KEEP_ALIVE)
@@ -0,0 +1,589 @@
+"""
+Module de synchronisation incrémentale avec Cloud Storage
+Les fichiers sont découpés en segments adressés par leur contenu et décrits par
+un manifeste distant : seuls les segments modifiés sont transférés, en parallèle.
+Le manifeste est publié avec une précondition de génération : deux envois
+simultanés ne s'écrasent pas, le second recharge le manifeste et recommence.
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from json_store import file_lock
+
+try:
+    import google_crc32c
+except ImportError:
+    google_crc32c = None
+
+# Cloud Storage bucket name
+GCS_BUCKET = "esilv-chatbot-data"
+
+# Layout distant
+MANIFEST_NAME = "manifest.json"
+SEGMENTS_PREFIX = "segments/"
+MANIFEST_VERSION = 1
+# Tentatives de publication du manifeste en cas d'envoi concurrent
+MANIFEST_RETRIES = int(os.getenv("SYNC_MANIFEST_RETRIES", "5"))
+
+# Nombre de transferts simultanés
+MAX_WORKERS = int(os.getenv("SYNC_MAX_WORKERS", "8"))
+
+# Découpage en segments : une frontière est posée après une ligne dont le CRC32
+# vérifie le masque. Les frontières dépendent du contenu et non de la position,
+# un ajout au milieu du mapping JSON ne décale donc pas les segments suivants.
+MIN_SEGMENT_SIZE = 8 * 1024
+MAX_SEGMENT_SIZE = 64 * 1024
+SEGMENT_BOUNDARY_MASK = 0x0F
+
+
+class PreconditionFailed(Exception):
+    """L'objet a été modifié depuis sa lecture (génération différente)"""
+
+
+class StorageBackend:
+    """Interface minimale d'un stockage d'objets (GCS ou dossier local)"""
+
+    def read(self, name: str) -> bytes:
+        """Lit un objet. Lève FileNotFoundError s'il n'existe pas"""
+        raise NotImplementedError
+
+    def read_versioned(self, name: str) -> Tuple[bytes, int]:
+        """Lit un objet et sa génération. Lève FileNotFoundError s'il n'existe pas"""
+        raise NotImplementedError
+
+    def write(self, name: str, data: bytes, if_generation_match: Optional[int] = None):
+        """
+        Écrit (ou remplace) un objet
+
+        Args:
+            if_generation_match: Génération attendue de l'objet (0 : ne doit pas
+                exister). Lève PreconditionFailed si elle a changé
+        """
+        raise NotImplementedError
+
+    def exists(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def stat(self, name: str) -> Optional[Dict[str, Any]]:
+        """Retourne {"name", "size", "md5"} ou None si l'objet n'existe pas"""
+        raise NotImplementedError
+
+    def list(self, prefix: str = "") -> List[Dict[str, Any]]:
+        """Liste les objets sous un préfixe (mêmes champs que stat)"""
+        raise NotImplementedError
+
+    def delete(self, name: str):
+        raise NotImplementedError
+
+
+class GCSBackend(StorageBackend):
+    """Backend Google Cloud Storage (checksums MD5 vérifiés par le SDK)"""
+
+    def __init__(self, bucket_name: str = GCS_BUCKET):
+        from google.cloud import storage
+
+        self.bucket_name = bucket_name
+        self.client = storage.Client()
+        self.bucket = self.client.bucket(bucket_name)
+
+    @staticmethod
+    def _describe(blob) -> Dict[str, Any]:
+        md5 = base64.b64decode(blob.md5_hash).hex() if blob.md5_hash else None
+        return {"name": blob.name, "size": blob.size, "md5": md5}
+
+    def read(self, name: str) -> bytes:
+        from google.api_core.exceptions import NotFound
+
+        try:
+            return self.bucket.blob(name).download_as_bytes(checksum="md5")
+        except NotFound:
+            raise FileNotFoundError(name)
+
+    def read_versioned(self, name: str) -> Tuple[bytes, int]:
+        from google.api_core.exceptions import NotFound, PreconditionFailed as GCSPreconditionFailed
+
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            raise FileNotFoundError(name)
+        try:
+            data = blob.download_as_bytes(checksum="md5", if_generation_match=blob.generation)
+        except (NotFound, GCSPreconditionFailed):
+            # Remplacé entre get_blob et le téléchargement : relire
+            return self.read_versioned(name)
+        return data, blob.generation
+
+    def write(self, name: str, data: bytes, if_generation_match: Optional[int] = None):
+        from google.api_core.exceptions import PreconditionFailed as GCSPreconditionFailed
+
+        try:
+            self.bucket.blob(name).upload_from_string(data, checksum="md5", if_generation_match=if_generation_match)
+        except GCSPreconditionFailed:
+            raise PreconditionFailed(name)
+
+    def exists(self, name: str) -> bool:
+        return self.bucket.blob(name).exists()
+
+    def stat(self, name: str) -> Optional[Dict[str, Any]]:
+        blob = self.bucket.get_blob(name)
+        return self._describe(blob) if blob is not None else None
+
+    def list(self, prefix: str = "") -> List[Dict[str, Any]]:
+        return [
+            self._describe(blob)
+            for blob in self.client.list_blobs(self.bucket_name, prefix=prefix)
+            if not blob.name.endswith("/")
+        ]
+
+    def delete(self, name: str):
+        self.bucket.blob(name).delete()
+
+
+class LocalDirectoryBackend(StorageBackend):
+    """Backend dossier local, remplaçant de GCS pour les tests et le développement"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split("/"))
+
+    def read(self, name: str) -> bytes:
+        with open(self._path(name), "rb") as f:
+            return f.read()
+
+    @staticmethod
+    def _generation(path: str) -> int:
+        return os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+
+    def read_versioned(self, name: str) -> Tuple[bytes, int]:
+        path = self._path(name)
+        with file_lock(path):
+            with open(path, "rb") as f:
+                return f.read(), self._generation(path)
+
+    def write(self, name: str, data: bytes, if_generation_match: Optional[int] = None):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with file_lock(path):
+            if if_generation_match is not None and self._generation(path) != if_generation_match:
+                raise PreconditionFailed(name)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            # Génération distincte même si deux écritures tombent dans le même tick d'horloge
+            if if_generation_match is not None and self._generation(path) == if_generation_match:
+                os.utime(path, ns=(if_generation_match + 1, if_generation_match + 1))
+
+    def exists(self, name: str) -> bool:
+        return os.path.isfile(self._path(name))
+
+    def stat(self, name: str) -> Optional[Dict[str, Any]]:
+        path = self._path(name)
+        if not os.path.isfile(path):
+            return None
+        return {"name": name, "size": os.path.getsize(path), "md5": file_md5(path)}
+
+    def list(self, prefix: str = "") -> List[Dict[str, Any]]:
+        results = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                rel = os.path.relpath(os.path.join(dirpath, filename), self.root)
+                name = rel.replace(os.sep, "/")
+                if name.startswith(prefix) and ".tmp" not in filename and not filename.endswith(".lock"):
+                    results.append(self.stat(name))
+        return sorted(results, key=lambda item: item["name"])
+
+    def delete(self, name: str):
+        path = self._path(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def get_default_backend() -> StorageBackend:
+    """
+    Backend utilisé par défaut : dossier local si SYNC_LOCAL_DIR est défini,
+    sinon le bucket Cloud Storage (SYNC_BUCKET ou GCS_BUCKET)
+    """
+    local_dir = os.getenv("SYNC_LOCAL_DIR")
+    if local_dir:
+        return LocalDirectoryBackend(local_dir)
+    return GCSBackend(os.getenv("SYNC_BUCKET", GCS_BUCKET))
+
+
+def file_md5(path: str) -> str:
+    """MD5 hexadécimal d'un fichier local"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def crc32c_hex(data: bytes) -> Optional[str]:
+    """CRC32C hexadécimal (None si google-crc32c n'est pas installé)"""
+    if google_crc32c is None:
+        return None
+    return google_crc32c.value(data).to_bytes(4, "big").hex()
+
+
+def split_segments(data: bytes) -> List[bytes]:
+    """
+    Découpe un contenu en segments dont les frontières dépendent du contenu
+
+    Args:
+        data: Contenu complet du fichier
+
+    Returns:
+        Liste de segments dont la concaténation redonne data
+    """
+    segments = []
+    start = 0
+    pos = 0
+    length = len(data)
+
+    while pos < length:
+        newline = data.find(b"\n", pos)
+        line_end = length if newline == -1 else newline + 1
+
+        # Couper les très longues lignes (fichiers binaires, JSON compact)
+        if line_end - start > MAX_SEGMENT_SIZE:
+            line_end = start + MAX_SEGMENT_SIZE
+            segments.append(data[start:line_end])
+            start = pos = line_end
+            continue
+
+        size = line_end - start
+        if size >= MIN_SEGMENT_SIZE and (zlib.crc32(data[pos:line_end]) & SEGMENT_BOUNDARY_MASK) == 0:
+            segments.append(data[start:line_end])
+            start = line_end
+        pos = line_end
+
+    if start < length:
+        segments.append(data[start:])
+
+    return segments
+
+
+def describe_content(data: bytes) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """
+    Calcule l'entrée de manifeste d'un contenu
+
+    Returns:
+        Tuple (entrée de manifeste, {md5 du segment: segment})
+    """
+    segments = split_segments(data)
+    by_hash = {}
+    hashes = []
+    for segment in segments:
+        segment_hash = hashlib.md5(segment).hexdigest()
+        by_hash[segment_hash] = segment
+        hashes.append(segment_hash)
+
+    entry = {
+        "size": len(data),
+        "md5": hashlib.md5(data).hexdigest(),
+        "crc32c": crc32c_hex(data),
+        "segments": hashes,
+        "updated_at": datetime.now().isoformat()
+    }
+    return entry, by_hash
+
+
+def load_manifest(backend: StorageBackend) -> Dict[str, Any]:
+    """Charge le manifeste distant (vide s'il n'existe pas encore)"""
+    return _load_manifest_versioned(backend)[0]
+
+
+def _load_manifest_versioned(backend: StorageBackend) -> Tuple[Dict[str, Any], int]:
+    """Manifeste distant et sa génération (0 s'il n'existe pas encore)"""
+    try:
+        data, generation = backend.read_versioned(MANIFEST_NAME)
+    except FileNotFoundError:
+        return {"version": MANIFEST_VERSION, "files": {}}, 0
+
+    try:
+        manifest = json.loads(data.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        print(f"Manifeste distant illisible, il sera réécrit: {e}")
+        return {"version": MANIFEST_VERSION, "files": {}}, generation
+
+    manifest.setdefault("files", {})
+    return manifest, generation
+
+
+def _save_manifest(backend: StorageBackend, manifest: Dict[str, Any], generation: int):
+    """Publie le manifeste si personne ne l'a remplacé depuis sa lecture (PreconditionFailed sinon)"""
+    manifest["version"] = MANIFEST_VERSION
+    manifest["updated_at"] = datetime.now().isoformat()
+    backend.write(
+        MANIFEST_NAME,
+        json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        if_generation_match=generation
+    )
+
+
+def _segment_name(segment_hash: str) -> str:
+    return f"{SEGMENTS_PREFIX}{segment_hash}"
+
+
+def push_files(
+    files: Dict[str, str],
+    backend: Optional[StorageBackend] = None,
+    max_workers: int = MAX_WORKERS
+) -> Dict[str, Any]:
+    """
+    Envoie des fichiers locaux vers le stockage distant en ne transférant que les segments nouveaux
+
+    Args:
+        files: Dictionnaire {nom distant: chemin local}
+        backend: Backend de stockage (get_default_backend() par défaut)
+        max_workers: Nombre d'envois simultanés
+
+    Returns:
+        Statistiques de synchronisation (fichiers envoyés/inchangés, segments et octets envoyés)
+
+    Raises:
+        PreconditionFailed: Manifeste remplacé par d'autres envois à chaque tentative
+    """
+    backend = backend or get_default_backend()
+
+    contents = {}
+    for remote_name, local_path in files.items():
+        if os.path.exists(local_path):
+            with open(local_path, "rb") as f:
+                contents[remote_name] = f.read()
+
+    uploaded = set()
+    report = {"uploaded_files": [], "skipped_files": [], "segments_uploaded": 0, "bytes_uploaded": 0}
+
+    for attempt in range(MANIFEST_RETRIES):
+        # Chaque tentative repart du manifeste courant : les entrées publiées
+        # entre-temps par un autre envoi sont conservées
+        manifest, generation = _load_manifest_versioned(backend)
+
+        known_segments = set(uploaded)
+        for entry in manifest["files"].values():
+            known_segments.update(entry.get("segments", []))
+
+        to_upload = {}
+        report["uploaded_files"], report["skipped_files"] = [], []
+        for remote_name, data in contents.items():
+            remote_entry = manifest["files"].get(remote_name)
+            if remote_entry and remote_entry.get("md5") == hashlib.md5(data).hexdigest():
+                report["skipped_files"].append(remote_name)
+                continue
+
+            entry, segments = describe_content(data)
+            for segment_hash, segment in segments.items():
+                if segment_hash not in known_segments:
+                    to_upload[segment_hash] = segment
+
+            manifest["files"][remote_name] = entry
+            report["uploaded_files"].append(remote_name)
+
+        if to_upload:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(
+                    lambda item: backend.write(_segment_name(item[0]), item[1]),
+                    to_upload.items()
+                ))
+            uploaded.update(to_upload)
+            report["segments_uploaded"] += len(to_upload)
+            report["bytes_uploaded"] += sum(len(segment) for segment in to_upload.values())
+
+        if not report["uploaded_files"]:
+            return report
+
+        # Le manifeste est publié en dernier : un lecteur ne voit jamais de segment manquant
+        try:
+            _save_manifest(backend, manifest, generation)
+            return report
+        except PreconditionFailed:
+            print(f"Manifeste modifié par un autre envoi, nouvelle tentative ({attempt + 1}/{MANIFEST_RETRIES})")
+            time.sleep(random.uniform(0, 0.2 * (attempt + 1)))
+
+    raise PreconditionFailed(MANIFEST_NAME)
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _verify(data: bytes, entry: Dict[str, Any]) -> bool:
+    if entry.get("md5") and hashlib.md5(data).hexdigest() != entry["md5"]:
+        return False
+    expected_crc = entry.get("crc32c")
+    if expected_crc and google_crc32c is not None and crc32c_hex(data) != expected_crc:
+        return False
+    return True
+
+
+def pull_files(
+    files: Dict[str, str],
+    backend: Optional[StorageBackend] = None,
+    max_workers: int = MAX_WORKERS,
+    manifest: Optional[Dict[str, Any]] = None,
+    remote_info: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, str]:
+    """
+    Met à jour des fichiers locaux depuis le stockage distant
+
+    Un fichier local dont le checksum correspond est conservé. Sinon seuls les
+    segments absents de la version locale sont téléchargés, en parallèle, puis
+    le fichier est reconstruit, vérifié et remplacé atomiquement. Les objets
+    absents du manifeste (layout historique) sont téléchargés en entier.
+
+    Args:
+        files: Dictionnaire {nom distant: chemin local}
+        backend: Backend de stockage (get_default_backend() par défaut)
+        max_workers: Nombre de téléchargements simultanés
+        manifest: Manifeste déjà chargé (optionnel)
+        remote_info: Résultats de stat()/list() déjà connus pour les objets
+                     hors manifeste, pour éviter une requête par fichier (optionnel)
+
+    Returns:
+        Dictionnaire {nom distant: statut} avec statut parmi
+        "up-to-date", "downloaded", "missing", "corrupted", "error: ..."
+    """
+    backend = backend or get_default_backend()
+    if manifest is None:
+        manifest = load_manifest(backend)
+
+    statuses = {}
+    plans = {}
+    needed_segments = set()
+    legacy = []
+
+    for remote_name, local_path in files.items():
+        entry = manifest["files"].get(remote_name)
+
+        if entry is None:
+            legacy.append(remote_name)
+            continue
+
+        local_segments = {}
+        if os.path.exists(local_path):
+            with open(local_path, "rb") as f:
+                local_data = f.read()
+            if _verify(local_data, entry):
+                statuses[remote_name] = "up-to-date"
+                continue
+            # Version locale périmée : réutiliser ses segments inchangés
+            _, local_segments = describe_content(local_data)
+
+        plans[remote_name] = (entry, local_segments)
+        needed_segments.update(h for h in entry["segments"] if h not in local_segments)
+
+    def fetch_segment(segment_hash):
+        return segment_hash, backend.read(_segment_name(segment_hash))
+
+    def fetch_legacy(remote_name):
+        local_path = files[remote_name]
+        try:
+            if remote_info and remote_name in remote_info:
+                info = remote_info[remote_name]
+            else:
+                info = backend.stat(remote_name)
+            if info is None:
+                return remote_name, "missing"
+            if os.path.exists(local_path) and info.get("md5") and file_md5(local_path) == info["md5"]:
+                return remote_name, "up-to-date"
+            data = backend.read(remote_name)
+            if info.get("md5") and hashlib.md5(data).hexdigest() != info["md5"]:
+                return remote_name, "corrupted"
+            _write_atomic(local_path, data)
+            return remote_name, "downloaded"
+        except Exception as e:
+            return remote_name, f"error: {e}"
+
+    fetched = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        legacy_futures = [executor.submit(fetch_legacy, name) for name in legacy]
+        segment_futures = {h: executor.submit(fetch_segment, h) for h in needed_segments}
+
+        for segment_hash, future in segment_futures.items():
+            try:
+                fetched[segment_hash] = future.result()[1]
+            except Exception as e:
+                print(f"✗ Segment {segment_hash} indisponible: {e}")
+
+        for future in legacy_futures:
+            remote_name, status = future.result()
+            statuses[remote_name] = status
+
+    for remote_name, (entry, local_segments) in plans.items():
+        try:
+            parts = []
+            for segment_hash in entry["segments"]:
+                segment = local_segments.get(segment_hash, fetched.get(segment_hash))
+                if segment is None:
+                    raise FileNotFoundError(f"segment {segment_hash}")
+                parts.append(segment)
+            data = b"".join(parts)
+
+            if not _verify(data, entry):
+                statuses[remote_name] = "corrupted"
+                continue
+
+            _write_atomic(files[remote_name], data)
+            statuses[remote_name] = "downloaded"
+        except Exception as e:
+            statuses[remote_name] = f"error: {e}"
+
+    return statuses
+
+
+def prune_segments(backend: Optional[StorageBackend] = None) -> int:
+    """
+    Supprime les segments distants qui ne sont plus référencés par le manifeste
+
+    Returns:
+        Nombre de segments supprimés
+    """
+    backend = backend or get_default_backend()
+    manifest = load_manifest(backend)
+
+    referenced = set()
+    for entry in manifest["files"].values():
+        referenced.update(_segment_name(h) for h in entry.get("segments", []))
+
+    removed = 0
+    for info in backend.list(SEGMENTS_PREFIX):
+        if info["name"] not in referenced:
+            backend.delete(info["name"])
+            removed += 1
+
+    return removed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Synchronisation des fichiers avec Cloud Storage")
+    parser.add_argument("action", choices=["push", "pull", "prune"])
+    parser.add_argument("files", nargs="*", help="Paires nom_distant=chemin_local")
+    args = parser.parse_args()
+
+    pairs = dict(item.split("=", 1) for item in args.files)
+
+    if args.action == "push":
+        print(json.dumps(push_files(pairs), indent=2))
+    elif args.action == "pull":
+        for name, status in pull_files(pairs).items():
+            print(f"{name}: {status}")
+    else:
+        print(f"{prune_segments()} segment(s) supprimé(s)")
@@ -23,6 +23,8 @@ except ImportError:
     UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "uploads")
     PROCESSED_DOCUMENTS_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "data", "processed_documents.json")
 
+from json_store import get_json_store
+
 try:
     import PyPDF2
 except ImportError:
@@ -58,22 +60,17 @@ def _get_file_size(file_path: str) -> int:
 
 def _load_processed_documents() -> Dict[str, Any]:
     """Charge les métadonnées des documents traités"""
-    if not os.path.exists(PROCESSED_DOCUMENTS_FILE):
-        return {}
-    
-    try:
-        with open(PROCESSED_DOCUMENTS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return {}
+    return get_json_store(PROCESSED_DOCUMENTS_FILE).load()
 
 
 def _save_processed_documents(documents: Dict[str, Any]):
-    """Sauvegarde les métadonnées des documents traités"""
-    os.makedirs(os.path.dirname(PROCESSED_DOCUMENTS_FILE), exist_ok=True)
-    
-    with open(PROCESSED_DOCUMENTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(documents, f, ensure_ascii=False, indent=2)
+    """Sauvegarde les métadonnées des documents traités (écriture atomique sous verrou)"""
+    get_json_store(PROCESSED_DOCUMENTS_FILE).replace(documents)
+
+
+def _update_processed_documents(mutate):
+    """Lecture-modification-écriture des métadonnées sans perdre les mises à jour concurrentes"""
+    return get_json_store(PROCESSED_DOCUMENTS_FILE).update(mutate)
 
 
 def extract_pdf_text(file_path: str) -> Tuple[str, int]:
@@ -270,8 +267,6 @@ def register_processed_document(
     Returns:
         The registered document metadata
     """
-    documents = _load_processed_documents()
-    
     doc_metadata = {
         "id": doc_id,
         "filename": original_filename,
@@ -283,8 +278,7 @@ def register_processed_document(
         "indexed": False
     }
     
-    documents[doc_id] = doc_metadata
-    _save_processed_documents(documents)
+    _update_processed_documents(lambda documents: documents.__setitem__(doc_id, doc_metadata))
     
     return doc_metadata
 
@@ -306,16 +300,15 @@ def mark_document_as_indexed(doc_id: str, chunk_count: int) -> bool:
     Returns:
         True if successful
     """
-    documents = _load_processed_documents()
-    
-    if doc_id in documents:
+    def mark(documents):
+        if doc_id not in documents:
+            return False
         documents[doc_id]["indexed"] = True
         documents[doc_id]["chunk_count"] = chunk_count
         documents[doc_id]["indexed_at"] = datetime.now().isoformat()
-        _save_processed_documents(documents)
         return True
     
-    return False
+    return _update_processed_documents(mark)
 
 
 def delete_document(doc_id: str) -> bool:
@@ -328,24 +321,19 @@ def delete_document(doc_id: str) -> bool:
     Returns:
         True if successful
     """
-    documents = _load_processed_documents()
+    # Delete metadata
+    doc_info = _update_processed_documents(lambda documents: documents.pop(doc_id, None))
+    if doc_info is None:
+        return False
     
-    if doc_id in documents:
-        doc_info = documents[doc_id]
-        
-        # Delete file if it exists
-        if os.path.exists(doc_info.get("saved_path", "")):
-            try:
-                os.remove(doc_info["saved_path"])
-            except OSError:
-                pass
-        
-        # Delete metadata
-        del documents[doc_id]
-        _save_processed_documents(documents)
-        return True
+    # Delete file if it exists
+    if os.path.exists(doc_info.get("saved_path", "")):
+        try:
+            os.remove(doc_info["saved_path"])
+        except OSError:
+            pass
     
-    return False
+    return True
 
 
 def search_documents(query: str) -> List[Dict[str, Any]]:
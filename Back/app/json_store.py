@@ -0,0 +1,234 @@
+"""
+Persistance des petits fichiers JSON partagés (métadonnées des documents)
+
+Les modifications étaient des lectures-modifications-écritures du fichier
+entier sans verrou : deux sessions Streamlit (ou deux processus) pouvaient
+perdre une mise à jour. JsonStore :
+- applique chaque modification sous un verrou de fichier inter-processus, sur
+  le contenu relu depuis le disque ;
+- regroupe les modifications arrivées pendant JSON_STORE_FLUSH_MS en une seule
+  lecture + écriture ;
+- écrit dans un fichier temporaire renommé ensuite (jamais de fichier tronqué)
+  et en JSON compact ;
+- n'écrase jamais un fichier illisible : les modifications du lot échouent
+  (seul replace() peut repartir d'un contenu vide) ;
+- applique chaque modification sur une copie, abandonnée si elle lève une
+  exception (pas de modification à moitié appliquée).
+"""
+import atexit
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Délai pendant lequel les modifications sont regroupées avant écriture
+JSON_STORE_FLUSH_MS = float(os.getenv("JSON_STORE_FLUSH_MS", "20"))
+
+
+@contextmanager
+def file_lock(path: str):
+    """Verrou exclusif inter-processus sur path + '.lock'"""
+    lock_path = path + ".lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with open(lock_path, "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def read_json(path: str, default: Any = None) -> Any:
+    """Contenu d'un fichier JSON, default s'il est absent ou illisible"""
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return default
+
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = None):
+    """Ecrit un fichier JSON via un fichier temporaire renommé (compact par défaut)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            if indent is None:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            else:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class JsonStore:
+    """
+    Fichier JSON (objet) modifié de façon sûre par plusieurs threads et processus
+
+    Args:
+        path: Chemin du fichier
+        flush_delay_ms: Délai de regroupement des modifications
+    """
+
+    def __init__(self, path: str, flush_delay_ms: float = JSON_STORE_FLUSH_MS):
+        self.path = path
+        self.flush_delay = flush_delay_ms / 1000.0
+        self._pending: List[Tuple[Callable[[Dict[str, Any]], Any], Future]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        # Nombre d'écritures disque (pour les benchmarks)
+        self.writes = 0
+
+    def load(self) -> Dict[str, Any]:
+        """Contenu actuel du fichier ({} s'il est absent ou illisible)"""
+        data = read_json(self.path, {})
+        return data if isinstance(data, dict) else {}
+
+    def update(self, mutate: Callable[[Dict[str, Any]], Any], wait: bool = True) -> Any:
+        """
+        Applique une modification au contenu du fichier
+
+        Args:
+            mutate: Fonction qui modifie le dictionnaire en place ; sa valeur de retour est renvoyée
+            wait: Attendre que la modification soit écrite sur disque
+
+        Returns:
+            Valeur retournée par mutate (None si wait=False)
+        """
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((mutate, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="json-store-writer", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return future.result() if wait else None
+
+    def replace(self, data: Dict[str, Any], wait: bool = True):
+        """Remplace tout le contenu du fichier (y compris un fichier illisible)"""
+        def mutate(current):
+            current.clear()
+            current.update(data)
+        mutate.replaces_content = True
+        self.update(mutate, wait=wait)
+
+    def flush(self):
+        """Ecrit immédiatement les modifications en attente"""
+        self._write_pending()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Laisser les modifications simultanées rejoindre le même lot
+            time.sleep(self.flush_delay)
+            self._wakeup.clear()
+            self._write_pending()
+
+    def _read_for_update(self) -> Dict[str, Any]:
+        """
+        Contenu du fichier avant un lot de modifications ({} s'il est absent)
+
+        Raises:
+            ValueError, OSError: fichier illisible ou qui ne contient pas un objet JSON
+        """
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{self.path} ne contient pas un objet JSON")
+        return data
+
+    def _write_pending(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        try:
+            with file_lock(self.path):
+                try:
+                    data, read_error = self._read_for_update(), None
+                except (ValueError, OSError) as e:
+                    # Fichier illisible : laissé tel quel, seul un remplacement complet s'applique
+                    print(f"Lecture de {self.path} impossible, modifications refusées: {e}")
+                    data, read_error = None, e
+
+                results, changed = [], False
+                for mutate, _ in batch:
+                    if data is None and not getattr(mutate, "replaces_content", False):
+                        results.append((None, read_error))
+                        continue
+                    candidate = copy.deepcopy(data) if data is not None else {}
+                    try:
+                        result = mutate(candidate)
+                    except Exception as e:
+                        results.append((None, e))
+                        continue
+                    data, changed = candidate, True
+                    results.append((result, None))
+
+                if changed:
+                    atomic_write_json(self.path, data)
+                    self.writes += 1
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), (result, error) in zip(batch, results):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_stores: Dict[str, JsonStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_json_store(path: str) -> JsonStore:
+    """Store partagé par tout le processus pour ce fichier"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = JsonStore(key)
+        return store
+
+
+@atexit.register
+def _flush_all():
+    for store in list(_stores.values()):
+        try:
+            store.flush()
+        except Exception as e:
+            print(f"Erreur lors de l'écriture de {store.path}: {e}")
@@ -0,0 +1,474 @@
+"""
+File d'enregistrement des demandes de contact
+
+ContactAgent enregistrait chaque formulaire de façon synchrone pendant la
+requête de chat. LeadQueue met le lead en file et rend la main aussitôt ; un
+thread regroupe les leads reçus pendant LEAD_QUEUE_FLUSH_MS et les écrit en une
+transaction (leads_manager.add_leads). Si l'écriture échoue, les leads sont
+ajoutés à un fichier de secours (NDJSON) rejoué séparément, après chaque lot ou
+toutes les LEAD_RETRY_INTERVAL secondes. Si le rejeu échoue, les lignes sont
+réessayées une à une : une ligne qui échoue alors que d'autres écritures
+réussissent est comptée, et mise en quarantaine après LEAD_SPOOL_MAX_ATTEMPTS
+échecs. Un notificateur optionnel (SMTP par défaut si SMTP_HOST est défini)
+transmet ensuite chaque lead au service concerné, depuis son propre thread pour
+qu'un serveur SMTP lent ne retarde pas l'écriture des leads suivants. Les
+notifications en échec sont gardées dans un second fichier de secours et
+renvoyées toutes les LEAD_RETRY_INTERVAL secondes (quarantaine après
+LEAD_SPOOL_MAX_ATTEMPTS échecs).
+"""
+import atexit
+import json
+import os
+import queue
+import smtplib
+import sys
+import threading
+from datetime import datetime
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from json_store import file_lock
+
+try:
+    from config import LEADS_DATA_DIR
+    _DEFAULT_SPOOL = str(LEADS_DATA_DIR / "pending_leads.ndjson")
+except ImportError:
+    _DEFAULT_SPOOL = os.path.join(os.path.dirname(__file__), "..", "..", "data", "leads", "pending_leads.ndjson")
+
+# Taille maximale d'un lot, attente pour le compléter (ms), intervalle entre deux reprises du fichier de secours (s)
+LEAD_QUEUE_BATCH_SIZE = int(os.getenv("LEAD_QUEUE_BATCH_SIZE", "50"))
+LEAD_QUEUE_FLUSH_MS = float(os.getenv("LEAD_QUEUE_FLUSH_MS", "200"))
+LEAD_RETRY_INTERVAL = float(os.getenv("LEAD_RETRY_INTERVAL", "30"))
+LEAD_SPOOL_PATH = os.getenv("LEAD_SPOOL_PATH", _DEFAULT_SPOOL)
+# Echecs d'une ligne du fichier de secours avant sa mise en quarantaine (fichier .quarantine.ndjson)
+LEAD_SPOOL_MAX_ATTEMPTS = int(os.getenv("LEAD_SPOOL_MAX_ATTEMPTS", "5"))
+# Fichier de secours des notifications non envoyées
+LEAD_NOTIFY_SPOOL_PATH = os.getenv(
+    "LEAD_NOTIFY_SPOOL_PATH", os.path.join(os.path.dirname(LEAD_SPOOL_PATH), "pending_notifications.ndjson")
+)
+
+# Notification par email des services (désactivée si SMTP_HOST est vide)
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "0") != "0"
+LEAD_NOTIFY_FROM = os.getenv("LEAD_NOTIFY_FROM", "assistant@esilv.fr")
+LEAD_NOTIFY_DEFAULT_TO = os.getenv("LEAD_NOTIFY_DEFAULT_TO", "contact@esilv.fr")
+
+
+def form_to_lead(form_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Lead à enregistrer pour un formulaire de contact (None si nom ou email manquant)"""
+    name = f"{form_data.get('prenom', '')} {form_data.get('nom', '')}".strip()
+    email = (form_data.get("email") or "").strip()
+    if not name or not email:
+        return None
+    return {
+        "name": name,
+        "email": email,
+        "education": None,
+        "program_of_interest": form_data.get("objet"),
+        "message": form_data.get("message", ""),
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+class LeadNotifier:
+    """Transmission d'un lead enregistré (email au service, webhook...)"""
+
+    def notify(self, lead: Dict[str, Any], form_data: Dict[str, Any]):
+        raise NotImplementedError
+
+
+class SmtpNotifier(LeadNotifier):
+    """
+    Envoie chaque lead par email à l'adresse du service (form_data["service_email"])
+
+    Args:
+        host, port: Serveur SMTP
+        sender: Adresse d'expédition
+        username, password: Identifiants (optionnels)
+        starttls: Passer en TLS après la connexion
+        default_to: Destinataire si le formulaire n'indique pas de service
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        sender: str = LEAD_NOTIFY_FROM,
+        username: str = SMTP_USER,
+        password: str = SMTP_PASSWORD,
+        starttls: bool = SMTP_STARTTLS,
+        default_to: str = LEAD_NOTIFY_DEFAULT_TO,
+        timeout: float = 10.0
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.default_to = default_to
+        self.timeout = timeout
+
+    def build_message(self, lead: Dict[str, Any], form_data: Dict[str, Any]) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = form_data.get("service_email") or self.default_to
+        message["Reply-To"] = lead["email"]
+        message["Subject"] = f"[Assistant ESILV] {form_data.get('objet') or 'Demande de contact'}"
+        lines = [
+            f"Nom : {lead['name']}",
+            f"Email : {lead['email']}",
+            f"Téléphone : {form_data.get('telephone') or '—'}",
+            f"Service : {form_data.get('service') or '—'}",
+            f"Reçu le : {lead.get('created_at', '')}",
+            "",
+            lead.get("message") or "",
+        ]
+        message.set_content("\n".join(lines))
+        return message
+
+    def notify(self, lead: Dict[str, Any], form_data: Dict[str, Any]):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(self.build_message(lead, form_data))
+
+
+def get_default_notifier() -> Optional[LeadNotifier]:
+    """Notificateur SMTP si SMTP_HOST est configuré"""
+    return SmtpNotifier() if SMTP_HOST else None
+
+
+def _default_writer(leads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    from leads_manager import add_leads
+    return add_leads(leads)
+
+
+class LeadQueue:
+    """
+    Enregistrement des leads en arrière-plan, par lots
+
+    Args:
+        writer: Fonction qui enregistre une liste de leads et retourne les leads créés
+        notifier: Notificateur appelé pour chaque lead enregistré (optionnel)
+        spool_path: Fichier de secours des leads non enregistrés
+        notify_spool_path: Fichier de secours des notifications non envoyées
+        batch_size: Taille maximale d'un lot
+        flush_ms: Attente maximale pour compléter un lot
+        retry_interval: Intervalle entre deux reprises du fichier de secours (s)
+        max_attempts: Echecs d'une ligne (lead ou notification) avant sa mise en quarantaine
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]] = _default_writer,
+        notifier: Optional[LeadNotifier] = None,
+        spool_path: str = LEAD_SPOOL_PATH,
+        notify_spool_path: str = LEAD_NOTIFY_SPOOL_PATH,
+        batch_size: int = LEAD_QUEUE_BATCH_SIZE,
+        flush_ms: float = LEAD_QUEUE_FLUSH_MS,
+        retry_interval: float = LEAD_RETRY_INTERVAL,
+        max_attempts: int = LEAD_SPOOL_MAX_ATTEMPTS
+    ):
+        self.writer = writer
+        self.notifier = notifier
+        self.spool_path = spool_path
+        self.batch_size = max(1, batch_size)
+        self.flush_wait = flush_ms / 1000.0
+        self.retry_interval = retry_interval
+        self.max_attempts = max(1, max_attempts)
+        self.quarantine_path = os.path.splitext(spool_path)[0] + ".quarantine.ndjson"
+        self.notify_spool_path = notify_spool_path
+        self.notify_quarantine_path = os.path.splitext(notify_spool_path)[0] + ".quarantine.ndjson"
+        self._queue: "queue.Queue" = queue.Queue()
+        self._notify_queue: "queue.Queue" = queue.Queue()
+        # Leads et notifications pas encore traités (attendus par flush)
+        self._unfinished = 0
+        self._idle = threading.Condition()
+        self.stats = {
+            "queued": 0, "written": 0, "spooled": 0, "replayed": 0, "quarantined": 0,
+            "notified": 0, "notify_errors": 0, "notify_spooled": 0, "notify_replayed": 0, "notify_quarantined": 0
+        }
+        self._thread = threading.Thread(target=self._run, name="lead-queue-writer", daemon=True)
+        self._thread.start()
+        self._notify_thread = None
+        if notifier is not None:
+            self._notify_thread = threading.Thread(target=self._run_notifier, name="lead-queue-notifier", daemon=True)
+            self._notify_thread.start()
+
+    def submit(self, form_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Met un formulaire en file et rend la main immédiatement
+
+        Returns:
+            Le lead en file (sans ID), ou None si nom ou email manquant
+        """
+        lead = form_to_lead(form_data)
+        if lead is None:
+            return None
+        with self._idle:
+            self._unfinished += 1
+            self.stats["queued"] += 1
+        self._queue.put((lead, form_data))
+        return lead
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Attend que tous les leads en file soient traités et notifiés (True si la file est vide)"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unfinished == 0, timeout=timeout)
+
+    def _collect(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Premier lead (ou liste vide après retry_interval), puis ceux arrivés pendant flush_ms"""
+        try:
+            batch = [self._queue.get(timeout=self.retry_interval)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=self.flush_wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                if batch or os.path.exists(self.spool_path):
+                    self._process(batch)
+            except Exception as e:
+                print(f"Erreur de la file des leads: {e}")
+            finally:
+                if batch:
+                    self._done(len(batch))
+
+    def _done(self, count: int):
+        with self._idle:
+            self._unfinished -= count
+            self._idle.notify_all()
+
+    def _process(self, batch: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Enregistre le lot, puis rejoue le fichier de secours indépendamment"""
+        store_up = False
+        if batch:
+            entries = [{"lead": lead, "form": form} for lead, form in batch]
+            try:
+                self._write(entries)
+                store_up = True
+            except Exception as e:
+                print(f"Enregistrement des leads impossible, {len(entries)} lead(s) mis en attente: {e}")
+                with file_lock(self.spool_path):
+                    self._append_spool(entries)
+                self.stats["spooled"] += len(entries)
+
+        if os.path.exists(self.spool_path):
+            self._replay_spool(store_up)
+
+    def _write(self, entries: List[Dict[str, Any]]):
+        """
+        Enregistre des leads puis confie chacun, avec le formulaire dont il provient, au thread de notification
+
+        Raises:
+            Exception: erreur du writer (aucun lead considéré comme enregistré)
+        """
+        saved = self.writer([entry["lead"] for entry in entries])
+        self.stats["written"] += len(saved)
+        print(f"{len(saved)} formulaire(s) de contact enregistré(s)")
+
+        if self.notifier is None:
+            return
+        if len(saved) != len(entries):
+            # Les leads sont écrits : ne pas les remettre en attente (doublons), mais sans
+            # correspondance sûre avec les formulaires aucune notification n'est envoyée
+            print(f"Le writer a retourné {len(saved)} lead(s) pour {len(entries)} envoyé(s), notifications ignorées")
+            return
+
+        # Correspondance par email et date de création (conservés par add_leads), l'ordre n'est qu'un repli
+        forms = {(entry["lead"]["email"], entry["lead"]["created_at"]): entry["form"] for entry in entries}
+        with self._idle:
+            self._unfinished += len(saved)
+        for lead, entry in zip(saved, entries):
+            form = forms.get((lead.get("email"), lead.get("created_at")), entry["form"])
+            self._notify_queue.put({"lead": lead, "form": form})
+
+    def _run_notifier(self):
+        """Envoie les notifications en file ; reprend le fichier de secours après un envoi réussi ou retry_interval"""
+        while True:
+            try:
+                entry = self._notify_queue.get(timeout=self.retry_interval)
+            except queue.Empty:
+                entry = None
+
+            try:
+                if entry is None or self._notify(entry):
+                    if os.path.exists(self.notify_spool_path):
+                        self._replay_notifications()
+            except Exception as e:
+                print(f"Erreur du thread de notification des leads: {e}")
+            finally:
+                if entry is not None:
+                    self._done(1)
+
+    def _notify(self, entry: Dict[str, Any]) -> bool:
+        """Envoie une notification, mise dans le fichier de secours en cas d'échec (False)"""
+        try:
+            self.notifier.notify(entry["lead"], entry["form"])
+            self.stats["notified"] += 1
+            return True
+        except Exception as e:
+            self.stats["notify_errors"] += 1
+            print(f"Notification du lead {entry['lead'].get('id')} impossible, mise en attente: {e}")
+            with file_lock(self.notify_spool_path):
+                self._append_spool([entry], self.notify_spool_path)
+            self.stats["notify_spooled"] += 1
+            return False
+
+    def _replay_notifications(self):
+        """Renvoie les notifications en attente ; s'arrête au premier échec si aucune n'est passée"""
+        with file_lock(self.notify_spool_path):
+            spooled = self._read_spool(self.notify_spool_path)
+            remaining, quarantined = [], []
+            server_up = False
+            for position, entry in enumerate(spooled):
+                try:
+                    self.notifier.notify(entry["lead"], entry["form"])
+                    self.stats["notify_replayed"] += 1
+                    server_up = True
+                except Exception as e:
+                    entry["attempts"] = entry.get("attempts", 0) + 1
+                    entry["last_error"] = str(e)
+                    if entry["attempts"] >= self.max_attempts:
+                        quarantined.append(entry)
+                    elif not server_up:
+                        # Serveur probablement indisponible : les suivantes attendent la prochaine
+                        # reprise, celle-ci repasse en fin de file pour ne pas les bloquer
+                        remaining.extend(spooled[position + 1:])
+                        remaining.append(entry)
+                        break
+                    else:
+                        remaining.append(entry)
+
+            if quarantined:
+                self._append_spool(quarantined, self.notify_quarantine_path)
+                self.stats["notify_quarantined"] += len(quarantined)
+                print(f"{len(quarantined)} notification(s) en échec répété mise(s) en quarantaine dans {self.notify_quarantine_path}")
+            self._rewrite_spool(remaining, self.notify_spool_path)
+
+    def _replay_spool(self, store_up: bool):
+        """
+        Rejoue le fichier de secours : en un lot, puis ligne par ligne si le lot échoue
+
+        Args:
+            store_up: Une écriture vient de réussir (un échec isolé vient alors de la ligne)
+        """
+        with file_lock(self.spool_path):
+            spooled = self._read_spool()
+            if not spooled:
+                self._remove_spool()
+                return
+
+            try:
+                self._write(spooled)
+                self.stats["replayed"] += len(spooled)
+                self._remove_spool()
+                print(f"{len(spooled)} lead(s) en attente enregistré(s)")
+                return
+            except Exception as e:
+                print(f"Rejeu du fichier de secours impossible ({e}), reprise ligne par ligne")
+
+            failed, untried = [], []
+            for position, entry in enumerate(spooled):
+                try:
+                    self._write([entry])
+                    self.stats["replayed"] += 1
+                    store_up = True
+                except Exception as e:
+                    failed.append((entry, e))
+                    if not store_up:
+                        # Aucune écriture n'a réussi : base probablement indisponible
+                        untried = spooled[position + 1:]
+                        break
+
+            remaining, quarantined = [], []
+            for entry, error in failed:
+                if store_up:
+                    entry["attempts"] = entry.get("attempts", 0) + 1
+                    entry["last_error"] = str(error)
+                (quarantined if entry.get("attempts", 0) >= self.max_attempts else remaining).append(entry)
+
+            if quarantined:
+                self._append_spool(quarantined, self.quarantine_path)
+                self.stats["quarantined"] += len(quarantined)
+                print(f"{len(quarantined)} lead(s) en échec répété mis en quarantaine dans {self.quarantine_path}")
+            self._rewrite_spool(remaining + untried)
+
+    def _read_spool(self, path: Optional[str] = None) -> List[Dict[str, Any]]:
+        path = path or self.spool_path
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Ligne tronquée par un arrêt pendant l'écriture
+                        continue
+        return entries
+
+    def _append_spool(self, entries: List[Dict[str, Any]], path: Optional[str] = None):
+        path = path or self.spool_path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite_spool(self, entries: List[Dict[str, Any]], path: Optional[str] = None):
+        """Remplace un fichier de secours (fichier temporaire renommé), supprimé s'il est vide"""
+        path = path or self.spool_path
+        if not entries:
+            self._remove_spool(path)
+            return
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        self._append_spool(entries, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _remove_spool(self, path: Optional[str] = None):
+        path = path or self.spool_path
+        if os.path.exists(path):
+            os.remove(path)
+
+
+_queue_instance: Optional[LeadQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_lead_queue() -> LeadQueue:
+    """File partagée par tout le processus"""
+    global _queue_instance
+    with _queue_lock:
+        if _queue_instance is None:
+            _queue_instance = LeadQueue(notifier=get_default_notifier())
+        return _queue_instance
+
+
+@atexit.register
+def _flush_on_exit():
+    if _queue_instance is not None:
+        _queue_instance.flush(timeout=5)
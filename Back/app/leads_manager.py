@@ -1,12 +1,16 @@
 """
 Module de gestion des leads/contacts collectés par le chatbot
-Stocke les leads au format JSON pour un accès et export facile
+Stocke les leads dans une base SQLite (mode WAL) indexée sur l'email et la date,
+avec une table FTS5 pour la recherche ; l'ancien leads.json est migré au premier accès
 """
 import json
 import os
+import re
+import sqlite3
 import sys
+import threading
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from pathlib import Path
 
 # Add project root to path for config import
@@ -14,13 +18,67 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 try:
-    from config import LEADS_DATA_DIR, LEADS_FILE_PATH
+    from config import LEADS_DATA_DIR, LEADS_FILE_PATH, LEADS_DB_PATH
     LEADS_DIR = str(LEADS_DATA_DIR)
     LEADS_FILE = str(LEADS_FILE_PATH)
+    LEADS_DB = str(LEADS_DB_PATH)
 except ImportError:
     # Fallback to defaults if config not available
     LEADS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "leads")
     LEADS_FILE = os.path.join(LEADS_DIR, "leads.json")
+    LEADS_DB = os.path.join(LEADS_DIR, "leads.db")
+
+LEAD_FIELDS = ["name", "email", "education", "program_of_interest", "message"]
+
+# Colonnes de l'export CSV et nombre de lignes par morceau des exports en streaming
+CSV_COLUMNS = [
+    ("ID", "id"),
+    ("Name", "name"),
+    ("Email", "email"),
+    ("Education", "education"),
+    ("Program of Interest", "program_of_interest"),
+    ("Message", "message"),
+    ("Collected Date", "created_at"),
+]
+EXPORT_CHUNK_ROWS = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    education TEXT,
+    program_of_interest TEXT,
+    message TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_leads_email ON leads(email COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_leads_created_at ON leads(created_at);
+CREATE INDEX IF NOT EXISTS idx_leads_program ON leads(program_of_interest);
+"""
+
+# Index plein texte sur le nom et l'email, tenu à jour par des triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(
+    name, email, content='leads', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS leads_ai AFTER INSERT ON leads BEGIN
+    INSERT INTO leads_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+END;
+CREATE TRIGGER IF NOT EXISTS leads_ad AFTER DELETE ON leads BEGIN
+    INSERT INTO leads_fts(leads_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+END;
+CREATE TRIGGER IF NOT EXISTS leads_au AFTER UPDATE ON leads BEGIN
+    INSERT INTO leads_fts(leads_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+    INSERT INTO leads_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+END;
+"""
+
+# Une connexion par thread (sessions Streamlit) et par base ; schéma créé une fois par base
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized: Dict[str, bool] = {}
 
 
 def ensure_leads_dir():
@@ -28,36 +86,175 @@ def ensure_leads_dir():
     os.makedirs(LEADS_DIR, exist_ok=True)
 
 
+def _init_db(conn: sqlite3.Connection) -> bool:
+    """Create the schema, returns True if FTS5 is available"""
+    conn.executescript(_SCHEMA)
+    try:
+        conn.executescript(_FTS_SCHEMA)
+        return True
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 indisponible, recherche par LIKE: {e}")
+        return False
+
+
+def _connect() -> sqlite3.Connection:
+    """
+    Connection to the leads database for the current thread
+
+    Returns:
+        sqlite3 connection (rows as sqlite3.Row)
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(LEADS_DB)
+    if conn is not None:
+        return conn
+
+    os.makedirs(os.path.dirname(os.path.abspath(LEADS_DB)), exist_ok=True)
+    conn = sqlite3.connect(LEADS_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=10000")
+
+    with _init_lock:
+        if LEADS_DB not in _initialized:
+            _initialized[LEADS_DB] = _init_db(conn)
+            migrate_json_leads(conn=conn)
+
+    connections[LEADS_DB] = conn
+    return conn
+
+
+def _fts_available() -> bool:
+    _connect()
+    return _initialized.get(LEADS_DB, False)
+
+
+def _row_to_lead(row: sqlite3.Row) -> Dict[str, Any]:
+    lead = dict(row)
+    if lead.get("updated_at") is None:
+        lead.pop("updated_at", None)
+    return lead
+
+
+_MIGRATE_INSERT = (
+    "INSERT INTO leads (id, name, email, education, program_of_interest, message, created_at, updated_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def migrate_json_leads(json_path: Optional[str] = None, conn: Optional[sqlite3.Connection] = None) -> int:
+    """
+    One-shot migration of the legacy leads.json into SQLite
+
+    Original IDs are kept when unique and free, other leads get a new ID; leads
+    already in the database (same name, email and date) are skipped, so a
+    concurrent or interrupted migration is harmless. The JSON file is then
+    renamed to *.migrated.
+
+    Args:
+        json_path: Legacy JSON file (LEADS_FILE by default)
+        conn: Connection to use (current thread's by default)
+
+    Returns:
+        Number of migrated leads (leads already in the database are skipped)
+    """
+    json_path = json_path or LEADS_FILE
+    if not os.path.exists(json_path):
+        return 0
+
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            leads = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Migration des leads impossible ({json_path}): {e}")
+        return 0
+
+    conn = conn or _connect()
+    seen_ids = set()
+    rows = []
+    for lead in leads:
+        lead_id = lead.get("id")
+        if not isinstance(lead_id, int) or lead_id in seen_ids:
+            lead_id = None
+        else:
+            seen_ids.add(lead_id)
+        rows.append((
+            lead_id,
+            lead.get("name") or "",
+            lead.get("email") or "",
+            lead.get("education"),
+            lead.get("program_of_interest"),
+            lead.get("message"),
+            lead.get("created_at") or datetime.now().isoformat(),
+            lead.get("updated_at"),
+        ))
+
+    inserted = 0
+    with conn:
+        # Verrou d'écriture dès le début : un autre processus qui migre en même temps attend ici
+        conn.execute("BEGIN IMMEDIATE")
+        renumbered = []
+        for row in rows:
+            lead_id, name, email, created_at = row[0], row[1], row[2], row[6]
+            if conn.execute(
+                "SELECT 1 FROM leads WHERE created_at = ? AND email = ? AND name = ?",
+                (created_at, email, name)
+            ).fetchone() is not None:
+                # Déjà migré (autre processus, ou migration interrompue avant le renommage)
+                continue
+            if lead_id is not None and conn.execute("SELECT 1 FROM leads WHERE id = ?", (lead_id,)).fetchone() is not None:
+                # ID déjà pris par un autre lead : nouvel ID (attribué après les IDs d'origine)
+                print(f"Lead {lead_id} ({email}) migré avec un nouvel ID")
+                lead_id = None
+            if lead_id is None:
+                renumbered.append((None,) + row[1:])
+                continue
+            conn.execute(_MIGRATE_INSERT, row)
+            inserted += 1
+        conn.executemany(_MIGRATE_INSERT, renumbered)
+        inserted += len(renumbered)
+    try:
+        os.replace(json_path, json_path + ".migrated")
+    except FileNotFoundError:
+        # Renommé par un autre processus qui a migré en même temps
+        pass
+    print(f"{inserted} leads migrés de {json_path} vers {LEADS_DB} ({len(rows) - inserted} déjà présents)")
+    return inserted
+
+
 def load_leads() -> List[Dict[str, Any]]:
     """
-    Load all leads from the JSON file
-    
+    Load all leads
+
     Returns:
         List of lead dictionaries
     """
-    ensure_leads_dir()
-    
-    if not os.path.exists(LEADS_FILE):
-        return []
-    
-    try:
-        with open(LEADS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return []
+    rows = _connect().execute("SELECT * FROM leads ORDER BY id").fetchall()
+    return [_row_to_lead(row) for row in rows]
 
 
 def save_leads(leads: List[Dict[str, Any]]):
     """
-    Save leads to the JSON file
-    
+    Replace all leads with the given list
+
     Args:
         leads: List of lead dictionaries
     """
-    ensure_leads_dir()
-    
-    with open(LEADS_FILE, "w", encoding="utf-8") as f:
-        json.dump(leads, f, ensure_ascii=False, indent=2)
+    conn = _connect()
+    with conn:
+        conn.execute("DELETE FROM leads")
+        conn.executemany(
+            "INSERT INTO leads (id, name, email, education, program_of_interest, message, created_at, updated_at) "
+            "VALUES (:id, :name, :email, :education, :program_of_interest, :message, :created_at, :updated_at)",
+            [
+                {"id": None, "updated_at": None, "education": None, "program_of_interest": None, "message": None, **lead}
+                for lead in leads
+            ]
+        )
 
 
 def add_lead(
@@ -69,21 +266,18 @@ def add_lead(
 ) -> Dict[str, Any]:
     """
     Add a new lead to the collection
-    
+
     Args:
         name: Lead's name
         email: Lead's email
         education: Current education/background (optional)
         program_of_interest: Program or major of interest (optional)
         message: Additional message or notes (optional)
-        
+
     Returns:
         The created lead dictionary
     """
-    leads = load_leads()
-    
     new_lead = {
-        "id": len(leads) + 1,
         "name": name.strip(),
         "email": email.strip(),
         "education": education.strip() if education else None,
@@ -91,17 +285,53 @@ def add_lead(
         "message": message.strip() if message else None,
         "created_at": datetime.now().isoformat()
     }
-    
-    leads.append(new_lead)
-    save_leads(leads)
-    
-    return new_lead
+
+    conn = _connect()
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO leads (name, email, education, program_of_interest, message, created_at) "
+            "VALUES (:name, :email, :education, :program_of_interest, :message, :created_at)",
+            new_lead
+        )
+
+    return {"id": cursor.lastrowid, **new_lead}
+
+
+def add_leads(leads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Add several leads in a single transaction
+
+    Args:
+        leads: Lead dictionaries (name and email required; created_at kept if present)
+
+    Returns:
+        The created leads, with their IDs
+    """
+    created = []
+    conn = _connect()
+    with conn:
+        for lead in leads:
+            new_lead = {
+                "name": (lead.get("name") or "").strip(),
+                "email": (lead.get("email") or "").strip(),
+                "education": lead.get("education"),
+                "program_of_interest": lead.get("program_of_interest"),
+                "message": lead.get("message"),
+                "created_at": lead.get("created_at") or datetime.now().isoformat()
+            }
+            cursor = conn.execute(
+                "INSERT INTO leads (name, email, education, program_of_interest, message, created_at) "
+                "VALUES (:name, :email, :education, :program_of_interest, :message, :created_at)",
+                new_lead
+            )
+            created.append({"id": cursor.lastrowid, **new_lead})
+    return created
 
 
 def get_leads() -> List[Dict[str, Any]]:
     """
     Get all leads
-    
+
     Returns:
         List of all leads
     """
@@ -111,134 +341,293 @@ def get_leads() -> List[Dict[str, Any]]:
 def get_lead_by_email(email: str) -> Optional[Dict[str, Any]]:
     """
     Get a lead by email address
-    
+
     Args:
         email: Email to search for
-        
+
     Returns:
         Lead dictionary or None if not found
     """
-    leads = load_leads()
-    for lead in leads:
-        if lead["email"].lower() == email.lower():
-            return lead
-    return None
+    row = _connect().execute(
+        "SELECT * FROM leads WHERE email = ? COLLATE NOCASE ORDER BY id LIMIT 1",
+        (email.strip(),)
+    ).fetchone()
+    return _row_to_lead(row) if row else None
 
 
 def delete_lead(lead_id: int) -> bool:
     """
     Delete a lead by ID
-    
+
     Args:
         lead_id: ID of the lead to delete
-        
+
     Returns:
         True if deleted, False if not found
     """
-    leads = load_leads()
-    initial_count = len(leads)
-    leads = [lead for lead in leads if lead.get("id") != lead_id]
-    
-    if len(leads) < initial_count:
-        save_leads(leads)
-        return True
-    return False
+    conn = _connect()
+    with conn:
+        cursor = conn.execute("DELETE FROM leads WHERE id = ?", (lead_id,))
+    return cursor.rowcount > 0
 
 
 def update_lead(lead_id: int, **kwargs) -> Optional[Dict[str, Any]]:
     """
     Update a lead's information
-    
+
     Args:
         lead_id: ID of the lead to update
         **kwargs: Fields to update (name, email, education, program_of_interest, message)
-        
+
     Returns:
         Updated lead dictionary or None if not found
     """
-    leads = load_leads()
-    
-    for i, lead in enumerate(leads):
-        if lead.get("id") == lead_id:
-            # Update allowed fields
-            for key in ["name", "email", "education", "program_of_interest", "message"]:
-                if key in kwargs and kwargs[key] is not None:
-                    lead[key] = str(kwargs[key]).strip()
-            
-            lead["updated_at"] = datetime.now().isoformat()
-            leads[i] = lead
-            save_leads(leads)
-            return lead
-    
-    return None
+    # Update allowed fields
+    updates = {key: str(kwargs[key]).strip() for key in LEAD_FIELDS if kwargs.get(key) is not None}
+    updates["updated_at"] = datetime.now().isoformat()
+    assignments = ", ".join(f"{key} = :{key}" for key in updates)
+
+    conn = _connect()
+    with conn:
+        cursor = conn.execute(f"UPDATE leads SET {assignments} WHERE id = :lead_id", {**updates, "lead_id": lead_id})
+        if cursor.rowcount == 0:
+            return None
+        row = conn.execute("SELECT * FROM leads WHERE id = ?", (lead_id,)).fetchone()
 
+    return _row_to_lead(row)
 
-def get_leads_count() -> int:
-    """Retourne le nombre total de leads"""
-    return len(load_leads())
+
+def get_leads_count(**filters) -> int:
+    """Retourne le nombre total de leads (ou de leads correspondant aux filtres de query_leads)"""
+    where, params = _lead_filters(**filters)
+    return _connect().execute(f"SELECT COUNT(*) FROM leads{where}", params).fetchone()[0]
+
+
+def _fts_match(query: str) -> Optional[str]:
+    """FTS5 prefix query for the words of query (None if it has no word)"""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _fts_has_match(match: str) -> bool:
+    """True if the FTS5 query matches at least one lead"""
+    if not _fts_available():
+        return False
+    return _connect().execute(
+        "SELECT 1 FROM leads_fts WHERE leads_fts MATCH ? LIMIT 1", (match,)
+    ).fetchone() is not None
+
+
+def _lead_filters(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    program: Optional[str] = None,
+    search: Optional[str] = None
+) -> Tuple[str, List[Any]]:
+    """
+    WHERE clause and parameters for the lead filters
+
+    Args:
+        date_from: Earliest creation date (ISO date or datetime, inclusive)
+        date_to: Latest creation date (ISO date or datetime, inclusive)
+        program: Exact program of interest
+        search: Words matched against name and email (word prefixes via FTS5;
+            substring LIKE match when no word starts with the terms)
+
+    Returns:
+        Tuple (" WHERE ..." or "", parameters)
+    """
+    clauses, params = [], []
+    if date_from:
+        clauses.append("created_at >= ?")
+        params.append(str(date_from))
+    if date_to:
+        # Une date seule inclut toute la journée
+        date_to = str(date_to)
+        clauses.append("created_at <= ?")
+        params.append(date_to + "T23:59:59.999999" if len(date_to) == 10 else date_to)
+    if program:
+        clauses.append("program_of_interest = ?")
+        params.append(program)
+    if search and search.strip():
+        match = _fts_match(search)
+        if match and _fts_has_match(match):
+            clauses.append("id IN (SELECT rowid FROM leads_fts WHERE leads_fts MATCH ?)")
+            params.append(match)
+        else:
+            # Sans FTS5, ou terme qui ne commence aucun mot (milieu d'un nom ou d'un email) : sous-chaîne
+            clauses.append("(name LIKE ? OR email LIKE ?)")
+            params.extend([f"%{search.strip()}%"] * 2)
+
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, params
+
+
+def query_leads(
+    offset: int = 0,
+    limit: int = 50,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    program: Optional[str] = None,
+    search: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    One page of leads, newest first, with optional filters
+
+    Args:
+        offset: Number of matching leads to skip
+        limit: Page size
+        date_from, date_to, program, search: See _lead_filters
+
+    Returns:
+        Tuple (leads of the page, total number of matching leads)
+    """
+    where, params = _lead_filters(date_from, date_to, program, search)
+    conn = _connect()
+    total = conn.execute(f"SELECT COUNT(*) FROM leads{where}", params).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT * FROM leads{where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+        params + [max(0, int(limit)), max(0, int(offset))]
+    ).fetchall()
+    return [_row_to_lead(row) for row in rows], total
+
+
+def get_programs() -> List[str]:
+    """Distinct programs of interest (for filters)"""
+    rows = _connect().execute(
+        "SELECT DISTINCT program_of_interest FROM leads "
+        "WHERE program_of_interest IS NOT NULL AND program_of_interest != '' ORDER BY program_of_interest"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def get_leads_stats() -> Dict[str, int]:
+    """Total leads, unique emails and leads with a program, computed in SQL"""
+    row = _connect().execute(
+        "SELECT COUNT(*), COUNT(DISTINCT lower(email)), COUNT(NULLIF(program_of_interest, '')) FROM leads"
+    ).fetchone()
+    return {"total": row[0], "unique_emails": row[1], "with_program": row[2]}
+
+
+def _iter_lead_rows(**filters) -> Iterator[sqlite3.Row]:
+    """Matching leads in ID order, read from a cursor (never loaded all at once)"""
+    where, params = _lead_filters(**filters)
+    cursor = _connect().execute(f"SELECT * FROM leads{where} ORDER BY id", params)
+    while True:
+        rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+        if not rows:
+            return
+        yield from rows
+
+
+def _format_export_date(created_at: Optional[str]) -> str:
+    # Parse ISO datetime to readable format
+    if not created_at:
+        return ""
+    try:
+        return datetime.fromisoformat(created_at).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return created_at
+
+
+def iter_leads_csv(chunk_rows: int = EXPORT_CHUNK_ROWS, **filters) -> Iterator[str]:
+    """
+    Stream leads as CSV text, chunk_rows rows per yielded chunk
+
+    Args:
+        chunk_rows: Rows per chunk
+        **filters: date_from, date_to, program, search (see _lead_filters)
+
+    Yields:
+        CSV chunks, the header first
+    """
+    import csv
+    from io import StringIO
+
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in CSV_COLUMNS])
+    pending = 0
+
+    for lead in _iter_lead_rows(**filters):
+        writer.writerow([
+            _format_export_date(lead["created_at"]) if key == "created_at" else (lead[key] if lead[key] is not None else "")
+            for _, key in CSV_COLUMNS
+        ])
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_leads_ndjson(**filters) -> Iterator[str]:
+    """
+    Stream leads as NDJSON, one JSON object per line
+
+    Args:
+        **filters: date_from, date_to, program, search (see _lead_filters)
+
+    Yields:
+        Lines terminated by a newline
+    """
+    for lead in _iter_lead_rows(**filters):
+        yield json.dumps(_row_to_lead(lead), ensure_ascii=False) + "\n"
+
+
+def export_leads_to_file(path: str, fmt: str = "csv", **filters) -> int:
+    """
+    Write an export to a file chunk by chunk
+
+    Args:
+        path: Output file
+        fmt: "csv" or "ndjson"
+        **filters: date_from, date_to, program, search
+
+    Returns:
+        Number of bytes written
+    """
+    chunks = iter_leads_ndjson(**filters) if fmt == "ndjson" else iter_leads_csv(**filters)
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for chunk in chunks:
+            written += f.write(chunk)
+    return written
 
 
 def export_leads_to_csv() -> str:
     """
     Export all leads to CSV format
-    
+
     Returns:
         CSV content as string
     """
-    leads = load_leads()
-    
-    if not leads:
+    if get_leads_count() == 0:
         return ""
-    
-    import csv
-    from io import StringIO
-    
-    output = StringIO()
-    fieldnames = ["ID", "Name", "Email", "Education", "Program of Interest", "Message", "Collected Date"]
-    
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    
-    for lead in leads:
-        # Parse ISO datetime to readable format
-        created_at = lead.get("created_at", "")
-        if created_at:
-            try:
-                dt = datetime.fromisoformat(created_at)
-                created_at = dt.strftime("%Y-%m-%d %H:%M:%S")
-            except:
-                pass
-        
-        writer.writerow({
-            "ID": lead.get("id", ""),
-            "Name": lead.get("name", ""),
-            "Email": lead.get("email", ""),
-            "Education": lead.get("education", ""),
-            "Program of Interest": lead.get("program_of_interest", ""),
-            "Message": lead.get("message", ""),
-            "Collected Date": created_at
-        })
-    
-    return output.getvalue()
+    return "".join(iter_leads_csv())
 
 
 def search_leads(query: str) -> List[Dict[str, Any]]:
     """
     Search leads by name or email
-    
+
+    Words are matched as prefixes through the FTS5 index (e.g. "dup gma" finds
+    "Jean Dupont <jean@gmail.com>"); without FTS5, substring match with LIKE.
+
     Args:
         query: Search query
-        
+
     Returns:
         List of matching leads
     """
-    leads = load_leads()
-    query_lower = query.lower()
-    
-    results = []
-    for lead in leads:
-        if (query_lower in lead.get("name", "").lower() or
-            query_lower in lead.get("email", "").lower()):
-            results.append(lead)
-    
-    return results
+    if _fts_match(query) is None:
+        return []
+    where, params = _lead_filters(search=query)
+    rows = _connect().execute(f"SELECT * FROM leads{where} ORDER BY id", params).fetchall()
+    return [_row_to_lead(row) for row in rows]
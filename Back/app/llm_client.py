@@ -0,0 +1,584 @@
+"""
+Client LLM partagé par les agents, le RAG et toutes les sessions du processus
+
+- vertexai.init n'est appelé qu'une fois et un seul GenerativeModel est créé
+  par modèle : son canal gRPC reste ouvert et est réutilisé par toutes les requêtes
+- generate / stream (et agenerate / astream pour asyncio) avec délais maximaux
+- LLM_BACKEND=stub remplace Vertex AI par un faux modèle local (tests, benchmarks)
+"""
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from dotenv import load_dotenv
+
+from telemetry import record_span
+
+load_dotenv()
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "vertex").lower()
+VERTEX_MODEL = os.getenv("VERTEX_MODEL", "gemini-2.0-flash-exp")
+VERTEX_PROJECT = os.getenv("VERTEX_PROJECT", "esilv-smart-assistant")
+VERTEX_LOCATION = os.getenv("VERTEX_LOCATION", "us-central1")
+
+# Délais maximaux (s) : réponse complète, premier token d'un streaming, puis entre deux chunks
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "20"))
+LLM_STREAM_TIMEOUT = float(os.getenv("LLM_STREAM_TIMEOUT", "30"))
+# Requêtes couvertes : une seconde requête est envoyée si la première n'a pas répondu
+# après le p95 des latences observées (LLM_HEDGE_DELAY tant qu'il y a trop peu de mesures)
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") != "0"
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "2"))
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+# Appels simultanés par backend (threads du pool, appels asyncio), y compris les appels
+# abandonnés après un délai dépassé ou une couverture perdue qui tournent encore
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+
+class LLMTimeout(TimeoutError):
+    """Le LLM n'a pas répondu dans le délai imparti"""
+
+
+class StubLLMBackend:
+    """
+    Faux modèle local, même interface que vertexai GenerativeModel
+    (generate_content et generate_content_async, avec ou sans stream=True)
+
+    Args:
+        ttft_s: Délai avant le premier token (s)
+        tokens: Nombre de tokens de la réponse
+        token_interval_s: Délai entre deux tokens (s)
+        reply: Premier token de la réponse
+        slow_rate: Proportion d'appels ralentis (latence de queue injectée)
+        slow_ttft_s: Délai avant le premier token des appels ralentis (s)
+        seed: Graine du tirage des appels ralentis
+    """
+
+    def __init__(
+        self,
+        ttft_s: float = float(os.getenv("LLM_STUB_TTFT", "0.2")),
+        tokens: int = int(os.getenv("LLM_STUB_TOKENS", "20")),
+        token_interval_s: float = float(os.getenv("LLM_STUB_TOKEN_INTERVAL", "0.01")),
+        reply: str = "information",
+        slow_rate: float = 0.0,
+        slow_ttft_s: float = 5.0,
+        seed: Optional[int] = None
+    ):
+        self.ttft_s = ttft_s
+        self.tokens = tokens
+        self.token_interval_s = token_interval_s
+        self.reply = reply
+        self.slow_rate = slow_rate
+        self.slow_ttft_s = slow_ttft_s
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    class _Chunk:
+        def __init__(self, text: str):
+            self.text = text
+
+    def _count(self) -> float:
+        """Compte l'appel et retourne son délai avant le premier token"""
+        with self._lock:
+            self.calls += 1
+            slow = self.slow_rate > 0 and self._random.random() < self.slow_rate
+        return self.slow_ttft_s if slow else self.ttft_s
+
+    def _text(self, kwargs) -> str:
+        """Réponse complète ; objet JSON vide si une sortie JSON est demandée"""
+        config = kwargs.get("generation_config") or {}
+        if isinstance(config, dict) and config.get("response_mime_type") == "application/json":
+            return "{}"
+        return "".join(self._pieces())
+
+    def _pieces(self):
+        return [self.reply] + [f" token{i}" for i in range(1, self.tokens)]
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        ttft_s = self._count()
+        if not stream:
+            time.sleep(ttft_s + self.token_interval_s * (self.tokens - 1))
+            return self._Chunk(self._text(kwargs))
+        return self._stream(ttft_s)
+
+    def _stream(self, ttft_s: float):
+        time.sleep(ttft_s)
+        for i, piece in enumerate(self._pieces()):
+            if i:
+                time.sleep(self.token_interval_s)
+            yield self._Chunk(piece)
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        ttft_s = self._count()
+        if not stream:
+            await asyncio.sleep(ttft_s + self.token_interval_s * (self.tokens - 1))
+            return self._Chunk(self._text(kwargs))
+        return self._astream(ttft_s)
+
+    async def _astream(self, ttft_s: float):
+        await asyncio.sleep(ttft_s)
+        for i, piece in enumerate(self._pieces()):
+            if i:
+                await asyncio.sleep(self.token_interval_s)
+            yield self._Chunk(piece)
+
+
+_vertex_lock = threading.Lock()
+_vertex_initialized = False
+_vertex_models: Dict[str, object] = {}
+
+
+def get_vertex_model(model_name: str = VERTEX_MODEL):
+    """GenerativeModel partagé (vertexai.init appelé une seule fois par processus)"""
+    global _vertex_initialized
+
+    model = _vertex_models.get(model_name)
+    if model is not None:
+        return model
+
+    with _vertex_lock:
+        if not _vertex_initialized:
+            import vertexai
+            vertexai.init(project=VERTEX_PROJECT, location=VERTEX_LOCATION)
+            _vertex_initialized = True
+
+        if model_name not in _vertex_models:
+            from vertexai.generative_models import GenerativeModel
+            _vertex_models[model_name] = GenerativeModel(model_name)
+
+    return _vertex_models[model_name]
+
+
+_END = object()
+
+
+async def _aclose(iterator):
+    """Ferme un flux asyncio du backend s'il le permet (erreurs ignorées)"""
+    close = getattr(iterator, "aclose", None)
+    if close is None:
+        return
+    try:
+        await close()
+    except Exception:
+        pass
+
+
+class LLMClient:
+    """
+    Client texte au-dessus d'un backend de type GenerativeModel
+
+    Args:
+        backend: Objet exposant generate_content / generate_content_async
+        timeout: Délai maximal d'une réponse complète, streaming compris (s)
+        stream_timeout: Délai maximal entre deux chunks en streaming (s)
+        first_token_timeout: Délai maximal avant le premier chunk en streaming (s)
+        hedge: Envoyer une seconde requête si la première tarde
+        hedge_delay: Délai avant la seconde requête tant que le p95 n'est pas mesurable (s)
+    """
+
+    def __init__(
+        self,
+        backend,
+        timeout: float = LLM_TIMEOUT,
+        stream_timeout: float = LLM_STREAM_TIMEOUT,
+        first_token_timeout: float = LLM_FIRST_TOKEN_TIMEOUT,
+        hedge: bool = LLM_HEDGE,
+        hedge_delay: float = LLM_HEDGE_DELAY
+    ):
+        self.backend = backend
+        self.timeout = timeout
+        self.stream_timeout = stream_timeout
+        self.first_token_timeout = first_token_timeout
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedges_fired = 0
+        self._executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm-client")
+        # Places d'appel au backend : libérées quand l'appel se termine vraiment
+        self._slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+        # Latences observées (réponse complète / premier token) pour le délai de couverture
+        self._latencies = {"generate": deque(maxlen=200), "stream": deque(maxlen=200)}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return type(self.backend).__name__
+
+    def _record(self, kind: str, seconds: float):
+        with self._stats_lock:
+            self._latencies[kind].append(seconds)
+        # Réponse complète (generate) ou premier token (stream)
+        record_span("llm_total" if kind == "generate" else "llm_ttft", seconds)
+
+    def _hedge_fired(self):
+        with self._stats_lock:
+            self.hedges_fired += 1
+
+    def hedge_delay_s(self, kind: str) -> float:
+        """Délai avant la requête de couverture : p95 observé, ou hedge_delay par défaut"""
+        with self._stats_lock:
+            samples = sorted(self._latencies[kind])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return self.hedge_delay
+        return samples[min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE / 100))]
+
+    def _acquire(self, timeout: float) -> bool:
+        """Réserve une place d'appel (sans attendre si timeout <= 0)"""
+        if timeout <= 0:
+            return self._slots.acquire(blocking=False)
+        return self._slots.acquire(timeout=timeout)
+
+    async def _aacquire(self, timeout: float) -> bool:
+        """Version asyncio de _acquire() (attente par petites pauses, sans bloquer la boucle)"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self._slots.acquire(blocking=False):
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    def _submit(self, fn, *args, timeout: float = 0, **kwargs):
+        """
+        Lance un appel du backend dans le pool
+
+        Returns:
+            Future de l'appel, ou None si aucune place ne s'est libérée dans le délai
+        """
+        if not self._acquire(timeout):
+            return None
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def generate(self, prompt: str, timeout: Optional[float] = None, **kwargs) -> str:
+        """
+        Réponse complète
+
+        Args:
+            prompt: Prompt envoyé au modèle
+            timeout: Délai maximal (self.timeout par défaut)
+            **kwargs: Options transmises à generate_content (ex. generation_config)
+
+        Raises:
+            LLMTimeout: si aucune requête n'a répondu dans le délai
+        """
+        timeout = timeout or self.timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        first = self._submit(self.backend.generate_content, prompt, timeout=timeout, **kwargs)
+        if first is None:
+            raise LLMTimeout(f"Trop d'appels LLM en cours ({LLM_MAX_CONCURRENCY}) pendant {timeout:g}s")
+        attempts = [first]
+
+        if self.hedge:
+            done, _ = wait(attempts, timeout=min(self.hedge_delay_s("generate"), timeout))
+            if not done and time.monotonic() < deadline:
+                # Pas de couverture si le backend est déjà saturé
+                hedge = self._submit(self.backend.generate_content, prompt, **kwargs)
+                if hedge is not None:
+                    attempts.append(hedge)
+                    self._hedge_fired()
+
+        pending, errors = set(attempts), []
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    self._record("generate", time.monotonic() - start)
+                    return future.result().text
+                errors.append(future.exception())
+
+        if errors and not pending:
+            raise errors[0]
+        for future in pending:
+            future.cancel()
+        raise LLMTimeout(f"Pas de réponse du LLM après {timeout:g}s")
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Réponse en streaming (textes non vides)
+        Si la requête est couverte, la première qui produit un chunk est gardée
+
+        Raises:
+            LLMTimeout: premier token, intervalle entre chunks ou durée totale dépassés
+        """
+        start = time.monotonic()
+        deadline = start + (timeout or self.timeout)
+        first_deadline = min(deadline, start + self.first_token_timeout)
+        hedge_at = start + self.hedge_delay_s("stream") if self.hedge else None
+
+        events: "queue.Queue" = queue.Queue()
+        stops: Dict[int, threading.Event] = {}
+
+        def launch(wait_s: float = 0) -> bool:
+            attempt = len(stops)
+            stop = threading.Event()
+
+            def pump():
+                response = None
+                try:
+                    response = self.backend.generate_content(prompt, stream=True)
+                    for chunk in response:
+                        if stop.is_set():
+                            return
+                        events.put((attempt, chunk, None))
+                    events.put((attempt, _END, None))
+                except Exception as e:
+                    events.put((attempt, _END, e))
+                finally:
+                    # Fermer le flux abandonné plutôt que d'attendre le ramasse-miettes
+                    close = getattr(response, "close", None)
+                    if close is not None and stop.is_set():
+                        try:
+                            close()
+                        except Exception:
+                            pass
+
+            if self._submit(pump, timeout=wait_s) is None:
+                return False
+            stops[attempt] = stop
+            return True
+
+        if not launch(first_deadline - start):
+            raise LLMTimeout(f"Trop d'appels LLM en cours ({LLM_MAX_CONCURRENCY})")
+        running = 1
+        winner = None
+        try:
+            while True:
+                now = time.monotonic()
+                if winner is None:
+                    limit = first_deadline if hedge_at is None else min(first_deadline, hedge_at)
+                else:
+                    limit = min(deadline, now + self.stream_timeout)
+
+                try:
+                    attempt, chunk, error = events.get(timeout=max(0.0, limit - now))
+                except queue.Empty:
+                    now = time.monotonic()
+                    if winner is None and hedge_at is not None and now < first_deadline:
+                        # Requête de couverture : la première n'a toujours pas répondu
+                        # (aucune si le backend est déjà saturé)
+                        hedge_at = None
+                        if launch():
+                            running += 1
+                            self._hedge_fired()
+                        continue
+                    if winner is None:
+                        raise LLMTimeout(f"Aucun token du LLM après {now - start:.1f}s")
+                    if now >= deadline:
+                        raise LLMTimeout(f"Réponse du LLM interrompue après {now - start:.1f}s")
+                    raise LLMTimeout(f"Streaming LLM interrompu : aucun chunk depuis {self.stream_timeout:g}s")
+
+                if winner is not None and attempt != winner:
+                    continue
+
+                if chunk is _END:
+                    if winner is None:
+                        running -= 1
+                        if running > 0:
+                            # Une autre requête est encore en cours
+                            continue
+                    if error is not None:
+                        raise error
+                    return
+
+                if winner is None:
+                    winner = attempt
+                    self._record("stream", time.monotonic() - start)
+                    for other, stop in stops.items():
+                        if other != winner:
+                            stop.set()
+
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            if winner is not None:
+                record_span("llm_total", time.monotonic() - start)
+            for stop in stops.values():
+                stop.set()
+
+    def _atask(self, coro) -> "asyncio.Task":
+        """Tâche d'appel au backend, qui libère sa place quand elle se termine"""
+        task = asyncio.ensure_future(coro)
+        task.add_done_callback(lambda _: self._slots.release())
+        return task
+
+    async def agenerate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Version asyncio de generate()"""
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if not await self._aacquire(timeout):
+            raise LLMTimeout(f"Trop d'appels LLM en cours ({LLM_MAX_CONCURRENCY}) pendant {timeout:g}s")
+        tasks = [self._atask(self.backend.generate_content_async(prompt))]
+
+        try:
+            if self.hedge:
+                done, _ = await asyncio.wait(tasks, timeout=min(self.hedge_delay_s("generate"), timeout))
+                if not done and self._slots.acquire(blocking=False):
+                    tasks.append(self._atask(self.backend.generate_content_async(prompt)))
+                    self._hedge_fired()
+
+            pending, errors = set(tasks), []
+            while pending:
+                remaining = start + timeout - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record("generate", loop.time() - start)
+                        return task.result().text
+                    errors.append(task.exception())
+
+            if errors and not pending:
+                raise errors[0]
+            raise LLMTimeout(f"Pas de réponse du LLM après {timeout:g}s")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _astream_task(self, prompt: str) -> "asyncio.Task":
+        """
+        Tâche d'ouverture d'un streaming ; sa place d'appel est libérée à la
+        fermeture du flux (_aclose_stream), ou dès la fin de la tâche si
+        l'ouverture échoue ou est annulée
+        """
+        task = asyncio.ensure_future(self._aopen_stream(prompt))
+
+        def release_unless_opened(task):
+            if task.cancelled() or task.exception() is not None:
+                self._slots.release()
+
+        task.add_done_callback(release_unless_opened)
+        return task
+
+    async def _aopen_stream(self, prompt: str):
+        """Ouvre un streaming et attend son premier chunk (flux fermé en cas d'échec)"""
+        iterator = None
+        try:
+            response = await self.backend.generate_content_async(prompt, stream=True)
+            iterator = response.__aiter__()
+            try:
+                first = await iterator.__anext__()
+            except StopAsyncIteration:
+                first = _END
+            return iterator, first
+        except BaseException:
+            await _aclose(iterator)
+            raise
+
+    async def _aclose_stream(self, iterator):
+        """Ferme un flux ouvert (gagnant terminé ou couverture perdue) et libère sa place"""
+        try:
+            await _aclose(iterator)
+        finally:
+            self._slots.release()
+
+    async def astream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Version asyncio de stream() ; les flux perdus ou interrompus sont fermés"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + (timeout or self.timeout)
+        first_deadline = min(deadline, start + self.first_token_timeout)
+        if not await self._aacquire(first_deadline - start):
+            raise LLMTimeout(f"Trop d'appels LLM en cours ({LLM_MAX_CONCURRENCY})")
+        tasks = [self._astream_task(prompt)]
+        opened = None
+
+        try:
+            if self.hedge:
+                done, _ = await asyncio.wait(tasks, timeout=min(self.hedge_delay_s("stream"), first_deadline - start))
+                if not done and self._slots.acquire(blocking=False):
+                    tasks.append(self._astream_task(prompt))
+                    self._hedge_fired()
+
+            pending, errors = set(tasks), []
+            while pending and opened is None:
+                remaining = first_deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        opened = task.result()
+                        break
+                    errors.append(task.exception())
+
+            if opened is None:
+                if errors and not pending:
+                    raise errors[0]
+                raise LLMTimeout(f"Aucun token du LLM après {loop.time() - start:.1f}s")
+
+            self._record("stream", loop.time() - start)
+            iterator, chunk = opened
+            while chunk is not _END:
+                if chunk.text:
+                    yield chunk.text
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise LLMTimeout(f"Réponse du LLM interrompue après {loop.time() - start:.1f}s")
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), min(self.stream_timeout, remaining))
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise LLMTimeout(f"Streaming LLM interrompu après {loop.time() - start:.1f}s")
+        finally:
+            if opened is not None:
+                record_span("llm_total", loop.time() - start)
+            for task in tasks:
+                if not task.done():
+                    # L'annulation ferme le flux en cours d'ouverture et libère sa place
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None:
+                    # Flux ouvert : le gagnant comme une couverture perdue
+                    await self._aclose_stream(task.result()[0])
+
+
+_client_lock = threading.Lock()
+_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """
+    Client LLM du processus, créé à la première utilisation
+
+    Returns:
+        Client partagé (backend Vertex AI, ou stub si LLM_BACKEND=stub)
+    """
+    global _client
+
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            backend = StubLLMBackend() if LLM_BACKEND == "stub" else get_vertex_model()
+            _client = LLMClient(backend)
+            print(f"Client LLM initialisé ({_client.name})")
+
+    return _client
+
+
+def set_llm_client(client: Optional[LLMClient]):
+    """Remplace le client partagé (tests et benchmarks) ; None le réinitialise"""
+    global _client
+
+    with _client_lock:
+        _client = client
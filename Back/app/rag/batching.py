@@ -0,0 +1,101 @@
+"""
+Regroupement des requêtes simultanées en micro-lots
+
+Sous charge, chaque requête encodait sa question seule (lot de taille 1) puis
+interrogeait FAISS avec un seul vecteur. MicroBatcher rassemble les requêtes
+arrivées pendant quelques millisecondes (ou jusqu'à max_batch) et les traite
+en un seul appel : un encode() sur tout le lot et un index.search multi-requêtes.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+from telemetry import attach_traces, current_trace
+
+# Attente maximale pour compléter un lot, et taille maximale d'un lot (0 = regroupement désactivé)
+QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "3"))
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "32"))
+
+
+class MicroBatcher:
+    """
+    File de requêtes traitée par lots dans un thread dédié
+
+    Args:
+        process_batch: Fonction appelée avec la liste des éléments du lot, qui
+                       retourne la liste des résultats dans le même ordre
+        max_batch: Taille maximale d'un lot
+        max_wait_ms: Délai maximal d'attente après le premier élément d'un lot
+        name: Nom du thread de traitement
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch: int = QUERY_BATCH_SIZE,
+        max_wait_ms: float = QUERY_BATCH_WAIT_MS,
+        name: str = "micro-batcher"
+    ):
+        self.process_batch = process_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        # Taille des lots traités (pour les benchmarks)
+        self.batch_sizes: List[int] = []
+
+    def submit(self, item: Any) -> Any:
+        """Ajoute un élément au prochain lot et attend son résultat"""
+        return self.submit_future(item).result()
+
+    def submit_future(self, item: Any) -> Future:
+        """Ajoute un élément au prochain lot sans attendre (futur à attendre avec asyncio.wrap_future)"""
+        future: Future = Future()
+        # La trace de l'appelant reçoit les étapes mesurées pendant le traitement du lot
+        future.trace = current_trace()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self):
+        """Attend un premier élément puis complète le lot jusqu'au délai ou à la taille maximale"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Prendre ce qui est déjà en file sans attendre davantage
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            self.batch_sizes.append(len(items))
+            if len(self.batch_sizes) > 10000:
+                del self.batch_sizes[:5000]
+
+            try:
+                with attach_traces(getattr(future, "trace", None) for _, future in batch):
+                    results = self.process_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,310 @@
+"""
+Backends d'embedding interchangeables pour le RAG et l'indexation
+
+- "torch" : SentenceTransformer (PyTorch), comportement historique
+- "onnx"  : même modèle exporté en ONNX et quantifié en int8 (quantification
+            dynamique), exécuté par ONNX Runtime, adapté au service CPU seul.
+            L'export se fait à la construction de l'image (python embeddings.py,
+            voir Dockerfile) ; le service ne fait que charger le modèle exporté
+            et n'a besoin ni de torch ni de transformers
+
+Le backend est choisi par la variable d'environnement EMBEDDING_BACKEND.
+Les deux produisent des vecteurs float32 normalisés (pooling moyen) comparables
+entre eux, un index construit avec l'un reste donc interrogeable avec l'autre.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+HF_MODEL_ID = f"sentence-transformers/{MODEL_NAME}"
+# Chemin du modèle pré-chargé sur GCP
+GCP_MODEL_CACHE_PATH = '/root/.cache/huggingface/hub/models--sentence-transformers--paraphrase-multilingual-MiniLM-L12-v2/snapshots/86741b4e3f5cb7765a600d3a3d55a0f6a6cb443d'
+# Délai maximal d'attente du téléchargement du modèle lancé par download_data.py
+MODEL_DOWNLOAD_TIMEOUT = float(os.getenv("MODEL_DOWNLOAD_TIMEOUT", "300"))
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# Dossier du modèle exporté (créé par export_onnx_model, lu seul au service)
+ONNX_MODEL_DIR = os.getenv(
+    "ONNX_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "onnx")
+)
+# Nombre de threads ONNX Runtime (0 = choix automatique)
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+# Longueur maximale des séquences (valeur du modèle SentenceTransformer)
+MAX_SEQ_LENGTH = 128
+
+
+def wait_for_model_download():
+    """Attend la fin du téléchargement du modèle en arrière-plan (download_data.py)"""
+    marker = GCP_MODEL_CACHE_PATH + ".downloading"
+    deadline = time.time() + MODEL_DOWNLOAD_TIMEOUT
+
+    while os.path.exists(marker) and time.time() < deadline:
+        # Ignorer un marqueur laissé par un processus qui n'existe plus
+        try:
+            with open(marker, "r") as f:
+                pid = f.read().strip()
+            if pid:
+                os.kill(int(pid), 0)
+        except (OSError, ValueError):
+            return
+
+        time.sleep(0.5)
+
+
+def resolve_model_path() -> str:
+    """Cache GCP si disponible, sinon identifiant HuggingFace"""
+    wait_for_model_download()
+    if os.path.exists(GCP_MODEL_CACHE_PATH):
+        return GCP_MODEL_CACHE_PATH
+    return HF_MODEL_ID
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return (embeddings / np.clip(norms, 1e-12, None)).astype("float32")
+
+
+class EmbeddingBackend:
+    """Interface commune des backends d'embedding"""
+
+    name = "base"
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Encode des textes
+
+        Args:
+            texts: Textes à encoder
+            batch_size: Taille des lots
+
+        Returns:
+            Tableau float32 contigu (len(texts), dimension) de vecteurs normalisés
+        """
+        raise NotImplementedError
+
+    @property
+    def dimension(self) -> int:
+        return int(self.encode(["dimension"]).shape[1])
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Backend PyTorch via sentence-transformers"""
+
+    name = "torch"
+
+    def __init__(self, model_path: Optional[str] = None):
+        from sentence_transformers import SentenceTransformer
+
+        model_path = model_path or resolve_model_path()
+        print(f"Chargement du modèle d'embedding (torch): {model_path}")
+        self.model = SentenceTransformer(model_path)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = self.model.encode(
+            list(texts),
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return np.ascontiguousarray(embeddings, dtype="float32")
+
+
+def export_onnx_model(
+    output_dir: str = ONNX_MODEL_DIR,
+    model_path: Optional[str] = None,
+    quantize: bool = True
+) -> str:
+    """
+    Exporte le transformer en ONNX puis le quantifie en int8 (poids)
+
+    Args:
+        output_dir: Dossier de sortie (modèle + tokenizer)
+        model_path: Modèle source (cache GCP ou HuggingFace par défaut)
+        quantize: Produire model_int8.onnx en plus de model.onnx
+
+    Returns:
+        Chemin du modèle ONNX à utiliser
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    model_path = model_path or resolve_model_path()
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    transformer = AutoModel.from_pretrained(model_path)
+    transformer.eval()
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    sample = tokenizer(["ESILV"], return_tensors="pt")
+    fp32_path = os.path.join(output_dir, "model.onnx")
+
+    print(f"Export ONNX du modèle vers {fp32_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHiddenState(transformer),
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=14
+        )
+    tokenizer.save_pretrained(output_dir)
+
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    int8_path = os.path.join(output_dir, "model_int8.onnx")
+    print(f"Quantification int8 vers {int8_path}...")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def _pad_token(model_dir: str) -> str:
+    """Token de padding enregistré avec le tokenizer exporté"""
+    path = os.path.join(model_dir, "special_tokens_map.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            pad = json.load(f).get("pad_token", "<pad>")
+    except (OSError, ValueError):
+        return "<pad>"
+    # transformers enregistre parfois les tokens spéciaux sous forme de dict
+    return pad["content"] if isinstance(pad, dict) else pad
+
+
+class OnnxBackend(EmbeddingBackend):
+    """Backend ONNX Runtime (CPU), modèle quantifié int8 par défaut"""
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantized: bool = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        filename = "model_int8.onnx" if quantized else "model.onnx"
+        model_file = os.path.join(model_dir, filename)
+        tokenizer_file = os.path.join(model_dir, "tokenizer.json")
+        for path in (model_file, tokenizer_file):
+            if not os.path.exists(path):
+                raise FileNotFoundError(
+                    f"{path} introuvable, exporter le modèle avant le service : python embeddings.py"
+                )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS > 0:
+            options.intra_op_num_threads = ONNX_THREADS
+
+        print(f"Chargement du modèle d'embedding (onnx): {model_file}")
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.tokenizer = Tokenizer.from_file(tokenizer_file)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        pad_token = _pad_token(model_dir)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token), pad_token=pad_token)
+        self.quantized = quantized
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+
+        hidden = self.session.run(None, {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+
+        # Pooling moyen sur les tokens réels (comme le module Pooling du SentenceTransformer)
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (hidden * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return _normalize(summed / counts)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+
+        # Trier par longueur limite le padding dans chaque lot
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        parts = []
+        for start in range(0, len(order), batch_size):
+            batch = [texts[i] for i in order[start:start + batch_size]]
+            parts.append(self._encode_batch(batch))
+
+        sorted_embeddings = np.vstack(parts)
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return np.ascontiguousarray(embeddings)
+
+
+_BACKEND_CLASSES = {
+    "torch": SentenceTransformerBackend,
+    "onnx": OnnxBackend,
+}
+
+_backends: Dict[str, EmbeddingBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_embedding_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Retourne le backend d'embedding du processus (chargé une seule fois)
+
+    Args:
+        name: "torch" ou "onnx" (EMBEDDING_BACKEND par défaut)
+
+    Returns:
+        Instance partagée du backend. Si le backend onnx ne peut pas être
+        chargé (onnxruntime absent, modèle non exporté...), le backend torch
+        est utilisé.
+    """
+    name = (name or EMBEDDING_BACKEND).lower()
+    if name not in _BACKEND_CLASSES:
+        raise ValueError(f"Backend d'embedding inconnu: {name}")
+
+    backend = _backends.get(name)
+    if backend is not None:
+        return backend
+
+    with _backends_lock:
+        if name not in _backends:
+            try:
+                _backends[name] = _BACKEND_CLASSES[name]()
+            except (ImportError, OSError) as e:
+                if name == "torch":
+                    raise
+                print(f"Backend d'embedding {name} indisponible ({e}), utilisation de torch")
+                _backends[name] = _backends.get("torch") or SentenceTransformerBackend()
+                _backends["torch"] = _backends[name]
+
+    return _backends[name]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export du modèle d'embedding en ONNX (étape de build)")
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--no-quantize", action="store_true", help="Ne pas produire model_int8.onnx")
+    args = parser.parse_args()
+
+    path = export_onnx_model(args.output_dir, quantize=not args.no_quantize)
+    print(f"Modèle ONNX prêt: {path}")
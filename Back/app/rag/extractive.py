@@ -0,0 +1,198 @@
+"""
+Réponses extractives : questions factuelles simples traitées sans LLM
+
+Beaucoup de questions (adresse, téléphone, frais de scolarité, nombre de
+majeures...) trouvent leur réponse dans une phrase des premiers chunks.
+Les phrases des chunks retrouvés sont comparées à la question (embeddings
+normalisés) ; si la question attend un type de valeur connu et que la phrase
+la plus proche en contient une avec une similarité suffisante, cette phrase
+est la réponse et Gemini n'est pas appelé.
+
+Le même classement de phrases sert de réponse de secours quand le LLM est
+indisponible ou hors délai.
+"""
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from telemetry import registry
+
+# Réponses directes activées (EXTRACTIVE_ANSWERS=0 pour toujours appeler le LLM)
+EXTRACTIVE_ANSWERS = os.getenv("EXTRACTIVE_ANSWERS", "1") != "0"
+# Similarité question / phrase minimale pour répondre sans LLM
+EXTRACTIVE_MIN_CONFIDENCE = float(os.getenv("EXTRACTIVE_MIN_CONFIDENCE", "0.55"))
+# Nombre de chunks (les mieux classés) dont les phrases sont examinées
+EXTRACTIVE_TOP_CHUNKS = int(os.getenv("EXTRACTIVE_TOP_CHUNKS", "3"))
+
+_MONTHS = r"(?:janvier|f[ée]vrier|mars|avril|mai|juin|juillet|ao[uû]t|septembre|octobre|novembre|d[ée]cembre)"
+
+# Type de valeur attendu, détecté sur la question (l'ordre compte : "combien coûte" est un prix)
+QUESTION_KINDS: List[Tuple[str, "re.Pattern"]] = [
+    ("email", re.compile(r"e-?mail|courriel", re.IGNORECASE)),
+    ("phone", re.compile(r"t[ée]l[ée]phone|num[ée]ro de t|appeler|joindre|standard", re.IGNORECASE)),
+    ("address", re.compile(r"adresse|o[uù] (?:se )?(?:trouve|situe|est)|situ[ée]", re.IGNORECASE)),
+    ("price", re.compile(r"frais|prix|co[uû]t|tarif|€|euros?\b", re.IGNORECASE)),
+    ("date", re.compile(r"\bquand\b|quelle date|date (?:limite|de)|\bd[ée]but", re.IGNORECASE)),
+    ("count", re.compile(r"combien|nombre de", re.IGNORECASE)),
+]
+
+# Extracteurs de valeurs dans les phrases
+VALUE_PATTERNS: Dict[str, "re.Pattern"] = {
+    "email": re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]*\w"),
+    "phone": re.compile(r"(?:\+33\s?(?:\(0\)\s?)?|\b0)[1-9](?:[\s.-]?\d{2}){4}\b"),
+    "address": re.compile(
+        r"\b\d{1,4}(?:\s?(?:bis|ter))?,?\s+(?:rue|avenue|av\.|boulevard|bd|place|quai|all[ée]e|esplanade|parvis|cours)"
+        r"\s+[^,\n.;]{2,60}(?:,?\s*\d{5}\s+[^\s,.;]+(?:[\s-][^\s,.;]+)?)?",
+        re.IGNORECASE
+    ),
+    "price": re.compile(r"\b\d{1,3}(?:[\s.]?\d{3})*(?:,\d{1,2})?\s?(?:€|euros?\b|EUR\b)", re.IGNORECASE),
+    "date": re.compile(
+        rf"\b\d{{1,2}}(?:er)?\s+{_MONTHS}(?:\s+\d{{4}})?\b|\b\d{{1,2}}/\d{{1,2}}/\d{{2,4}}\b|\b{_MONTHS}\s+\d{{4}}\b",
+        re.IGNORECASE
+    ),
+}
+
+# Nom compté par la question ("combien de majeures", "nombre d'étudiants") : un
+# nombre n'est retenu que s'il précède ce nom (un adjectif au plus entre les deux)
+_COUNTED_NOUN = re.compile(r"(?:combien|nombre)\s+(?:de\s+|d['’]\s*)([^\W\d_]{3,})", re.IGNORECASE)
+_COUNT_NUMBER = r"\b\d{1,3}(?:[\s.]\d{3})+\b|\b\d{1,5}\b"
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(text: str, min_length: int = 20, max_length: int = 400) -> List[str]:
+    """Découpe un chunk en phrases (les fragments trop courts ou trop longs sont ignorés)"""
+    sentences = []
+    for sentence in _SENTENCE_SPLIT.split(text):
+        sentence = " ".join(sentence.split())
+        if min_length <= len(sentence) <= max_length:
+            sentences.append(sentence)
+    return sentences
+
+
+def detect_question_kind(question: str) -> Optional[str]:
+    """Type de valeur attendu par la question, ou None pour une question ouverte"""
+    for kind, pattern in QUESTION_KINDS:
+        if pattern.search(question):
+            return kind
+    return None
+
+
+def count_pattern(question: str) -> Optional["re.Pattern"]:
+    """
+    Extracteur des nombres accolés au nom compté par la question
+
+    Returns:
+        Motif dont le groupe "value" est le nombre, ou None si la question ne
+        nomme pas ce qu'elle compte (pas de réponse directe possible)
+    """
+    match = _COUNTED_NOUN.search(question)
+    if not match:
+        return None
+    # Singulier et pluriel ("majeure" / "majeures", "campus", "travaux")
+    noun = match.group(1).lower()
+    stem = re.escape(noun[:-1] if noun[-1] in "sx" and len(noun) > 3 else noun)
+    return re.compile(
+        rf"(?P<value>{_COUNT_NUMBER})\s+(?:[^\W\d_]+\s+)?{stem}\w*",
+        re.IGNORECASE
+    )
+
+
+def extract_value(kind: str, sentence: str, question: str = "") -> Optional[str]:
+    """Première valeur du type demandé dans la phrase (question requise pour un nombre)"""
+    if kind == "count":
+        pattern = count_pattern(question)
+        match = pattern.search(sentence) if pattern else None
+        return match.group("value").strip() if match else None
+    match = VALUE_PATTERNS[kind].search(sentence)
+    return match.group(0).strip() if match else None
+
+
+class ExtractiveAnswerer:
+    """
+    Classement des phrases des chunks retrouvés par similarité avec la question
+
+    Args:
+        min_confidence: Similarité minimale pour une réponse directe
+        top_chunks: Nombre de chunks examinés
+    """
+
+    def __init__(self, min_confidence: float = EXTRACTIVE_MIN_CONFIDENCE, top_chunks: int = EXTRACTIVE_TOP_CHUNKS):
+        self.min_confidence = min_confidence
+        self.top_chunks = top_chunks
+        # Questions traitées sans LLM / transmises au LLM
+        self.stats = {"direct": 0, "llm": 0}
+        self._lock = threading.Lock()
+
+    def rank_sentences(self, model, question: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Phrases des premiers chunks triées par similarité décroissante avec la question
+
+        Args:
+            model: Backend d'embedding (encode() retourne des vecteurs normalisés)
+            question: Question de l'utilisateur
+            docs: Résultats de retrieve()
+
+        Returns:
+            Liste de {"sentence", "score", "url", "source"}
+        """
+        candidates = []
+        for doc in docs[:self.top_chunks]:
+            for sentence in split_sentences(doc["text"]):
+                candidates.append({"sentence": sentence, "url": doc.get("url"), "source": doc.get("source")})
+        if not candidates:
+            return []
+
+        embeddings = model.encode([question] + [c["sentence"] for c in candidates], batch_size=64)
+        scores = embeddings[1:] @ embeddings[0]
+        for candidate, score in zip(candidates, scores):
+            candidate["score"] = float(score)
+
+        candidates.sort(key=lambda c: c["score"], reverse=True)
+        return candidates
+
+    def answer(self, model, question: str, docs: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Réponse directe si la question est factuelle et qu'une phrase la couvre
+
+        Returns:
+            {"answer", "value", "kind", "confidence", "url"} ou None (le LLM doit répondre)
+        """
+        result = None
+        kind = detect_question_kind(question)
+        if kind is not None and docs:
+            for candidate in self.rank_sentences(model, question, docs):
+                if candidate["score"] < self.min_confidence:
+                    break
+                value = extract_value(kind, candidate["sentence"], question)
+                if value:
+                    result = {
+                        "answer": candidate["sentence"].replace(value, f"**{value}**", 1),
+                        "value": value,
+                        "kind": kind,
+                        "confidence": candidate["score"],
+                        "url": candidate["url"],
+                    }
+                    break
+
+        outcome = "direct" if result else "llm"
+        with self._lock:
+            self.stats[outcome] += 1
+        # Part des appels évités = direct / (direct + llm), aussi exposée par /metrics
+        registry.inc("extractive_answers", outcome=outcome)
+        return result
+
+    def fallback(self, model, question: str, docs: List[Dict[str, Any]], max_sentences: int = 3) -> Optional[str]:
+        """Réponse de secours : les phrases les plus proches de la question"""
+        ranked = self.rank_sentences(model, question, docs)[:max_sentences]
+        if not ranked:
+            return None
+        return "\n\n".join(f"{i}. {c['sentence']}" for i, c in enumerate(ranked, 1))
+
+    @property
+    def llm_avoided_rate(self) -> float:
+        """Part des questions traitées sans appel au LLM"""
+        with self._lock:
+            total = self.stats["direct"] + self.stats["llm"]
+            return self.stats["direct"] / total if total else 0.0
@@ -0,0 +1,162 @@
+"""
+Manifeste de statistiques d'un index FAISS (faiss_stats.json)
+
+Ecrit à côté de l'index par chaque écriture de l'index (indexer.py, interface
+admin) : nombre de chunks et de documents, dimension, format de stockage,
+date de construction, taille sur disque, répartition par source et numéro de
+génération. L'interface admin lit ce petit fichier au lieu de recharger le
+mapping et l'index. Le manifeste enregistre la taille, la date de modification
+et l'empreinte SHA-256 de l'index et du mapping qu'il décrit. Taille et date
+identiques : il est utilisé tel quel ; date différente (fichiers téléchargés),
+l'empreinte est recalculée ; s'ils ont été remplacés sans lui (ancien
+indexeur, index d'une autre génération), il est ignoré.
+"""
+import hashlib
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Back/app en fin de sys.path (écriture JSON atomique partagée)
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _APP_DIR not in sys.path:
+    sys.path.append(_APP_DIR)
+
+from json_store import atomic_write_json, file_lock, read_json
+from vector_index import get_index_type
+
+INDEX_STATS_FILENAME = "faiss_stats.json"
+
+
+def index_stats_path(index_path: str) -> str:
+    """Chemin du manifeste associé à un fichier d'index"""
+    return os.path.join(os.path.dirname(index_path), INDEX_STATS_FILENAME)
+
+
+def source_kind(url: str) -> str:
+    """Type de source d'un chunk : page web, PDF en ligne ou document uploadé"""
+    if url.startswith(("http://", "https://")):
+        return "pdf" if url.lower().split("?")[0].endswith(".pdf") else "web"
+    return "upload"
+
+
+def _file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _file_mtime(path: str) -> int:
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+
+
+def _file_digest(path: str) -> Optional[str]:
+    """Empreinte SHA-256 du fichier (lu par blocs), None s'il est absent"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_index_stats(
+    index,
+    urls: List[str],
+    doc_indices: List[int],
+    index_path: str,
+    mapping_path: str,
+    generation: int = 1
+) -> Dict[str, Any]:
+    """
+    Statistiques d'un index qui vient d'être écrit
+
+    Args:
+        index: Index FAISS
+        urls: Source de chaque chunk
+        doc_indices: Document d'origine de chaque chunk
+        index_path, mapping_path: Fichiers écrits (pour leur taille, date et empreinte)
+        generation: Numéro de génération de l'index
+
+    Returns:
+        Dictionnaire du manifeste
+    """
+    documents = {}
+    for url, doc_index in zip(urls, doc_indices or range(len(urls))):
+        documents.setdefault(doc_index, url)
+
+    chunks_per_kind = Counter(source_kind(url) for url in urls)
+    documents_per_kind = Counter(source_kind(url) for url in documents.values())
+
+    return {
+        "generation": generation,
+        "built_at": datetime.now().isoformat(),
+        "chunk_count": int(index.ntotal),
+        "document_count": len(documents),
+        "embedding_dim": int(index.d),
+        "index_type": get_index_type(index),
+        "index_bytes": _file_size(index_path),
+        "mapping_bytes": _file_size(mapping_path),
+        "index_mtime_ns": _file_mtime(index_path),
+        "mapping_mtime_ns": _file_mtime(mapping_path),
+        "index_sha256": _file_digest(index_path),
+        "mapping_sha256": _file_digest(mapping_path),
+        "sources": {
+            kind: {"documents": documents_per_kind[kind], "chunks": chunks_per_kind[kind]}
+            for kind in sorted(chunks_per_kind)
+        },
+    }
+
+
+def write_index_stats(
+    index,
+    urls: List[str],
+    doc_indices: List[int],
+    index_path: str,
+    mapping_path: str
+) -> Dict[str, Any]:
+    """Ecrit le manifeste de l'index (génération précédente + 1) et le retourne"""
+    path = index_stats_path(index_path)
+    # Lecture et écriture sous verrou : deux écritures simultanées ne reprennent pas la même génération
+    with file_lock(path):
+        previous = read_json(path, {}) or {}
+        stats = build_index_stats(
+            index, urls, doc_indices, index_path, mapping_path,
+            generation=int(previous.get("generation", 0)) + 1
+        )
+        atomic_write_json(path, stats, indent=2)
+    return stats
+
+
+def read_index_stats(index_path: str, mapping_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Manifeste de l'index s'il décrit bien les fichiers présents
+
+    Returns:
+        Dictionnaire du manifeste, ou None s'il est absent ou périmé
+    """
+    path = index_stats_path(index_path)
+    stats = read_json(path)
+    if not isinstance(stats, dict):
+        return None
+
+    touched = False
+    for prefix, file_path in (("index", index_path), ("mapping", mapping_path)):
+        if stats.get(f"{prefix}_bytes") != _file_size(file_path):
+            return None
+        mtime = _file_mtime(file_path)
+        if stats.get(f"{prefix}_mtime_ns") != mtime:
+            # Même taille, autre date : fichier téléchargé ou remplacé, comparé par son empreinte
+            digest = stats.get(f"{prefix}_sha256")
+            if digest is None or digest != _file_digest(file_path):
+                return None
+            stats[f"{prefix}_mtime_ns"] = mtime
+            touched = True
+
+    if touched:
+        # Dates mises à jour pour ne pas recalculer les empreintes à chaque lecture
+        with file_lock(path):
+            current = read_json(path, {}) or {}
+            if current.get("generation") == stats.get("generation"):
+                atomic_write_json(path, stats, indent=2)
+    return stats
@@ -1,20 +1,21 @@
 import json
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from chunker import chunk_documents
+from embeddings import get_embedding_backend
+from vector_index import build_faiss_index, FAISS_INDEX_TYPE
+from url_routes import save_url_routes, URL_ROUTES_FILENAME
+from index_manifest import write_index_stats
 from datetime import datetime
 import shutil
 import os
 
-JSON_PATH = "data/scraped_data.json"
-INDEX_PATH = "data/faiss_index.bin"
-MAPPING_PATH = "data/faiss_mapping.json"
-
-# Utiliser un modèle multilingue cohérent
-MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
-# Chemin du modèle pré-chargé sur GCP
-GCP_MODEL_CACHE_PATH = '/root/.cache/huggingface/hub/models--sentence-transformers--paraphrase-multilingual-MiniLM-L12-v2/snapshots/86741b4e3f5cb7765a600d3a3d55a0f6a6cb443d'
+# Fichiers lus par le RAG (Back/app/rag/data), quel que soit le répertoire de lancement
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+JSON_PATH = os.path.join(DATA_DIR, "scraped_data.json")
+INDEX_PATH = os.path.join(DATA_DIR, "faiss_index.bin")
+MAPPING_PATH = os.path.join(DATA_DIR, "faiss_mapping.json")
+URL_ROUTES_PATH = os.path.join(DATA_DIR, URL_ROUTES_FILENAME)
 
 # Paramètres de chunking
 CHUNK_SIZE = 1000  # Taille d'un chunk en caractères (800-1500 recommandé)
@@ -27,13 +28,9 @@ def load_scraped_data(path):
 
 def make_embeddings(texts, batch_size=64):
     """Génère les embeddings par batch pour économiser la mémoire"""
-    # Charger le modèle : GCP cache si disponible, sinon HuggingFace
-    if os.path.exists(GCP_MODEL_CACHE_PATH):
-        print("Indexer: Chargement du modèle depuis le cache GCP")
-        model = SentenceTransformer(GCP_MODEL_CACHE_PATH)
-    else:
-        print(f"Indexer: Chargement du modèle {MODEL_NAME} depuis HuggingFace")
-        model = SentenceTransformer(MODEL_NAME)
+    # Backend configuré par EMBEDDING_BACKEND (torch ou onnx, voir embeddings.py)
+    backend = get_embedding_backend()
+    print(f"Indexer: Backend d'embedding {backend.name}")
     
     all_embeddings = []
     
@@ -41,31 +38,20 @@ def make_embeddings(texts, batch_size=64):
     for i in range(0, len(texts), batch_size):
         batch = texts[i:i+batch_size]
         print(f"  Batch {i//batch_size + 1}/{(len(texts)-1)//batch_size + 1}")
-        embeddings = model.encode(
-            batch, 
-            convert_to_numpy=True, 
-            normalize_embeddings=True, 
-            show_progress_bar=False
-        )
+        embeddings = backend.encode(batch, batch_size=batch_size)
         all_embeddings.append(embeddings)
     
     return np.vstack(all_embeddings)
 
-def build_faiss_index(embeddings):
-    dim = embeddings.shape[1]
-    # IndexFlatIP pour cosine similarity avec embeddings normalisés
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings)
-    return index
-
 def archive_old_index():
     """Archive l'ancien index FAISS avec un timestamp"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    archive_folder = f"data/archive_{timestamp}"
+    archive_folder = os.path.join(DATA_DIR, f"archive_{timestamp}")
     
     files_to_archive = [
         INDEX_PATH,
-        MAPPING_PATH
+        MAPPING_PATH,
+        URL_ROUTES_PATH
     ]
     
     existing_files = [f for f in files_to_archive if os.path.exists(f)]
@@ -110,6 +96,7 @@ if __name__ == "__main__":
     print(f"   {chunks[0][:200]}...")
 
     embeds = make_embeddings(chunks)
+    # Format de stockage choisi par FAISS_INDEX_TYPE (flat, fp16 ou sq8)
     index = build_faiss_index(embeds)
 
     faiss.write_index(index, INDEX_PATH)
@@ -121,6 +108,12 @@ if __name__ == "__main__":
             "doc_indices": doc_indices  # Pour retrouver le document d'origine
         }, f, ensure_ascii=False, indent=2)
 
-    print(f"\nIndex FAISS cree: {embeds.shape[0]} chunks, dimension {embeds.shape[1]}")
+    # Centroïde par page pour choisir la page à scraper quand les chunks sont peu pertinents
+    save_url_routes(URL_ROUTES_PATH, urls, embeds)
+
+    # Statistiques lues par l'interface admin sans recharger l'index
+    write_index_stats(index, urls, doc_indices, INDEX_PATH, MAPPING_PATH)
+
+    print(f"\nIndex FAISS cree ({FAISS_INDEX_TYPE}): {embeds.shape[0]} chunks, dimension {embeds.shape[1]}")
     print(f"   Fichiers: {INDEX_PATH} et {MAPPING_PATH}")
     print(f"Termine!")
\ No newline at end of file
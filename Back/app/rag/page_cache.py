@@ -0,0 +1,166 @@
+"""
+Cache des pages du site ESILV scrapées en direct
+
+Quand les résultats FAISS sont peu pertinents, le RAG scrape une page du site
+pendant la requête (requests + BeautifulSoup). PageCache garde le texte des
+pages récentes (LRU) : dans le délai PAGE_CACHE_TTL la page est servie
+directement ; au-delà (et jusqu'à PAGE_CACHE_MAX_STALE) l'ancienne version est
+servie pendant qu'un thread la rafraîchit. Les requêtes simultanées sur une
+page absente du cache partagent un seul téléchargement.
+
+Un téléchargement en échec (ou vide) est mémorisé PAGE_CACHE_FAILURE_TTL
+secondes : pendant ce délai la page n'est pas retéléchargée à chaque requête.
+on_update (indexation de la page) est appelée par un thread dédié, après que
+les requêtes en attente ont reçu le texte.
+"""
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+# Durée de validité d'une page, délai supplémentaire pendant lequel elle est servie en
+# attendant son rafraîchissement (s), et nombre maximal de pages gardées
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+PAGE_CACHE_MAX_STALE = float(os.getenv("PAGE_CACHE_MAX_STALE", "86400"))
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "64"))
+# Délai pendant lequel un téléchargement en échec n'est pas retenté (s)
+PAGE_CACHE_FAILURE_TTL = float(os.getenv("PAGE_CACHE_FAILURE_TTL", "60"))
+
+
+class PageCache:
+    """
+    Cache LRU avec expiration et rafraîchissement en arrière-plan
+
+    Args:
+        fetch: Fonction url -> texte de la page (None en cas d'échec)
+        ttl: Durée de validité d'une page (s)
+        max_stale: Délai après expiration pendant lequel l'ancienne version est servie (s)
+        max_entries: Nombre maximal de pages gardées
+        on_update: Appelée avec (url, texte) après chaque téléchargement réussi
+            (dans un thread dédié, sans retarder les requêtes qui attendent la page)
+        failure_ttl: Délai pendant lequel un échec est servi depuis le cache (s)
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Optional[str]],
+        ttl: float = PAGE_CACHE_TTL,
+        max_stale: float = PAGE_CACHE_MAX_STALE,
+        max_entries: int = PAGE_CACHE_SIZE,
+        on_update: Optional[Callable[[str, str], None]] = None,
+        failure_ttl: float = PAGE_CACHE_FAILURE_TTL
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max(1, max_entries)
+        self.on_update = on_update
+        self.failure_ttl = failure_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # url -> date du dernier échec
+        self._failures: "OrderedDict[str, float]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._updates: "queue.Queue" = queue.Queue()
+        self._updater: Optional[threading.Thread] = None
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "refreshes": 0, "failures": 0}
+
+    def get(self, url: str) -> Optional[str]:
+        """Texte de la page : depuis le cache si possible, sinon téléchargé"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                text, fetched_at = entry
+                age = time.time() - fetched_at
+                if age <= self.ttl + self.max_stale:
+                    self._entries.move_to_end(url)
+                    if age <= self.ttl:
+                        self.stats["hits"] += 1
+                    else:
+                        # Version expirée servie, rafraîchie en arrière-plan
+                        self.stats["stale"] += 1
+                        self._start_refresh(url)
+                    return text
+
+            if self._recent_failure(url):
+                self.stats["failures"] += 1
+                return None
+
+            self.stats["misses"] += 1
+            future = self._inflight.get(url)
+            owner = future is None
+            if owner:
+                future = self._inflight[url] = Future()
+
+        if owner:
+            self._download(url, future)
+        return future.result()
+
+    def _start_refresh(self, url: str):
+        """Lance un rafraîchissement si aucun téléchargement de la page n'est en cours (verrou tenu)"""
+        if url in self._inflight or self._recent_failure(url):
+            return
+        future = self._inflight[url] = Future()
+        self.stats["refreshes"] += 1
+        threading.Thread(target=self._download, args=(url, future), name="page-cache-refresh", daemon=True).start()
+
+    def _recent_failure(self, url: str) -> bool:
+        """Vrai si le dernier téléchargement de la page a échoué il y a moins de failure_ttl (verrou tenu)"""
+        failed_at = self._failures.get(url)
+        if failed_at is None:
+            return False
+        if time.time() - failed_at < self.failure_ttl:
+            return True
+        del self._failures[url]
+        return False
+
+    def _download(self, url: str, future: Future):
+        text = None
+        try:
+            text = self.fetch(url)
+        except Exception as e:
+            print(f"Erreur lors du téléchargement de {url}: {e}")
+        finally:
+            with self._lock:
+                if text:
+                    self._entries[url] = (text, time.time())
+                    self._entries.move_to_end(url)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                    self._failures.pop(url, None)
+                else:
+                    text = None
+                    self._failures[url] = time.time()
+                    self._failures.move_to_end(url)
+                    while len(self._failures) > self.max_entries:
+                        self._failures.popitem(last=False)
+                self._inflight.pop(url, None)
+            # Les requêtes en attente reçoivent la page avant son indexation
+            future.set_result(text)
+
+        if text and self.on_update is not None:
+            self._schedule_update(url, text)
+
+    def _schedule_update(self, url: str, text: str):
+        """Transmet la page au thread qui appelle on_update (démarré à la première page)"""
+        with self._lock:
+            if self._updater is None:
+                self._updater = threading.Thread(target=self._run_updates, name="page-cache-index", daemon=True)
+                self._updater.start()
+        self._updates.put((url, text))
+
+    def _run_updates(self):
+        while True:
+            url, text = self._updates.get()
+            try:
+                self.on_update(url, text)
+            except Exception as e:
+                print(f"Erreur lors de l'indexation de {url}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._failures.clear()
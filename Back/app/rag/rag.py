@@ -1,17 +1,38 @@
 import os
 import json
+import asyncio
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import vertexai
-from vertexai.generative_models import GenerativeModel
 from dotenv import load_dotenv
 import requests
 from bs4 import BeautifulSoup
 import re
+import time
+import threading
+import sys
+import logging
+from collections import OrderedDict
+
+# Back/app en fin de sys.path (client LLM partagé) pour ne pas masquer ce module par le package rag/
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _APP_DIR not in sys.path:
+    sys.path.append(_APP_DIR)
+
+from llm_client import get_llm_client, LLMTimeout, VERTEX_MODEL
+from telemetry import get_logger, span
+from workers import run_cpu, run_io
+from embeddings import get_embedding_backend, GCP_MODEL_CACHE_PATH
+from vector_index import load_faiss_index
+from batching import MicroBatcher, QUERY_BATCH_SIZE
+from extractive import ExtractiveAnswerer, EXTRACTIVE_ANSWERS
+from page_cache import PageCache, PAGE_CACHE_SIZE
+from chunker import smart_chunk_text
+from url_routes import load_url_routes, routes_from_index, URL_ROUTES_FILENAME
 
 load_dotenv()
 
+logger = get_logger("rag")
+
 # Utiliser des chemins absolus pour trouver les fichiers depuis n'importe où
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
@@ -24,11 +45,16 @@ PDF_MAPPING_PATH = os.path.join(PDF_DATA_DIR, "faiss_mapping.json")
 RAG_DATA_DIR = os.path.join(PROJECT_ROOT, "Back", "app", "rag", "data")
 RAG_INDEX_PATH = os.path.join(RAG_DATA_DIR, "faiss_index.bin")
 RAG_MAPPING_PATH = os.path.join(RAG_DATA_DIR, "faiss_mapping.json")
+RAG_URL_ROUTES_PATH = os.path.join(RAG_DATA_DIR, URL_ROUTES_FILENAME)
 
 MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
-VERTEX_MODEL = os.getenv("VERTEX_MODEL", "gemini-2.0-flash-exp")
-VERTEX_PROJECT = os.getenv("VERTEX_PROJECT", "esilv-smart-assistant")
-VERTEX_LOCATION = os.getenv("VERTEX_LOCATION", "us-central1")
+# Préchauffage du modèle en arrière-plan dès le démarrage (désactiver avec RAG_WARMUP=0)
+RAG_WARMUP = os.getenv("RAG_WARMUP", "1") != "0"
+WARMUP_QUERIES = [
+    "ESILV",
+    "Quels sont les frais de scolarité ?",
+    "Comment se déroule le cycle ingénieur et quelles sont les majeures proposées en dernière année ?",
+]
 
 SYSTEM_PROMPT = os.getenv(
     "SYSTEM_PROMPT", 
@@ -37,12 +63,211 @@ SYSTEM_PROMPT = os.getenv(
     "Reponds toujours en francais et de maniere claire et concise."
 )
 
+# Etat du préchauffage du modèle d'embedding (partagé par tout le processus)
+_model_ready = threading.Event()
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+
+
+def get_embedding_model():
+    """Retourne le backend d'embedding du processus (voir embeddings.py), chargé une seule fois"""
+    return get_embedding_backend()
+
+
+def warm_up_model():
+    """
+    Charge le modèle puis exécute quelques encodages factices pour que le premier
+    utilisateur ne paie ni le chargement ni l'initialisation des noyaux (torch / ONNX Runtime)
+    """
+    if _model_ready.is_set():
+        return
+    
+    start = time.time()
+    model = get_embedding_model()
+    for query in WARMUP_QUERIES:
+        model.encode([query])
+    model.encode(WARMUP_QUERIES)
+    
+    _model_ready.set()
+    print(f"Modèle d'embedding préchauffé en {time.time() - start:.1f}s")
+
+
+def start_warmup():
+    """Lance le préchauffage du modèle dans un thread d'arrière-plan (idempotent)"""
+    global _warmup_thread
+    
+    with _warmup_lock:
+        if _warmup_thread is not None or _model_ready.is_set():
+            return _warmup_thread
+        _warmup_thread = threading.Thread(target=_safe_warm_up, name="rag-warmup", daemon=True)
+        _warmup_thread.start()
+    
+    return _warmup_thread
+
+
+def _safe_warm_up():
+    try:
+        warm_up_model()
+    except Exception as e:
+        print(f"Erreur lors du préchauffage du modèle: {e}")
+
+
+_query_batcher_lock = threading.Lock()
+_query_batcher = None
+
+
+def _search_pending(items):
+    """
+    Traite un lot de requêtes de toutes les instances du processus : un seul
+    encode() pour tout le lot, puis une recherche multi-requêtes par instance
+
+    Args:
+        items: Liste de tuples (instance FaissRAGGemini, query, k)
+
+    Returns:
+        Résultat de _search_embeddings pour chaque requête, dans l'ordre
+    """
+    queries = [query for _, query, _ in items]
+    with span("embed"):
+        q_embs = get_embedding_model().encode(queries, batch_size=len(queries))
+
+    groups = {}
+    for row, (rag, _, _) in enumerate(items):
+        groups.setdefault(id(rag), (rag, []))[1].append(row)
+
+    results = [None] * len(items)
+    for rag, rows in groups.values():
+        found = rag._search_embeddings(
+            [items[row][1] for row in rows], q_embs[rows], [items[row][2] for row in rows]
+        )
+        for row, result in zip(rows, found):
+            results[row] = result
+    return results
+
+
+def get_query_batcher():
+    """
+    File de requêtes du processus (None si QUERY_BATCH_SIZE <= 1)
+
+    Partagée par toutes les instances (une par session Streamlit) : les questions
+    de sessions différentes sont encodées ensemble, et le thread de traitement ne
+    garde aucune référence vers les instances en dehors des lots en cours
+    """
+    global _query_batcher
+
+    if QUERY_BATCH_SIZE <= 1:
+        return None
+    if _query_batcher is not None:
+        return _query_batcher
+
+    with _query_batcher_lock:
+        if _query_batcher is None:
+            _query_batcher = MicroBatcher(_search_pending, name="rag-query-batcher")
+
+    return _query_batcher
+
+
+# Pages scrapées en direct, partagées par toutes les instances du processus : cache
+# des pages et petit index en mémoire (urls, textes, embeddings), remplacé en bloc
+# sous _live_lock à chaque ajout et lu sans verrou (une seule référence à copier)
+_live_lock = threading.Lock()
+_live_pages = ([], [], None)
+_page_cache_lock = threading.Lock()
+_page_cache = None
+
+
+def fetch_page(url):
+    """Scrape une page web et retourne son contenu"""
+    try:
+        r = requests.get(url, timeout=10)
+        # Une page d'erreur (404, 500...) compte comme un échec (mémorisé par le cache)
+        r.raise_for_status()
+        soup = BeautifulSoup(r.text, "html.parser")
+        
+        # Supprimer les éléments non pertinents
+        for tag in soup(["script", "style", "noscript", "nav", "header", "footer", "aside", "iframe"]):
+            tag.extract()
+        
+        # Chercher le contenu principal
+        main_content = None
+        for tag in ['main', 'article']:
+            main_content = soup.find(tag)
+            if main_content:
+                break
+        
+        if not main_content:
+            main_content = soup.find('body')
+        
+        if main_content:
+            text = main_content.get_text(separator=" ", strip=True)
+        else:
+            text = soup.get_text(separator=" ", strip=True)
+        
+        # Nettoyer les espaces multiples
+        text = ' '.join(text.split())
+        # Limiter à 5000 caractères pour ne pas surcharger le contexte
+        return text[:5000]
+    except Exception as e:
+        print(f"Erreur lors du scraping de {url}: {e}")
+        return None
+
+
+def index_live_page(url, text):
+    """Ajoute (ou remplace) les chunks d'une page scrapée dans l'index en mémoire du processus"""
+    global _live_pages
+    
+    chunks = smart_chunk_text(text, chunk_size=1000, overlap=100, min_chunk_size=150)
+    if not chunks:
+        return
+    embeddings = get_embedding_model().encode(chunks)
+    
+    with _live_lock:
+        urls, texts, previous = _live_pages
+        # Chaque page est ajoutée en fin de liste : au-delà de PAGE_CACHE_SIZE pages,
+        # les plus anciennes sortent de l'index
+        recent = set(list(dict.fromkeys(u for u in reversed(urls) if u != url))[:max(0, PAGE_CACHE_SIZE - 1)])
+        keep = [i for i, u in enumerate(urls) if u in recent]
+        new_urls = [urls[i] for i in keep] + [url] * len(chunks)
+        new_texts = [texts[i] for i in keep] + chunks
+        if previous is not None and keep:
+            embeddings = np.vstack([previous[keep], embeddings])
+        _live_pages = (new_urls, new_texts, np.ascontiguousarray(embeddings, dtype="float32"))
+    print(f"Page {url} ajoutee a l'index en memoire ({len(chunks)} chunks)")
+
+
+def get_live_pages():
+    """Instantané de l'index des pages scrapées : (urls, textes, embeddings ou None)"""
+    return _live_pages
+
+
+def get_page_cache() -> PageCache:
+    """Cache des pages scrapées du processus, créé à la première utilisation"""
+    global _page_cache
+    
+    if _page_cache is not None:
+        return _page_cache
+    
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache(fetch_page, on_update=index_live_page)
+    
+    return _page_cache
+
+
+def get_warmup_status() -> str:
+    """Etat du modèle d'embedding : 'ready', 'warming' ou 'cold'"""
+    if _model_ready.is_set():
+        return "ready"
+    if _warmup_thread is not None and _warmup_thread.is_alive():
+        return "warming"
+    return "cold"
+
+
 class FaissRAGGemini:
-    def __init__(self):
+    def __init__(self, warmup: bool = RAG_WARMUP):
         try:
-            # Configurer Vertex AI
-            vertexai.init(project=VERTEX_PROJECT, location=VERTEX_LOCATION)
-            self.llm = GenerativeModel(VERTEX_MODEL)
+            # Client Vertex AI partagé par tout le processus (voir llm_client.py)
+            self.llm = get_llm_client()
         except Exception as e:
             raise ValueError(f"Erreur initialisation Vertex AI: {e}")
         
@@ -52,7 +277,7 @@ class FaissRAGGemini:
         self.pdf_texts = []
         
         if os.path.exists(PDF_INDEX_PATH) and os.path.exists(PDF_MAPPING_PATH):
-            self.pdf_index = faiss.read_index(PDF_INDEX_PATH)
+            self.pdf_index = load_faiss_index(PDF_INDEX_PATH)
             with open(PDF_MAPPING_PATH, "r", encoding="utf-8") as f:
                 mapping = json.load(f)
             self.pdf_urls = mapping["urls"]
@@ -67,7 +292,7 @@ class FaissRAGGemini:
         self.rag_texts = []
         
         if os.path.exists(RAG_INDEX_PATH) and os.path.exists(RAG_MAPPING_PATH):
-            self.rag_index = faiss.read_index(RAG_INDEX_PATH)
+            self.rag_index = load_faiss_index(RAG_INDEX_PATH)
             with open(RAG_MAPPING_PATH, "r", encoding="utf-8") as f:
                 mapping = json.load(f)
             self.rag_urls = mapping["urls"]
@@ -76,12 +301,63 @@ class FaissRAGGemini:
         else:
             print(f"Index URLs scraped non trouve")
         
-        # NE PAS charger le modèle au démarrage (lazy loading)
+        # Centroïdes par page pour le scraping de secours (python Back/app/rag/url_routes.py)
+        self.url_router = load_url_routes(RAG_URL_ROUTES_PATH)
+        if self.url_router is None and self.rag_index is not None:
+            # Fichier absent : centroïdes recalculés depuis les vecteurs de l'index
+            self.url_router = routes_from_index(self.rag_index, self.rag_urls)
+            if self.url_router is not None:
+                print(f"Routes URL calculees depuis l'index : {len(self.url_router.urls)} pages")
+        if self.url_router is None:
+            print("Routes URL non trouvees, choix de la page par mots-cles")
+        
+        # Le modèle est partagé par le processus et chargé en arrière-plan (ou à la première utilisation)
         self.model = None
-        self.gcp_cache_path = '/root/.cache/huggingface/hub/models--sentence-transformers--paraphrase-multilingual-MiniLM-L12-v2/snapshots/86741b4e3f5cb7765a600d3a3d55a0f6a6cb443d'
+        self.gcp_cache_path = GCP_MODEL_CACHE_PATH
+        self.ready = threading.Event()
+        # Requêtes simultanées de toutes les sessions encodées et recherchées par lots
+        # (QUERY_BATCH_SIZE=0 pour désactiver)
+        self._batcher = get_query_batcher()
+        # Réponses extractives sans LLM pour les questions factuelles simples (voir extractive.py)
+        self.extractive = ExtractiveAnswerer()
+        # Pages scrapées en direct : cache et index en mémoire partagés par le processus
+        self.page_cache = get_page_cache()
+        # Derniers embeddings de questions calculés par retrieve(), réutilisés pour le routage des pages
+        self._query_embeddings = OrderedDict()
+        self._query_embeddings_lock = threading.Lock()
         
         print(f"Modele Vertex AI : {VERTEX_MODEL}")
-        print("Modele d'embedding sera charge a la premiere utilisation")
+        if warmup:
+            threading.Thread(target=self.warm_up, name="rag-instance-warmup", daemon=True).start()
+            print("Modele d'embedding en cours de prechauffage")
+        else:
+            print("Modele d'embedding sera charge a la premiere utilisation")
+
+    def warm_up(self):
+        """
+        Préchauffe le modèle partagé puis parcourt les index FAISS une fois
+        pour que leurs pages soient en mémoire avant la première requête
+        """
+        try:
+            warm_up_model()
+            self.model = get_embedding_model()
+            
+            dummy = self.model.encode([WARMUP_QUERIES[0]])
+            for index in (self.rag_index, self.pdf_index):
+                if index is not None and index.ntotal > 0:
+                    index.search(dummy, min(5, index.ntotal))
+        except Exception as e:
+            print(f"Erreur lors du préchauffage du RAG: {e}")
+        finally:
+            self.ready.set()
+
+    def is_ready(self) -> bool:
+        """True quand le modèle et les index sont chauds"""
+        return self.ready.is_set()
+
+    def get_status(self) -> str:
+        """Etat de l'instance : 'ready' ou 'warming'"""
+        return "ready" if self.is_ready() else "warming"
 
     def reload_index(self):
         """
@@ -104,7 +380,7 @@ class FaissRAGGemini:
                 return False
             
             # Recharger l'index PDF et le mapping
-            self.pdf_index = faiss.read_index(PDF_INDEX_PATH)
+            self.pdf_index = load_faiss_index(PDF_INDEX_PATH)
             with open(PDF_MAPPING_PATH, "r", encoding="utf-8") as f:
                 mapping = json.load(f)
             self.pdf_urls = mapping["urls"]
@@ -121,120 +397,152 @@ class FaissRAGGemini:
         if self.model is not None:
             return  # Déjà chargé
         
-        print("Chargement du modèle d'embedding...")
-        if os.path.exists(self.gcp_cache_path):
-            print("Utilisation du cache GCP")
-            self.model = SentenceTransformer(self.gcp_cache_path)
-        else:
-            print(f"Téléchargement depuis HuggingFace: {MODEL_NAME}")
-            self.model = SentenceTransformer(MODEL_NAME)
-        print("Modèle chargé avec succès")
+        self.model = get_embedding_model()
 
     def retrieve(self, query, k=5):
         # Charger le modèle si nécessaire
         self._ensure_model_loaded()
         
-    def retrieve(self, query, k=5):
-        """Recherche dans les DEUX index (PDFs + URLs) et retourne les k meilleurs résultats combinés"""
+    def _search_batch(self, items):
+        """
+        Encode un lot de requêtes en un seul appel puis interroge chaque index
+        avec une recherche multi-requêtes
+        
+        Args:
+            items: Liste de tuples (query, k)
+            
+        Returns:
+            Pour chaque requête, le résultat de _search_embeddings
+        """
         self._ensure_model_loaded()
         
-        q_emb = self.model.encode(
-            [query],
-            convert_to_numpy=True,
-            normalize_embeddings=True
-        )
-        q_emb = np.ascontiguousarray(q_emb, dtype="float32")
+        queries = [query for query, _ in items]
+        with span("embed"):
+            q_embs = self.model.encode(queries, batch_size=len(queries))
+        return self._search_embeddings(queries, q_embs, [k for _, k in items])
 
-        results = []
+    def _search_embeddings(self, queries, q_embs, ks):
+        """
+        Recherche multi-requêtes dans les index de l'instance
         
-        # Chercher k résultats dans chaque index
-        if self.rag_index is not None:
-            scores, ids = self.rag_index.search(q_emb, k)
-            for i, score in zip(ids[0], scores[0]):
-                if i != -1 and i < len(self.rag_texts):
-                    results.append({
-                        "url": self.rag_urls[i],
-                        "text": self.rag_texts[i],
-                        "score": float(score),
-                        "chunk_id": int(i),
-                        "source": "URL"
-                    })
+        Args:
+            queries: Questions (gardées pour le routage des pages de secours)
+            q_embs: Embeddings des questions (n, d)
+            ks: Nombre de résultats voulus pour chaque question
+            
+        Returns:
+            Pour chaque requête, un tuple (résultats URL, résultats PDF, pages scrapées) :
+            les deux premiers valent (scores, ids) ou None si l'index est absent, le
+            dernier est une liste de résultats au format de retrieve()
+        """
+        k_max = max(ks)
+        with self._query_embeddings_lock:
+            for query, q_emb in zip(queries, q_embs):
+                self._query_embeddings[query] = q_emb
+                self._query_embeddings.move_to_end(query)
+            while len(self._query_embeddings) > 256:
+                self._query_embeddings.popitem(last=False)
+        
+        with span("search"):
+            per_index = []
+            for index in (self.rag_index, self.pdf_index):
+                per_index.append(index.search(q_embs, k_max) if index is not None else None)
+            
+            live_urls, live_texts, live_embeddings = get_live_pages()
+            live_scores = q_embs @ live_embeddings.T if live_embeddings is not None else None
         
-        print(f"\nRecherche: '{query}'")
-        print(f"URLs trouvées (top {k}):")
-        for r in [r for r in results if r['source'] == 'URL'][:5]:
-            print(f"  Score: {r['score']:.4f} | {r['text'][:80].replace(chr(10), ' ')}...")
-        
-        if self.pdf_index is not None:
-            scores, ids = self.pdf_index.search(q_emb, k)
-            for i, score in zip(ids[0], scores[0]):
-                if i != -1 and i < len(self.pdf_texts):
-                    results.append({
-                        "url": self.pdf_urls[i],
-                        "text": self.pdf_texts[i],
-                        "score": float(score),
+        results = []
+        for row, k in enumerate(ks):
+            live_found = []
+            if live_scores is not None:
+                for i in np.argsort(-live_scores[row])[:k]:
+                    live_found.append({
+                        "url": live_urls[i],
+                        "text": live_texts[i],
+                        "score": float(live_scores[row, i]),
                         "chunk_id": int(i),
-                        "source": "PDF"
+                        "source": "URL"
                     })
-        
-        print(f"PDFs trouvés (top {k}):")
-        for r in [r for r in results if r['source'] == 'PDF'][:5]:
-            print(f"  Score: {r['score']:.4f} | {r['text'][:80].replace(chr(10), ' ')}...")
-        
-        # Trier tous les résultats par score DÉCROISSANT (plus grand score = meilleur pour cosine similarity)
-        results.sort(key=lambda x: x['score'], reverse=True)
-        results = results[:k]
-        
-        print(f"\nRésultats FINAUX après tri (top {k}):")
-        for rank, r in enumerate(results, 1):
-            text_preview = r['text'][:100].replace('\n', ' ')
-            print(f"  {rank}. Score: {r['score']:.4f} [{r['source']}] | {text_preview}...")
-            print(f"     Source: {r['url'][:80]}")
-
+            results.append(tuple(
+                (found[0][row:row + 1, :k], found[1][row:row + 1, :k]) if found is not None else None
+                for found in per_index
+            ) + (live_found,))
         return results
 
-    def _scrape_page(self, url):
-        """Scrape une page web et retourne son contenu"""
-        try:
-            r = requests.get(url, timeout=10)
-            soup = BeautifulSoup(r.text, "html.parser")
-            
-            # Supprimer les éléments non pertinents
-            for tag in soup(["script", "style", "noscript", "nav", "header", "footer", "aside", "iframe"]):
-                tag.extract()
-            
-            # Chercher le contenu principal
-            main_content = None
-            for tag in ['main', 'article']:
-                main_content = soup.find(tag)
-                if main_content:
-                    break
-            
-            if not main_content:
-                main_content = soup.find('body')
+    def _search(self, query, k):
+        """Recherche d'une requête, regroupée avec les requêtes simultanées si le batching est actif"""
+        if self._batcher is not None:
+            return self._batcher.submit((self, query, k))
+        return self._search_batch([(query, k)])[0]
+
+    def retrieve(self, query, k=5):
+        """Recherche dans les DEUX index (PDFs + URLs) et retourne les k meilleurs résultats combinés"""
+        return self._merge_results(query, k, self._search(query, k))
+
+    def _merge_results(self, query, k, found):
+        """Combine les résultats des index (et des pages live) en k documents triés par score"""
+        rag_found, pdf_found, live_found = found
+
+        with span("merge"):
+            # Pages du site déjà scrapées en direct pour des requêtes précédentes
+            results = list(live_found)
             
-            if main_content:
-                text = main_content.get_text(separator=" ", strip=True)
-            else:
-                text = soup.get_text(separator=" ", strip=True)
+            # Chercher k résultats dans chaque index
+            for found, urls, texts, source in (
+                (rag_found, self.rag_urls, self.rag_texts, "URL"),
+                (pdf_found, self.pdf_urls, self.pdf_texts, "PDF"),
+            ):
+                if found is None:
+                    continue
+                scores, ids = found
+                for i, score in zip(ids[0], scores[0]):
+                    if i != -1 and i < len(texts):
+                        results.append({
+                            "url": urls[i],
+                            "text": texts[i],
+                            "score": float(score),
+                            "chunk_id": int(i),
+                            "source": source
+                        })
             
-            # Nettoyer les espaces multiples
-            text = ' '.join(text.split())
-            # Limiter à 5000 caractères pour ne pas surcharger le contexte
-            return text[:5000]
-        except Exception as e:
-            print(f"Erreur lors du scraping de {url}: {e}")
-            return None
+            # Trier tous les résultats par score DÉCROISSANT (plus grand score = meilleur pour cosine similarity)
+            results.sort(key=lambda x: x['score'], reverse=True)
+            results = results[:k]
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            lines = [f"Recherche: '{query}' (top {k})"]
+            for rank, r in enumerate(results, 1):
+                text_preview = r['text'][:100].replace('\n', ' ')
+                lines.append(f"  {rank}. Score: {r['score']:.4f} [{r['source']}] {r['url'][:80]} | {text_preview}...")
+            logger.debug("\n".join(lines))
+
+        return results
+
+    def _scrape_page(self, url):
+        """Contenu d'une page web, depuis le cache de pages si possible (voir page_cache.py)"""
+        return self.page_cache.get(url)
+
+    def _query_embedding(self, question):
+        """Embedding de la question, repris de retrieve() si déjà calculé"""
+        with self._query_embeddings_lock:
+            q_emb = self._query_embeddings.get(question)
+        if q_emb is None:
+            self._ensure_model_loaded()
+            q_emb = self.model.encode([question])[0]
+        return q_emb
 
     def _search_on_esilv_site(self, question):
         """Tente de trouver des pages pertinentes sur le site ESILV"""
         try:
-            # Utiliser Google pour rechercher sur le site ESILV
-            search_query = f"site:esilv.fr {question}"
-            # Note: Google limite les requêtes automatiques, c'est une solution simplifiée
-            # Pour une vraie implémentation, utilisez l'API Google Search ou un autre moteur
+            # Page dont le centroïde est le plus proche de la question (routes calculées à l'indexation)
+            if self.url_router is not None:
+                route = self.url_router.best(self._query_embedding(question))
+                if route is not None:
+                    url, score = route
+                    logger.debug(f"Page choisie par similarite ({score:.3f}): {url}")
+                    return url
             
-            # Fallback: essayer des URLs communes basées sur les mots-clés
+            # Dernier recours: URLs communes basées sur les mots-clés
             keywords_to_url = {
                 "admission": "https://www.esilv.fr/admissions/",
                 "tarif": "https://www.esilv.fr/admissions/tarifs-et-financement/",
@@ -267,12 +575,11 @@ class FaissRAGGemini:
             # Gemini n'a pas de system prompt séparé, on le combine avec le user prompt
             full_prompt = f"{system_prompt}\n\n{user_prompt}"
             
-            response = self.llm.generate_content(
-                full_prompt
-            )
-            
-            return response.text.strip()
+            return self.llm.generate(full_prompt).strip()
             
+        except LLMTimeout as e:
+            print(f"Gemini hors délai: {e}")
+            return None
         except Exception as e:
             print(f"Erreur Gemini: {e}")
             print(f"Type d'erreur: {type(e).__name__}")
@@ -286,16 +593,13 @@ class FaissRAGGemini:
             # Gemini n'a pas de system prompt séparé, on le combine avec le user prompt
             full_prompt = f"{system_prompt}\n\n{user_prompt}"
             
-            response = self.llm.generate_content(
-                full_prompt,
-                stream=True
-            )
-            
             # Yield chaque chunk de la réponse
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
+            for text in self.llm.stream(full_prompt):
+                yield text
             
+        except LLMTimeout as e:
+            print(f"Gemini hors délai (streaming): {e}")
+            yield None
         except Exception as e:
             print(f"Erreur Gemini streaming: {e}")
             print(f"Type d'erreur: {type(e).__name__}")
@@ -303,13 +607,78 @@ class FaissRAGGemini:
             traceback.print_exc()
             yield None
 
-    def answer(self, question: str, k: int = 5, fallback_mode: bool = True, enable_web_search: bool = True):
-        """Répond à une question en utilisant le RAG et le scraping en temps réel si nécessaire"""
-        docs = self.retrieve(question, k=k)
-        
-        # Vérifier si les résultats sont pertinents (score > 0.3)
-        has_relevant_docs = any(d['score'] > 0.3 for d in docs)
-        
+    async def _agenerate(self, system_prompt: str, user_prompt: str) -> str:
+        """Génère une réponse avec Google Gemini sans bloquer la boucle asyncio"""
+        try:
+            full_prompt = f"{system_prompt}\n\n{user_prompt}"
+            return (await self.llm.agenerate(full_prompt)).strip()
+        except LLMTimeout as e:
+            print(f"Gemini hors délai (async): {e}")
+            return None
+        except Exception as e:
+            print(f"Erreur Gemini (async): {e}")
+            return None
+    
+    async def _agenerate_stream(self, system_prompt: str, user_prompt: str):
+        """Génère une réponse en streaming avec Google Gemini sans bloquer la boucle asyncio"""
+        try:
+            full_prompt = f"{system_prompt}\n\n{user_prompt}"
+            async for text in self.llm.astream(full_prompt):
+                yield text
+        except LLMTimeout as e:
+            print(f"Gemini hors délai (streaming async): {e}")
+            yield None
+        except Exception as e:
+            print(f"Erreur Gemini streaming (async): {e}")
+            yield None
+
+    async def aretrieve(self, query, k=5):
+        """Version asyncio de retrieve() : aucun thread n'attend le lot du batcher"""
+        if self._batcher is not None:
+            found = await asyncio.wrap_future(self._batcher.submit_future((self, query, k)))
+        else:
+            # Embedding et recherche FAISS sont CPU : pool dédié (voir workers.py)
+            found = (await run_cpu(self._search_batch, [(query, k)]))[0]
+        return self._merge_results(query, k, found)
+
+    @staticmethod
+    def _needs_web_fallback(docs, enable_web_search: bool) -> bool:
+        """Vrai si aucun document n'est pertinent (score > 0.3) et que la recherche sur le site est activée"""
+        return enable_web_search and not any(d['score'] > 0.3 for d in docs)
+
+    def _build_user_prompt(self, question: str, docs, enable_web_search: bool = True) -> str:
+        """Construit le prompt à partir des documents retrouvés (et du site ESILV si besoin)"""
+        with span("prompt_build"):
+            additional_context = ""
+            if self._needs_web_fallback(docs, enable_web_search):
+                with span("fallback_scrape"):
+                    logger.debug("Les resultats du RAG ne sont pas assez pertinents. Recherche sur le site ESILV...")
+                    url = self._search_on_esilv_site(question)
+                    if url:
+                        logger.debug(f"Scraping de {url}...")
+                        additional_context = self._scraped_context(url, self._scrape_page(url))
+            return self._format_user_prompt(question, docs, additional_context)
+
+    async def _abuild_user_prompt(self, question: str, docs, enable_web_search: bool = True) -> str:
+        """Version asyncio de _build_user_prompt() : choix de la page dans le pool CPU, scraping dans le pool I/O"""
+        with span("prompt_build"):
+            additional_context = ""
+            if self._needs_web_fallback(docs, enable_web_search):
+                with span("fallback_scrape"):
+                    logger.debug("Les resultats du RAG ne sont pas assez pertinents. Recherche sur le site ESILV...")
+                    url = await run_cpu(self._search_on_esilv_site, question)
+                    if url:
+                        logger.debug(f"Scraping de {url}...")
+                        additional_context = self._scraped_context(url, await run_io(self._scrape_page, url))
+            return self._format_user_prompt(question, docs, additional_context)
+
+    @staticmethod
+    def _scraped_context(url, scraped_content) -> str:
+        if not scraped_content:
+            return ""
+        return f"\n\n[Contenu scrape depuis {url}]\n{scraped_content}"
+
+    def _format_user_prompt(self, question: str, docs, additional_context: str) -> str:
         # Les chunks sont déjà de taille raisonnable, pas besoin de tronquer autant
         # On combine les k meilleurs chunks pour le contexte
         context_parts = []
@@ -319,25 +688,26 @@ class FaissRAGGemini:
         
         context = "\n\n---\n\n".join(context_parts)
         
-        # Si les docs ne sont pas pertinents et que le web search est activé, chercher sur le site
-        additional_context = ""
-        if not has_relevant_docs and enable_web_search:
-            print("\nLes resultats du RAG ne sont pas assez pertinents. Recherche sur le site ESILV...")
-            url = self._search_on_esilv_site(question)
-            if url:
-                print(f"Scraping de {url}...")
-                scraped_content = self._scrape_page(url)
-                if scraped_content:
-                    additional_context = f"\n\n[Contenu scrape depuis {url}]\n{scraped_content}"
-                    print("Contenu supplementaire recupere avec succes.\n")
-        
-        user_prompt = (
+        return (
             f"Contexte (extraits pertinents):{context}{additional_context}\n\n"
             f"Question: {question}\n\n"
             "Reponds de facon claire et concise en te basant sur les extraits fournis. "
             "Si l'information n'est pas dans les extraits, dis-le clairement."
         )
+
+    def answer(self, question: str, k: int = 5, fallback_mode: bool = True, enable_web_search: bool = True, docs=None):
+        """Répond à une question en utilisant le RAG et le scraping en temps réel si nécessaire
+
+        docs: résultats de retrieve() déjà calculés (recherche lancée en parallèle par l'orchestrateur)
+        """
+        if docs is None:
+            docs = self.retrieve(question, k=k)
         
+        direct = self._extractive_answer(question, docs)
+        if direct is not None:
+            return direct, docs
+        
+        user_prompt = self._build_user_prompt(question, docs, enable_web_search)
         ans = self._generate(SYSTEM_PROMPT, user_prompt)
         
         # Mode fallback si Gemini est indisponible
@@ -347,72 +717,117 @@ class FaissRAGGemini:
         
         return ans, docs
     
-    def answer_stream(self, question: str, k: int = 5, fallback_mode: bool = True, enable_web_search: bool = True):
-        """Répond à une question en streaming"""
-        docs = self.retrieve(question, k=k)
-        
-        # Vérifier si les résultats sont pertinents (score > 0.3)
-        has_relevant_docs = any(d['score'] > 0.3 for d in docs)
-        
-        # Les chunks sont déjà de taille raisonnable, pas besoin de tronquer autant
-        # On combine les k meilleurs chunks pour le contexte
-        context_parts = []
-        for i, d in enumerate(docs, 1):
-            source_label = f"[{d['source']}]" if 'source' in d else ""
-            context_parts.append(f"[Extrait {i}] {source_label}\n{d['text']}")
+    def answer_stream(self, question: str, k: int = 5, fallback_mode: bool = True, enable_web_search: bool = True, docs=None):
+        """Répond à une question en streaming
+
+        docs: résultats de retrieve() déjà calculés (recherche lancée en parallèle par l'orchestrateur)
+        """
+        if docs is None:
+            docs = self.retrieve(question, k=k)
         
-        context = "\n\n---\n\n".join(context_parts)
+        direct = self._extractive_answer(question, docs)
+        if direct is not None:
+            yield direct
+            yield ("__DOCS__", docs)
+            return
         
-        # Si les docs ne sont pas pertinents et que le web search est activé, chercher sur le site
-        additional_context = ""
-        if not has_relevant_docs and enable_web_search:
-            print("\nLes resultats du RAG ne sont pas assez pertinents. Recherche sur le site ESILV...")
-            url = self._search_on_esilv_site(question)
-            if url:
-                print(f"Scraping de {url}...")
-                scraped_content = self._scrape_page(url)
-                if scraped_content:
-                    additional_context = f"\n\n[Contenu scrape depuis {url}]\n{scraped_content}"
-                    print("Contenu supplementaire recupere avec succes.\n")
-        
-        user_prompt = (
-            f"Contexte (extraits pertinents):{context}{additional_context}\n\n"
-            f"Question: {question}\n\n"
-            "Reponds de facon claire et concise en te basant sur les extraits fournis. "
-            "Si l'information n'est pas dans les extraits, dis-le clairement."
-        )
+        user_prompt = self._build_user_prompt(question, docs, enable_web_search)
         
-        # Streaming de la réponse
+        # Streaming de la réponse ; la réponse de secours n'est donnée que si rien n'a encore été envoyé
+        streamed = False
         for chunk in self._generate_stream(SYSTEM_PROMPT, user_prompt):
-            if chunk is None and fallback_mode:
-                print("\nGemini est indisponible. Voici un resume basique des documents trouves:")
-                yield self._fallback_answer(docs, question)
+            if chunk is None:
+                if fallback_mode and not streamed:
+                    print("\nGemini est indisponible. Voici un resume basique des documents trouves:")
+                    yield self._fallback_answer(docs, question)
                 break
-            elif chunk is not None:
-                yield chunk
+            streamed = True
+            yield chunk
         
         # Retourner les docs à la fin (via un tuple spécial)
         yield ("__DOCS__", docs)
     
+    async def aanswer(self, question: str, k: int = 5, fallback_mode: bool = True, enable_web_search: bool = True, docs=None):
+        """Version asyncio de answer() : recherche et scraping dans les pools dédiés, LLM asynchrone"""
+        if docs is None:
+            docs = await self.aretrieve(question, k=k)
+        
+        direct = await run_cpu(self._extractive_answer, question, docs)
+        if direct is not None:
+            return direct, docs
+        
+        user_prompt = await self._abuild_user_prompt(question, docs, enable_web_search)
+        ans = await self._agenerate(SYSTEM_PROMPT, user_prompt)
+        
+        if ans is None and fallback_mode:
+            ans = self._fallback_answer(docs, question)
+        
+        return ans, docs
+    
+    async def aanswer_stream(self, question: str, k: int = 5, fallback_mode: bool = True, enable_web_search: bool = True, docs=None):
+        """Version asyncio de answer_stream() (mêmes éléments produits, tuple __DOCS__ en dernier)"""
+        if docs is None:
+            docs = await self.aretrieve(question, k=k)
+        
+        direct = await run_cpu(self._extractive_answer, question, docs)
+        if direct is not None:
+            yield direct
+            yield ("__DOCS__", docs)
+            return
+        
+        user_prompt = await self._abuild_user_prompt(question, docs, enable_web_search)
+        
+        streamed = False
+        async for chunk in self._agenerate_stream(SYSTEM_PROMPT, user_prompt):
+            if chunk is None:
+                if fallback_mode and not streamed:
+                    yield self._fallback_answer(docs, question)
+                break
+            streamed = True
+            yield chunk
+        
+        yield ("__DOCS__", docs)
+    
+    def _extractive_answer(self, question, docs):
+        """Réponse directe sans LLM pour une question factuelle simple, sinon None"""
+        if not EXTRACTIVE_ANSWERS or not docs:
+            return None
+        try:
+            self._ensure_model_loaded()
+            with span("extractive"):
+                result = self.extractive.answer(self.model, question, docs)
+        except Exception as e:
+            print(f"Erreur de la réponse extractive: {e}")
+            return None
+        
+        if result is None:
+            return None
+        logger.debug(f"Réponse extractive ({result['kind']}, confiance {result['confidence']:.2f}), LLM non appelé")
+        return result["answer"]
+    
     def _fallback_answer(self, docs, question):
-        """Réponse de secours sans LLM"""
+        """Réponse de secours sans LLM : phrases des chunks les plus proches de la question"""
         if not docs:
             return "Aucun chunk pertinent trouvé."
         
-        # Les chunks sont déjà de bonne taille
-        snippets = []
-        for i, doc in enumerate(docs[:3], 1):
-            text = doc['text']
-            snippets.append(f"{i}. {text}")
+        try:
+            self._ensure_model_loaded()
+            passages = self.extractive.fallback(self.model, question, docs)
+        except Exception as e:
+            print(f"Erreur du classement des phrases: {e}")
+            passages = None
+        
+        if passages is None:
+            # Chunks entiers si aucune phrase exploitable
+            passages = "\n\n".join(f"{i}. {doc['text']}" for i, doc in enumerate(docs[:3], 1))
         
         return (
-            f"Voici les extraits les plus pertinents trouves pour votre question:\n\n" +
-            "\n\n".join(snippets) +
+            f"Voici les passages les plus pertinents trouves pour votre question:\n\n" +
+            passages +
             "\n\nReponse generee sans IA (Gemini indisponible). "
             "Consultez les sources ci-dessous pour plus de details."
         )
 
-
 if __name__ == "__main__":
     try:
         rag = FaissRAGGemini()
@@ -0,0 +1,110 @@
+"""
+Index de routage des pages du site : un centroïde d'embedding par URL
+
+Construit à l'indexation à partir des chunks de chaque page (moyenne des
+embeddings, renormalisée). Quand les chunks retrouvés sont peu pertinents,
+le RAG choisit la page à scraper par similarité entre la question et ces
+centroïdes au lieu d'une liste de mots-clés.
+
+Usage (reconstruit les routes depuis l'index FAISS existant) :
+    python Back/app/rag/url_routes.py
+"""
+import json
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+URL_ROUTES_FILENAME = "url_routes.npz"
+# Similarité minimale entre la question et le centroïde d'une page pour la choisir
+URL_ROUTE_MIN_SCORE = float(os.getenv("URL_ROUTE_MIN_SCORE", "0.2"))
+
+
+def build_url_routes(urls: List[str], embeddings: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """
+    Centroïde normalisé des chunks de chaque URL
+
+    Args:
+        urls: URL de chaque chunk (même ordre que embeddings)
+        embeddings: Vecteurs normalisés des chunks (n, dimension)
+
+    Returns:
+        Tuple (urls uniques, centroïdes float32 (len(urls uniques), dimension))
+    """
+    positions = {}
+    for url in urls:
+        positions.setdefault(url, len(positions))
+
+    rows = np.fromiter((positions[url] for url in urls), dtype=np.int64, count=len(urls))
+    centroids = np.zeros((len(positions), embeddings.shape[1]), dtype="float32")
+    np.add.at(centroids, rows, embeddings)
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    centroids /= np.clip(norms, 1e-12, None)
+    return list(positions), centroids
+
+
+def save_url_routes(path: str, urls: List[str], embeddings: np.ndarray):
+    """Calcule et enregistre les centroïdes par URL (fichier .npz)"""
+    unique_urls, centroids = build_url_routes(urls, embeddings)
+    np.savez(path, urls=np.array(unique_urls), centroids=centroids)
+    print(f"Routes URL enregistrees : {len(unique_urls)} pages ({path})")
+
+
+class UrlRouter:
+    """Choix de la page la plus proche d'une question"""
+
+    def __init__(self, urls: List[str], centroids: np.ndarray):
+        self.urls = urls
+        self.centroids = np.ascontiguousarray(centroids, dtype="float32")
+
+    def best(self, query_embedding: np.ndarray, min_score: float = URL_ROUTE_MIN_SCORE) -> Optional[Tuple[str, float]]:
+        """(url, score) de la page la plus proche, ou None sous le score minimal"""
+        scores = self.centroids @ np.asarray(query_embedding, dtype="float32").reshape(-1)
+        i = int(np.argmax(scores))
+        if scores[i] < min_score:
+            return None
+        return self.urls[i], float(scores[i])
+
+
+def routes_from_index(index, urls: List[str]) -> Optional[UrlRouter]:
+    """
+    Routes recalculées depuis les vecteurs d'un index FAISS chargé (fichier .npz
+    absent : non publié, ou encore en cours de téléchargement au démarrage)
+
+    Args:
+        index: Index FAISS (flat, fp16 ou sq8 : vecteurs décodés par reconstruct_n)
+        urls: URL de chaque vecteur (mapping de l'index)
+    """
+    try:
+        embeddings = index.reconstruct_n(0, index.ntotal)
+    except Exception as e:
+        print(f"Erreur lors du calcul des routes URL depuis l'index: {e}")
+        return None
+    if index.ntotal == 0 or len(urls) != index.ntotal:
+        return None
+    return UrlRouter(*build_url_routes(urls, embeddings))
+
+
+def load_url_routes(path: str) -> Optional[UrlRouter]:
+    """Charge les routes enregistrées, None si le fichier est absent ou illisible"""
+    if not os.path.exists(path):
+        return None
+    try:
+        data = np.load(path)
+        return UrlRouter([str(url) for url in data["urls"]], data["centroids"])
+    except Exception as e:
+        print(f"Erreur lors du chargement des routes URL: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    from vector_index import load_faiss_index
+
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    index = load_faiss_index(os.path.join(data_dir, "faiss_index.bin"))
+    with open(os.path.join(data_dir, "faiss_mapping.json"), "r", encoding="utf-8") as f:
+        mapping = json.load(f)
+
+    # Vecteurs relus depuis l'index (décodés pour fp16 / sq8)
+    embeddings = index.reconstruct_n(0, index.ntotal)
+    save_url_routes(os.path.join(data_dir, URL_ROUTES_FILENAME), mapping["urls"], embeddings)
@@ -0,0 +1,73 @@
+"""
+Construction et chargement des index FAISS
+
+Formats de stockage des vecteurs (produit scalaire dans tous les cas) :
+- "flat" : float32 (IndexFlatIP), référence exacte
+- "fp16" : demi-précision (IndexScalarQuantizer QT_fp16), 2x moins de mémoire
+- "sq8"  : 8 bits par dimension (IndexScalarQuantizer QT_8bit), 4x moins de mémoire
+
+Le format est choisi à la construction (FAISS_INDEX_TYPE) et enregistré dans le
+fichier d'index : faiss.read_index le reconnaît seul, les loaders n'ont rien à configurer.
+"""
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "fp16", "sq8")
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").lower()
+
+_QUANTIZERS = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def build_faiss_index(embeddings: np.ndarray, index_type: str = None) -> faiss.Index:
+    """
+    Construit un index FAISS en produit scalaire (cosinus sur vecteurs normalisés)
+
+    Args:
+        embeddings: Vecteurs float32 (n, dimension)
+        index_type: "flat", "fp16" ou "sq8" (FAISS_INDEX_TYPE par défaut)
+
+    Returns:
+        Index FAISS rempli
+    """
+    index_type = (index_type or FAISS_INDEX_TYPE).lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Type d'index FAISS inconnu: {index_type} (attendu: {', '.join(INDEX_TYPES)})")
+
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    dim = embeddings.shape[1]
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    else:
+        index = faiss.IndexScalarQuantizer(dim, _QUANTIZERS[index_type], faiss.METRIC_INNER_PRODUCT)
+        # sq8 apprend l'intervalle de chaque dimension sur le corpus ; les vecteurs
+        # ajoutés plus tard sont bornés à cet intervalle
+        if not index.is_trained:
+            index.train(embeddings)
+
+    index.add(embeddings)
+    return index
+
+
+def get_index_type(index: faiss.Index) -> str:
+    """Format de stockage d'un index chargé : "flat", "fp16", "sq8" ou le nom de la classe FAISS"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexFlat):
+        return "flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        for name, qtype in _QUANTIZERS.items():
+            if index.sq.qtype == qtype:
+                return name
+    return type(index).__name__
+
+
+def load_faiss_index(path: str) -> faiss.Index:
+    """Charge un index FAISS quel que soit son format de stockage"""
+    index = faiss.read_index(path)
+    print(f"Index FAISS {get_index_type(index)} chargé : {path} ({index.ntotal} vecteurs)")
+    return index
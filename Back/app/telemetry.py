@@ -0,0 +1,298 @@
+"""
+Traces par requête et métriques du processus (orchestrateur, RAG, LLM)
+
+- start_trace() ouvre une trace avec un identifiant de requête, portée par
+  une ContextVar : les spans mesurés dans le même contexte (y compris les
+  pools de workers.py et les threads lancés avec run_in_context) lui sont rattachés
+- span("embed") mesure une étape ; chaque mesure alimente aussi un histogramme
+  du registre, même hors trace. Les étapes d'un lot de requêtes (MicroBatcher)
+  sont rattachées à la trace de chaque requête du lot (attach_traces)
+- le registre expose p50/p95/p99 en JSON et des histogrammes au format texte
+  Prometheus
+- les détails (candidats du retrieve, résumé de chaque trace) passent par le
+  logger "esilv" au niveau DEBUG (LOG_LEVEL)
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Mesures gardées par histogramme pour les percentiles, et traces récentes gardées en mémoire
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "2048"))
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "200"))
+# Bornes (s) des histogrammes Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PERCENTILES = (50, 95, 99)
+
+logger = logging.getLogger("esilv")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    logger.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger enfant de "esilv" (même niveau et même sortie)"""
+    return logger.getChild(name)
+
+
+class Histogram:
+    """Compteurs cumulés par borne (Prometheus) et fenêtre des dernières mesures (percentiles)"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+
+    def percentile(self, p: float) -> float:
+        samples = sorted(self.samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+class MetricsRegistry:
+    """Histogrammes de durées et compteurs, indexés par (nom, labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Ajoute une durée (s) à l'histogramme name{labels}"""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Incrémente le compteur name{labels}"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Etat du registre en JSON
+
+        Returns:
+            {"histograms": [{name, labels, count, sum_s, p50_ms, p95_ms, p99_ms}], "counters": [...]}
+        """
+        with self._lock:
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": h.count,
+                    "sum_s": h.total,
+                    **{f"p{p}_ms": h.percentile(p) * 1000 for p in PERCENTILES},
+                }
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {"histograms": histograms, "counters": counters}
+
+    def render_prometheus(self, prefix: str = "esilv_") -> str:
+        """Format texte d'exposition Prometheus (histogrammes en secondes)"""
+        def fmt_labels(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            escaped = (f'{k}="{v}"'.replace("\n", " ") for k, v in items)
+            return "{" + ",".join(escaped) + "}"
+
+        lines: List[str] = []
+        with self._lock:
+            seen = set()
+            for (name, labels), h in sorted(self._histograms.items()):
+                metric = f"{prefix}{name}_seconds"
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} histogram")
+                    seen.add(metric)
+                for bound, count in zip(BUCKETS, h.bucket_counts):
+                    lines.append(f"{metric}_bucket{fmt_labels(labels, [('le', f'{bound:g}')])} {count}")
+                lines.append(f"{metric}_bucket{fmt_labels(labels, [('le', '+Inf')])} {h.count}")
+                lines.append(f"{metric}_sum{fmt_labels(labels)} {h.total:.6f}")
+                lines.append(f"{metric}_count{fmt_labels(labels)} {h.count}")
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = f"{prefix}{name}_total"
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} counter")
+                    seen.add(metric)
+                lines.append(f"{metric}{fmt_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class Trace:
+    """Spans et attributs d'une requête"""
+
+    def __init__(self, name: str, request_id: Optional[str] = None):
+        self.name = name
+        self.request_id = request_id or uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.spans: List[Tuple[str, float]] = []
+        self.attributes: Dict[str, Any] = {}
+        self.duration_s: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, seconds: float):
+        with self._lock:
+            self.spans.append((name, seconds))
+
+    def stage_ms(self) -> Dict[str, float]:
+        """Durée cumulée de chaque étape (ms)"""
+        stages: Dict[str, float] = {}
+        with self._lock:
+            for name, seconds in self.spans:
+                stages[name] = stages.get(name, 0.0) + seconds * 1000
+        return stages
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_ms": self.duration_s * 1000 if self.duration_s is not None else None,
+            "stages_ms": self.stage_ms(),
+            **self.attributes,
+        }
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("esilv_trace", default=None)
+# Traces des requêtes d'un lot traité hors de leur contexte (MicroBatcher)
+_attached_traces: contextvars.ContextVar = contextvars.ContextVar("esilv_attached_traces", default=())
+_recent_traces: Deque[Dict[str, Any]] = deque(maxlen=TRACE_HISTORY)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def set_attribute(key: str, value: Any):
+    """Attribut de la trace en cours (agent utilisé, intention...)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes[key] = value
+
+
+def record_span(name: str, seconds: float):
+    """Enregistre une durée mesurée ailleurs (premier token du LLM...)"""
+    registry.observe("stage", seconds, stage=name)
+    trace = _current_trace.get()
+    for target in ((trace,) if trace is not None else _attached_traces.get()):
+        target.add_span(name, seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Mesure le bloc comme étape name de la trace en cours"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+@contextmanager
+def start_trace(name: str = "request", request_id: Optional[str] = None) -> Iterator[Trace]:
+    """
+    Ouvre une trace pour une requête (réutilise la trace en cours si elle existe déjà)
+
+    Args:
+        name: Type de requête (route, route_stream...)
+        request_id: Identifiant fourni par l'appelant (généré sinon)
+    """
+    parent = _current_trace.get()
+    if parent is not None:
+        yield parent
+        return
+
+    trace = Trace(name, request_id)
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.duration_s = time.perf_counter() - start
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # Générateur fermé depuis un autre contexte
+            _current_trace.set(None)
+        registry.observe("request", trace.duration_s, kind=name, agent=trace.attributes.get("agent", "none"))
+        summary = trace.to_dict()
+        _recent_traces.append(summary)
+        if logger.isEnabledFor(logging.DEBUG):
+            stages = " ".join(f"{k}={v:.1f}ms" for k, v in summary["stages_ms"].items())
+            logger.debug(f"request_id={trace.request_id} {name} agent={trace.attributes.get('agent')} "
+                         f"total={summary['total_ms']:.1f}ms {stages}")
+
+
+@contextmanager
+def attach_traces(traces) -> Iterator[None]:
+    """Rattache les spans du bloc à plusieurs traces (lot de requêtes traité dans un thread dédié)"""
+    token = _attached_traces.set(tuple(t for t in traces if t is not None))
+    try:
+        yield
+    finally:
+        _attached_traces.reset(token)
+
+
+def run_in_context(fn: Callable, *args, **kwargs) -> Callable[[], Any]:
+    """Fonction sans argument exécutant fn dans une copie du contexte courant (pour executor.submit)"""
+    context = contextvars.copy_context()
+    return lambda: context.run(fn, *args, **kwargs)
+
+
+def recent_traces(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Dernières traces terminées (plus récente en dernier)"""
+    traces = list(_recent_traces)
+    return traces[-limit:] if limit else traces
+
+
+def metrics_json() -> Dict[str, Any]:
+    return registry.snapshot()
+
+
+def metrics_prometheus() -> str:
+    return registry.render_prometheus()
@@ -0,0 +1,58 @@
+"""
+Pools de threads dédiés au travail bloquant des chemins asyncio
+
+asyncio.to_thread utilise le pool par défaut de la boucle (environ
+min(32, cœurs + 4) threads), partagé par tout : quelques scrapings lents (10 s
+de délai) suffisaient à priver de threads l'embedding et la recherche de toutes
+les autres conversations. Deux pools bornés séparent les deux usages :
+- CPU (embedding, recherche FAISS, classifieur, réponses extractives)
+- I/O (scraping du site, appels bloquants qui attendent le réseau)
+
+Les fonctions sont exécutées dans une copie du contexte courant : leurs spans
+restent rattachés à la trace de la requête (voir telemetry.py).
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from telemetry import run_in_context
+
+# Threads du pool CPU (numpy / torch / FAISS libèrent le GIL) et du pool I/O
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(max(2, os.cpu_count() or 2))))
+IO_WORKERS = int(os.getenv("IO_WORKERS", "16"))
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(kind: str) -> ThreadPoolExecutor:
+    """
+    Pool du processus pour un type de travail, créé à la première utilisation
+
+    Args:
+        kind: "cpu" ou "io"
+    """
+    executor = _executors.get(kind)
+    if executor is not None:
+        return executor
+
+    with _executors_lock:
+        if kind not in _executors:
+            workers = {"cpu": CPU_WORKERS, "io": IO_WORKERS}[kind]
+            _executors[kind] = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"async-{kind}")
+
+    return _executors[kind]
+
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Exécute fn dans le pool CPU sans bloquer la boucle"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor("cpu"), run_in_context(fn, *args, **kwargs))
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Exécute fn dans le pool I/O sans bloquer la boucle"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor("io"), run_in_context(fn, *args, **kwargs))
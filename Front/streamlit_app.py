@@ -6,7 +6,6 @@ import sys
 import os
 from pathlib import Path
 import streamlit as st
-import json
 from datetime import datetime
 
 # Ajouter les chemins nécessaires pour les imports
@@ -27,6 +26,11 @@ sys.path.insert(0, admin_path)
 from orchestrator import OrchestratorAgent
 from rag_agent import RAGAgent
 from contact_agent import ContactAgent
+from rag import RAG_WARMUP, start_warmup, get_warmup_status
+
+# Préchauffer le modèle d'embedding dès le démarrage du processus (idempotent entre les reruns)
+if RAG_WARMUP:
+    start_warmup()
 
 # Import admin modules
 from auth import check_password, logout, is_authenticated
@@ -531,68 +535,18 @@ def initialize_agents():
     return True
 
 
-def extract_form_data_with_llm(user_input, current_fields, contact_agent):
-    """Utilise le LLM pour extraire les données du formulaire"""
-    import re
-    
-    if not contact_agent.llm:
-        return None
-    
-    try:
-        current_state = "\n".join([f"- {k}: {v or 'Non fourni'}" for k, v in current_fields.items()])
-        
-        prompt = f"""Tu es un assistant qui extrait des informations d'un formulaire de contact.
-
-Message de l'utilisateur: "{user_input}"
-
-État actuel du formulaire:
-{current_state}
-
-Extrais les informations suivantes du message et retourne-les au format JSON strict (uniquement le JSON, rien d'autre):
-{{
-  "nom": "nom de famille ou null",
-  "prenom": "prénom ou null",
-  "email": "adresse email ou null",
-  "telephone": "numéro de téléphone ou null",
-  "objet": "objet/sujet de la demande ou null",
-  "message": "message détaillé ou null"
-}}
-
-Règles:
-- Si une information n'est pas fournie, mets null
-- Ne garde que ce qui est NOUVEAU dans le message
-- L'email doit contenir un @
-- Si l'utilisateur donne "Nom Prénom", le premier mot est le prénom, le reste est le nom
-- Si c'est juste un texte sans structure, c'est probablement l'objet ou le message
-
-JSON:"""
-        
-        response = contact_agent.llm.generate_content(prompt)
-        llm_response = response.text.strip()
-        
-        json_match = re.search(r'\{[\s\S]*\}', llm_response)
-        if json_match:
-            form_data = json.loads(json_match.group())
-            return {k: v if v != "null" and v else None for k, v in form_data.items()}
-    except Exception as e:
-        st.warning(f"Erreur extraction: {e}")
-    
-    return None
-
-
 def handle_form_input(user_input):
     """Traite les entrées pour remplir le formulaire"""
     form = st.session_state.pending_form
     contact_agent = st.session_state.contact_agent
     
-    # Extraire les données avec le LLM
-    form_data = extract_form_data_with_llm(user_input, form["fields"], contact_agent)
+    # Extraire les données (règles locales, LLM seulement pour les champs ambigus)
+    form_data = contact_agent.form_extractor.extract(user_input, form["fields"])
     
-    if form_data:
-        # Mettre à jour le formulaire
-        for key, value in form_data.items():
-            if value:
-                form["fields"][key] = value
+    # Mettre à jour le formulaire
+    for key, value in form_data.items():
+        if value:
+            form["fields"][key] = value
     
     # Vérifier les champs manquants
     required_fields = ["nom", "prenom", "email", "objet", "message"]
@@ -798,6 +752,12 @@ def main():
         
         st.markdown('<div class="sidebar-divider"></div>', unsafe_allow_html=True)
         
+        # Etat du modèle d'embedding (le premier échange est plus lent pendant le préchauffage)
+        status_label = "Assistant prêt" if get_warmup_status() == "ready" else "Préchauffage en cours..."
+        st.markdown(f'<div class="status-badge">{status_label}</div>', unsafe_allow_html=True)
+        
+        st.markdown('<div class="sidebar-divider"></div>', unsafe_allow_html=True)
+        
         st.markdown('<div class="sidebar-title">Admin</div>', unsafe_allow_html=True)
         if st.button("Accès à l'interface admin", use_container_width=True):
             st.session_state.admin_mode = True
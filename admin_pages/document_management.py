@@ -335,7 +335,7 @@ def render_document_management():
             stats = get_index_stats()
         
         if stats["index_exists"] and stats["mapping_exists"]:
-            col1, col2, col3, col4 = st.columns(4)
+            col1, col2, col3, col4, col5 = st.columns(5)
             
             with col1:
                 st.metric("Documents", stats.get("document_count", "—"))
@@ -349,6 +349,20 @@ def render_document_management():
             with col4:
                 st.metric("Statut", "Prêt")
             
+            with col5:
+                st.metric("Stockage", stats.get("index_type") or "—")
+            
+            if stats.get("generation"):
+                size_mb = (stats.get("index_bytes", 0) + stats.get("mapping_bytes", 0)) / 1e6
+                sources = ", ".join(
+                    f"{kind} : {counts['documents']} doc. / {counts['chunks']} chunks"
+                    for kind, counts in stats.get("sources", {}).items()
+                )
+                st.caption(
+                    f"Génération {stats['generation']} — construit le {stats.get('built_at', '')[:19].replace('T', ' ')} "
+                    f"— {size_mb:.1f} Mo sur disque" + (f" — {sources}" if sources else "")
+                )
+            
             st.divider()
             
             # Bouton pour recharger l'index RAG manuellement
@@ -1,27 +1,38 @@
 """
 Page Streamlit pour la gestion des leads dans l'onglet Administration
-Affiche les leads collectés, permet la recherche/filtrage et l'export CSV
+Affiche les leads collectés page par page (filtres date / programme / recherche)
+et permet l'export CSV ou NDJSON
 """
 import streamlit as st
 import sys
 import os
+import glob
+import tempfile
+import time
 from datetime import datetime
 import pandas as pd
-import io
 
 # Add Back/app to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "Back", "app"))
 
 from leads_manager import (
-    get_leads,
-    add_lead,
     delete_lead,
-    update_lead,
-    export_leads_to_csv,
-    search_leads,
-    get_leads_count
+    query_leads,
+    get_leads_count,
+    get_programs,
+    get_leads_stats,
+    export_leads_to_file
 )
 
+PAGE_SIZES = [25, 50, 100]
+# Nombre maximal de résultats affichés dans l'onglet Rechercher
+SEARCH_LIMIT = 100
+# st.download_button garde le fichier entier en mémoire : au-delà de cette
+# taille, l'export doit être réduit par les filtres (période, programme)
+EXPORT_DOWNLOAD_MAX_MB = float(os.getenv("LEADS_EXPORT_MAX_MB", "50"))
+# Fichiers d'export abandonnés (sessions fermées) supprimés après ce délai
+EXPORT_MAX_AGE_S = 3600
+
 
 def format_datetime(iso_str: str) -> str:
     """Formate une date ISO en format lisible"""
@@ -32,157 +43,267 @@ def format_datetime(iso_str: str) -> str:
         return iso_str
 
 
+def _render_filters() -> dict:
+    """Filtres de la liste des leads, au format des arguments de query_leads"""
+    col_dates, col_program, col_search = st.columns([2, 1, 2])
+
+    with col_dates:
+        dates = st.date_input("Période", value=(), key="leads_dates", format="YYYY-MM-DD")
+    with col_program:
+        program = st.selectbox("Programme", ["Tous"] + get_programs(), key="leads_program")
+    with col_search:
+        search = st.text_input("Nom ou email", key="leads_search", placeholder="Filtrer par nom ou email")
+
+    filters = {}
+    if dates:
+        filters["date_from"] = dates[0].isoformat()
+        filters["date_to"] = (dates[1] if len(dates) > 1 else dates[0]).isoformat()
+    if program != "Tous":
+        filters["program"] = program
+    if search.strip():
+        filters["search"] = search
+    return filters
+
+
+def _remove_export(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _cleanup_exports(previous=None):
+    """Supprime l'export précédent de la session et ceux laissés par d'anciennes sessions"""
+    if previous:
+        _remove_export(previous)
+    cutoff = time.time() - EXPORT_MAX_AGE_S
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), "leads_export_*")):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                _remove_export(path)
+        except OSError:
+            pass
+
+
+def _render_export(filters: dict):
+    """Export des leads filtrés, écrit morceau par morceau dans un fichier temporaire"""
+    col_format, col_button = st.columns([1, 3])
+    with col_format:
+        fmt = st.selectbox("Format", ["csv", "ndjson"], key="leads_export_format")
+    with col_button:
+        st.write("")
+        prepare = st.button("Préparer l'export", key="leads_export_prepare")
+
+    if prepare:
+        previous = st.session_state.pop("leads_export", None)
+        _cleanup_exports(previous[0] if previous else None)
+        with st.spinner("Export en cours..."):
+            fd, path = tempfile.mkstemp(prefix="leads_export_", suffix=f".{fmt}")
+            os.close(fd)
+            export_leads_to_file(path, fmt=fmt, **filters)
+        st.session_state["leads_export"] = (path, fmt)
+
+    export = st.session_state.get("leads_export")
+    if export and os.path.exists(export[0]):
+        path, fmt = export
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        if size_mb > EXPORT_DOWNLOAD_MAX_MB:
+            # Le fichier serait chargé entièrement en mémoire par Streamlit
+            st.warning(
+                f"Export trop volumineux pour un téléchargement ({size_mb:.0f} Mo, limite "
+                f"{EXPORT_DOWNLOAD_MAX_MB:.0f} Mo) : réduire la période ou filtrer par programme."
+            )
+            _remove_export(path)
+            del st.session_state["leads_export"]
+            return
+        with open(path, "rb") as f:
+            st.download_button(
+                f"Télécharger ({os.path.getsize(path) / 1024:.0f} Ko)",
+                data=f,
+                file_name=f"leads_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}",
+                mime="text/csv" if fmt == "csv" else "application/x-ndjson",
+                key="leads_export_download"
+            )
+
+
+def _leads_dataframe(leads) -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            "ID": lead.get("id", ""),
+            "Nom": lead.get("name", ""),
+            "Email": lead.get("email", ""),
+            "Éducation": lead.get("education", "—") or "—",
+            "Programme": lead.get("program_of_interest", "—") or "—",
+            "Message": (lead.get("message", "")[:50] + "...") if lead.get("message") else "—",
+            "Date": format_datetime(lead.get("created_at", ""))
+        }
+        for lead in leads
+    ])
+
+
 def render_leads_management():
     """Afficher la section de gestion des leads"""
     st.header("Gestion des Contacts")
-    
+
     # Créer des onglets pour différentes sections
     leads_tabs = st.tabs(["Tous les Contacts", "Rechercher"])
-    
+
     # ===== TAB 1: All Leads =====
     with leads_tabs[0]:
         st.subheader("Contacts Collectés")
-        
-        # Get all leads with spinner
-        with st.spinner("Chargement des leads..."):
-            leads = get_leads()
-        
-        if not leads:
+
+        stats = get_leads_stats()
+        if stats["total"] == 0:
             st.info("Aucun lead n'a encore été collecté.")
         else:
-            st.write(f"**Total des formulaires de contacts : {len(leads)}**")
-            st.divider()
-            
-            # Create DataFrame for display
-            df_data = []
-            for lead in leads:
-                created_at = format_datetime(lead.get("created_at", ""))
-                
-                df_data.append({
-                    "ID": lead.get("id", ""),
-                    "Nom": lead.get("name", ""),
-                    "Email": lead.get("email", ""),
-                    "Éducation": lead.get("education", "—") or "—",
-                    "Programme": lead.get("program_of_interest", "—") or "—",
-                    "Message": (lead.get("message", "")[:50] + "...") if lead.get("message") else "—",
-                    "Date": created_at
-                })
-            
-            df = pd.DataFrame(df_data)
-            
-            # Display table
-            st.dataframe(
-                df,
-                width="stretch",
-                hide_index=True,
-                column_config={
-                    "ID": st.column_config.NumberColumn(width="small"),
-                    "Nom": st.column_config.TextColumn(width="medium"),
-                    "Email": st.column_config.TextColumn(width="medium"),
-                    "Éducation": st.column_config.TextColumn(width="medium"),
-                    "Programme": st.column_config.TextColumn(width="medium"),
-                    "Message": st.column_config.TextColumn(width="large"),
-                    "Date": st.column_config.TextColumn(width="medium")
-                }
-            )
-            
+            filters = _render_filters()
+
+            col_size, col_page = st.columns(2)
+            with col_size:
+                page_size = st.selectbox("Contacts par page", PAGE_SIZES, index=1, key="leads_page_size")
+
+            # Seule la page visible est chargée depuis la base
+            total = get_leads_count(**filters)
+            page_count = max(1, (total + page_size - 1) // page_size)
+
+            # Retour à la première page quand les filtres changent, et jamais au-delà
+            # de la dernière (number_input refuse une valeur hors bornes)
+            view = (tuple(sorted(filters.items())), page_size)
+            if st.session_state.get("leads_view") != view:
+                st.session_state["leads_view"] = view
+                st.session_state["leads_page"] = 1
+            st.session_state["leads_page"] = min(max(1, st.session_state.get("leads_page", 1)), page_count)
+
+            with col_page:
+                page = st.number_input(f"Page (sur {page_count})", min_value=1, max_value=page_count, key="leads_page")
+
+            with st.spinner("Chargement des leads..."):
+                leads, total = query_leads(offset=(page - 1) * page_size, limit=page_size, **filters)
+
+            st.write(f"**{total} formulaire(s) de contact correspondant(s)** sur {stats['total']}")
             st.divider()
-            
-            # Actions on leads
-            st.subheader("Gestion des Contacts")
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                selected_lead_id = st.selectbox(
-                    "Sélectionner un lead pour voir/modifier",
-                    [f"ID {lead['id']}: {lead['name']} ({lead['email']})" for lead in leads],
-                    key="select_lead"
+
+            if leads:
+                # Display table
+                st.dataframe(
+                    _leads_dataframe(leads),
+                    width="stretch",
+                    hide_index=True,
+                    column_config={
+                        "ID": st.column_config.NumberColumn(width="small"),
+                        "Nom": st.column_config.TextColumn(width="medium"),
+                        "Email": st.column_config.TextColumn(width="medium"),
+                        "Éducation": st.column_config.TextColumn(width="medium"),
+                        "Programme": st.column_config.TextColumn(width="medium"),
+                        "Message": st.column_config.TextColumn(width="large"),
+                        "Date": st.column_config.TextColumn(width="medium")
+                    }
                 )
-                
-                if selected_lead_id:
-                    # Extract ID from selection
-                    lead_id = int(selected_lead_id.split(":")[0].replace("ID ", ""))
-                    selected_lead = next((l for l in leads if l["id"] == lead_id), None)
-                    
-                    if selected_lead:
-                        st.write("**Détails du Lead :**")
-                        
-                        col_detail1, col_detail2 = st.columns(2)
-                        
-                        with col_detail1:
-                            st.write(f"**Nom :** {selected_lead.get('name', 'N/A')}")
-                            st.write(f"**Email :** {selected_lead.get('email', 'N/A')}")
-                        
-                        with col_detail2:
-                            st.write(f"Éducation :** {selected_lead.get('education', 'N/A')}")
-                            st.write(f"**Programme :** {selected_lead.get('program_of_interest', 'N/A')}")
-                        
-                        if selected_lead.get("message"):
-                            st.write(f"**Message :**")
-                            st.text(selected_lead.get("message", ""))
-                        
-                        st.write(f"**Collecté le :** {format_datetime(selected_lead.get('created_at', ''))}")
-            
-            with col2:
-                st.write("**Actions Rapides :**")
-                
-                col_action1, col_action2 = st.columns(2)
-                
-                with col_action1:
-                    if st.button("Supprimer", type="secondary", key="delete_lead"):
-                        with st.spinner("Suppression en cours..."):
-                            lead_id = int(selected_lead_id.split(":")[0].replace("ID ", ""))
-                            if delete_lead(lead_id):
-                                st.success("Lead supprimé avec succès")
-                                st.rerun()
-                            else:
-                                st.error("Échec de la suppression")
-                
-                with col_action2:
-                    st.metric("Total Leads", len(leads))
-            
+
+                st.divider()
+
+                # Actions on leads
+                st.subheader("Gestion des Contacts")
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    selected_lead_id = st.selectbox(
+                        "Sélectionner un lead pour voir/modifier",
+                        [f"ID {lead['id']}: {lead['name']} ({lead['email']})" for lead in leads],
+                        key="select_lead"
+                    )
+
+                    if selected_lead_id:
+                        # Extract ID from selection
+                        lead_id = int(selected_lead_id.split(":")[0].replace("ID ", ""))
+                        selected_lead = next((l for l in leads if l["id"] == lead_id), None)
+
+                        if selected_lead:
+                            st.write("**Détails du Lead :**")
+
+                            col_detail1, col_detail2 = st.columns(2)
+
+                            with col_detail1:
+                                st.write(f"**Nom :** {selected_lead.get('name', 'N/A')}")
+                                st.write(f"**Email :** {selected_lead.get('email', 'N/A')}")
+
+                            with col_detail2:
+                                st.write(f"Éducation :** {selected_lead.get('education', 'N/A')}")
+                                st.write(f"**Programme :** {selected_lead.get('program_of_interest', 'N/A')}")
+
+                            if selected_lead.get("message"):
+                                st.write(f"**Message :**")
+                                st.text(selected_lead.get("message", ""))
+
+                            st.write(f"**Collecté le :** {format_datetime(selected_lead.get('created_at', ''))}")
+
+                with col2:
+                    st.write("**Actions Rapides :**")
+
+                    col_action1, col_action2 = st.columns(2)
+
+                    with col_action1:
+                        if st.button("Supprimer", type="secondary", key="delete_lead"):
+                            with st.spinner("Suppression en cours..."):
+                                lead_id = int(selected_lead_id.split(":")[0].replace("ID ", ""))
+                                if delete_lead(lead_id):
+                                    st.success("Lead supprimé avec succès")
+                                    st.rerun()
+                                else:
+                                    st.error("Échec de la suppression")
+
+                    with col_action2:
+                        st.metric("Total Leads", stats["total"])
+            else:
+                st.info("Aucun lead ne correspond aux filtres.")
+
+            st.divider()
+
+            # Export
+            st.subheader("Export")
+            _render_export(filters)
+
             st.divider()
-            
+
             # Statistics
             st.subheader("Statistiques")
             col_stat1, col_stat2, col_stat3 = st.columns(3)
-            
+
             with col_stat1:
-                st.metric("Total Leads", len(leads))
-            
+                st.metric("Total Leads", stats["total"])
+
             with col_stat2:
-                unique_emails = len(set(l.get("email", "") for l in leads))
-                st.metric("Emails Uniques", unique_emails)
-            
+                st.metric("Emails Uniques", stats["unique_emails"])
+
             with col_stat3:
-                with_program = sum(1 for l in leads if l.get("program_of_interest"))
-                st.metric("Avec Programme", with_program)
-    
+                st.metric("Avec Programme", stats["with_program"])
+
     # ===== TAB 2: Search Leads =====
     with leads_tabs[1]:
         st.subheader("Rechercher des Contacts")
-        
+
         search_query = st.text_input(
             "Rechercher par nom ou email",
             placeholder="Tapez un nom ou une adresse email",
             help="La recherche cherchera des correspondances partielles"
         )
-        
+
         if search_query:
             with st.spinner("Recherche en cours..."):
-                results = search_leads(search_query)
-            
+                results, total = query_leads(limit=SEARCH_LIMIT, search=search_query)
+
             if not results:
                 st.warning(f"No leads found matching '{search_query}'")
             else:
-                st.success(f"Found {len(results)} lead(s)")
+                shown = f" ({len(results)} affichés)" if total > len(results) else ""
+                st.success(f"Found {total} lead(s){shown}")
                 st.divider()
-                
+
                 # Create DataFrame for display
                 df_data = []
                 for lead in results:
                     created_at = format_datetime(lead.get("created_at", ""))
-                    
+
                     df_data.append({
                         "ID": lead.get("id", ""),
                         "Name": lead.get("name", ""),
@@ -191,9 +312,9 @@ def render_leads_management():
                         "Program": lead.get("program_of_interest", "—") or "—",
                         "Date": created_at
                     })
-                
+
                 df = pd.DataFrame(df_data)
-                
+
                 st.dataframe(
                     df,
                     width="stretch",
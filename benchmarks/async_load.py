@@ -0,0 +1,128 @@
+"""
+Conversations streaming simultanées : chemin asyncio (aroute_stream) vs threads (route_stream)
+
+Le LLM est remplacé par le stub local (llm_client.StubLLMBackend) qui attend --ttft
+secondes puis émet --tokens tokens ; la recherche FAISS et l'embedding sont réels.
+Pour chaque niveau de concurrence, N conversations démarrent ensemble et on
+mesure le temps jusqu'au premier token, la durée totale et le débit.
+
+En mode threads, le nombre de conversations servies en parallèle est borné par
+--threads (comme un serveur à pool de threads) ; en mode async, une seule boucle
+sert toutes les conversations.
+
+Usage:
+    python benchmarks/async_load.py --concurrency 1 8 32 128 --threads 16
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import setup_paths, summarize, format_summary, save_results, load_eval_queries
+
+setup_paths()
+os.environ.setdefault("VERTEX_PROJECT", "benchmark")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from orchestrator import OrchestratorAgent
+from rag_agent import RAGAgent
+from llm_client import LLMClient, StubLLMBackend
+
+
+def build_orchestrator(llm):
+    orchestrator = OrchestratorAgent()
+    rag_agent = RAGAgent()
+    if not rag_agent.rag_system:
+        raise SystemExit("RAG indisponible (index FAISS ?)")
+
+    rag_agent.rag_system.llm = llm
+    orchestrator.llm = llm
+    orchestrator.register_agent(rag_agent)
+    return orchestrator
+
+
+def consume_sync(orchestrator, query):
+    start = time.perf_counter()
+    first = None
+    for chunk in orchestrator.route_stream(query):
+        if first is None and chunk.get("chunk"):
+            first = time.perf_counter()
+    end = time.perf_counter()
+    return ((first or end) - start) * 1000, (end - start) * 1000
+
+
+async def consume_async(orchestrator, query):
+    start = time.perf_counter()
+    first = None
+    async for chunk in orchestrator.aroute_stream(query):
+        if first is None and chunk.get("chunk"):
+            first = time.perf_counter()
+    end = time.perf_counter()
+    return ((first or end) - start) * 1000, (end - start) * 1000
+
+
+def run_threads(orchestrator, queries, threads):
+    peak = [threading.active_count()]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(consume_sync, orchestrator, q) for q in queries]
+        while not all(f.done() for f in futures):
+            peak[0] = max(peak[0], threading.active_count())
+            time.sleep(0.01)
+        return [f.result() for f in futures], peak[0]
+
+
+async def run_async(orchestrator, queries):
+    peak = threading.active_count()
+    tasks = [asyncio.create_task(consume_async(orchestrator, q)) for q in queries]
+    while not all(t.done() for t in tasks):
+        peak = max(peak, threading.active_count())
+        await asyncio.sleep(0.01)
+    return [t.result() for t in tasks], peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--threads", type=int, default=16, help="Taille du pool en mode threads")
+    parser.add_argument("--ttft", type=float, default=0.5)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--token-interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    llm = LLMClient(StubLLMBackend(ttft_s=args.ttft, tokens=args.tokens, token_interval_s=args.token_interval))
+    orchestrator = build_orchestrator(llm)
+    eval_queries = [q["query"] for q in load_eval_queries() if q["expected_type"] == "rag"]
+
+    # Modèle et index chauds avant les mesures
+    consume_sync(orchestrator, eval_queries[0])
+
+    report = {"ttft_s": args.ttft, "tokens": args.tokens, "threads": args.threads, "levels": {}}
+    for n in args.concurrency:
+        queries = [eval_queries[i % len(eval_queries)] for i in range(n)]
+        level = {}
+        for mode in ("threads", "async"):
+            start = time.perf_counter()
+            if mode == "threads":
+                results, peak_threads = run_threads(orchestrator, queries, args.threads)
+            else:
+                results, peak_threads = asyncio.run(run_async(orchestrator, queries))
+            wall_s = time.perf_counter() - start
+
+            level[mode] = {
+                "ttft": summarize([r[0] for r in results]),
+                "total": summarize([r[1] for r in results]),
+                "conversations_per_s": n / wall_s,
+                "peak_threads": peak_threads,
+            }
+            print(f"\n{n} conversations ({mode}) : {n / wall_s:.1f} conv/s, {peak_threads} threads au pic")
+            print("  " + format_summary("Premier token", level[mode]["ttft"]))
+            print("  " + format_summary("Total", level[mode]["total"]))
+        report["levels"][str(n)] = level
+
+    print(f"\nRésultats: {save_results('async_load', report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Utilitaires partagés par les scripts de benchmark
+Chemins du projet, statistiques de latence, mémoire du processus,
+orchestrateur hors ligne et sauvegarde des résultats
+"""
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List, Any
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARKS_DIR)
+BACK_APP_DIR = os.path.join(PROJECT_ROOT, "Back", "app")
+RAG_DIR = os.path.join(BACK_APP_DIR, "rag")
+AGENTS_DIR = os.path.join(BACK_APP_DIR, "agents")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+DATA_DIR = os.path.join(BENCHMARKS_DIR, "data")
+
+
+def setup_paths():
+    """Ajoute les dossiers du projet au sys.path (même ordre que Front/streamlit_app.py)"""
+    for path in (PROJECT_ROOT, BACK_APP_DIR, AGENTS_DIR, RAG_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def load_eval_queries() -> List[Dict[str, str]]:
+    """Questions de test du notebook d'évaluation (query, category, expected_type)"""
+    with open(os.path.join(DATA_DIR, "eval_queries.json"), "r", encoding="utf-8") as f:
+        return json.load(f)["queries"]
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentile par interpolation linéaire (p entre 0 et 100)"""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values_ms: List[float]) -> Dict[str, float]:
+    """Statistiques de latence (valeurs en millisecondes)"""
+    if not values_ms:
+        return {"count": 0}
+
+    return {
+        "count": len(values_ms),
+        "mean_ms": sum(values_ms) / len(values_ms),
+        "min_ms": min(values_ms),
+        "p50_ms": percentile(values_ms, 50),
+        "p95_ms": percentile(values_ms, 95),
+        "p99_ms": percentile(values_ms, 99),
+        "max_ms": max(values_ms),
+    }
+
+
+def format_summary(label: str, summary: Dict[str, float]) -> str:
+    """Ligne lisible pour un résumé produit par summarize()"""
+    if not summary.get("count"):
+        return f"{label}: aucune mesure"
+
+    return (
+        f"{label}: n={summary['count']} | p50 {summary['p50_ms']:.1f} ms | "
+        f"p95 {summary['p95_ms']:.1f} ms | p99 {summary['p99_ms']:.1f} ms | "
+        f"max {summary['max_ms']:.1f} ms"
+    )
+
+
+def rss_mb() -> float:
+    """Mémoire résidente actuelle du processus (Mo), pic si /proc n'est pas disponible"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sur macOS, Ko sur Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def build_offline_orchestrator(llm, contact: bool = True):
+    """
+    Orchestrateur des agents de production branché sur un client LLM local,
+    sur les index livrés, sans accès réseau (le scraping de secours choisit
+    toujours sa page mais ne la télécharge pas)
+
+    Args:
+        llm: Client LLM (LLMClient avec StubLLMBackend en général)
+        contact: Enregistrer aussi l'agent de contact
+
+    Returns:
+        (orchestrateur, instance FaissRAGGemini)
+    """
+    setup_paths()
+    os.environ.setdefault("VERTEX_PROJECT", "benchmark")
+
+    from orchestrator import OrchestratorAgent
+    from rag_agent import RAGAgent
+
+    orchestrator = OrchestratorAgent()
+    orchestrator.llm = llm
+    rag_agent = RAGAgent()
+    if not rag_agent.rag_system:
+        raise SystemExit("RAG indisponible (index FAISS ?)")
+
+    rag = rag_agent.rag_system
+    rag.llm = llm
+    rag.page_cache.fetch = lambda url: None
+    orchestrator.register_agent(rag_agent)
+
+    if contact:
+        from contact_agent import ContactAgent
+        contact_agent = ContactAgent()
+        contact_agent.llm = llm
+        orchestrator.register_agent(contact_agent)
+
+    # Modèle et index chauds avant toute mesure
+    rag.warm_up()
+    return orchestrator, rag
+
+
+def git_commit() -> str:
+    """Commit courant du dépôt (suffixe -dirty si des fichiers suivis sont modifiés)"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True
+        ).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(name: str, payload: Dict[str, Any]) -> str:
+    """
+    Sauvegarde les résultats d'un benchmark en JSON
+
+    Args:
+        name: Nom du benchmark (préfixe du fichier)
+        payload: Résultats sérialisables
+
+    Returns:
+        Chemin du fichier créé
+    """
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(RESULTS_DIR, f"{name}_{timestamp}.json")
+
+    payload = {"benchmark": name, "created_at": datetime.now().isoformat(), "commit": git_commit(), **payload}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+    return path
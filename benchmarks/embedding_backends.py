@@ -0,0 +1,131 @@
+"""
+Parité et débit des backends d'embedding (torch vs onnx int8) sur le corpus scrapé
+
+- Parité : cosinus entre les vecteurs des deux backends pour chaque chunk, écart
+  des scores requête/chunk et recouvrement du top-5. Le script sort en erreur si
+  le cosinus moyen passe sous --min-cosine.
+- Débit : chunks/s en encodage par lots (reconstruction d'index) et latence
+  d'encodage d'une requête seule (chemin de retrieve()).
+
+Usage:
+    python benchmarks/embedding_backends.py --limit 500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from common import setup_paths, summarize, format_summary, save_results, RAG_DIR
+
+setup_paths()
+
+import numpy as np
+from embeddings import get_embedding_backend
+
+QUERIES = [
+    "Quels sont les programmes d'ingénieur proposés par l'ESILV ?",
+    "Quels sont les frais de scolarité à l'ESILV ?",
+    "Où se situe le campus de l'ESILV ?",
+    "Quelles sont les associations étudiantes disponibles ?",
+    "Quels sont les débouchés professionnels après l'ESILV ?",
+    "Comment intégrer l'ESILV après le bac ?",
+]
+
+
+def load_corpus(limit):
+    with open(os.path.join(RAG_DIR, "data", "faiss_mapping.json"), "r", encoding="utf-8") as f:
+        texts = json.load(f)["texts"]
+    return texts[:limit] if limit else texts
+
+
+def bench_backend(name, texts, batch_size, repeats):
+    backend = get_embedding_backend(name)
+    backend.encode(QUERIES)  # préchauffage
+
+    start = time.perf_counter()
+    corpus_embeddings = backend.encode(texts, batch_size=batch_size)
+    bulk_s = time.perf_counter() - start
+
+    query_latencies = []
+    for _ in range(repeats):
+        for query in QUERIES:
+            start = time.perf_counter()
+            backend.encode([query])
+            query_latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "backend": backend.name,
+        "bulk_texts_per_s": len(texts) / bulk_s,
+        "bulk_seconds": bulk_s,
+        "single_query": summarize(query_latencies),
+        "corpus_embeddings": corpus_embeddings,
+        "query_embeddings": backend.encode(QUERIES),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=0, help="Nombre de chunks (0 = tout le corpus)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.limit)
+    print(f"Corpus: {len(texts)} chunks")
+
+    results = {}
+    for name in ("torch", "onnx"):
+        print(f"\nBackend {name}...")
+        results[name] = bench_backend(name, texts, args.batch_size, args.repeats)
+        print(f"  Débit par lots : {results[name]['bulk_texts_per_s']:.1f} chunks/s")
+        print("  " + format_summary("Requête seule", results[name]["single_query"]))
+
+    if results["onnx"]["backend"] != "onnx":
+        print("\nBackend onnx indisponible (onnxruntime non installé ?), parité non mesurée")
+        sys.exit(1)
+
+    torch_corpus = results["torch"]["corpus_embeddings"]
+    onnx_corpus = results["onnx"]["corpus_embeddings"]
+    cosines = (torch_corpus * onnx_corpus).sum(axis=1)
+
+    torch_scores = results["torch"]["query_embeddings"] @ torch_corpus.T
+    onnx_scores = results["onnx"]["query_embeddings"] @ onnx_corpus.T
+    top_k = 5
+    overlaps = []
+    for t_row, o_row in zip(torch_scores, onnx_scores):
+        t_top = set(np.argsort(-t_row)[:top_k])
+        o_top = set(np.argsort(-o_row)[:top_k])
+        overlaps.append(len(t_top & o_top) / top_k)
+
+    parity = {
+        "cosine_mean": float(cosines.mean()),
+        "cosine_min": float(cosines.min()),
+        "score_abs_delta_max": float(np.abs(torch_scores - onnx_scores).max()),
+        "top5_overlap_mean": float(np.mean(overlaps)),
+    }
+
+    print("\nParité torch / onnx int8:")
+    for key, value in parity.items():
+        print(f"  {key}: {value:.4f}")
+
+    report = {
+        "chunks": len(texts),
+        "batch_size": args.batch_size,
+        "parity": parity,
+        "backends": {
+            name: {k: v for k, v in result.items() if not k.endswith("_embeddings")}
+            for name, result in results.items()
+        },
+    }
+    print(f"\nRésultats: {save_results('embedding_backends', report)}")
+
+    if parity["cosine_mean"] < args.min_cosine:
+        print(f"✗ Cosinus moyen {parity['cosine_mean']:.4f} < {args.min_cosine}")
+        sys.exit(1)
+    print("✓ Parité respectée")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Réponses extractives : part des appels LLM évités et latence du chemin sans LLM
+
+Pour chaque question RAG de data/eval_queries.json (répétées --rounds fois),
+retrieve() puis ExtractiveAnswerer : la question est soit traitée directement
+(réponse extraite d'une phrase), soit transmise au LLM. Les réponses directes
+sont affichées pour vérification manuelle.
+
+Usage:
+    python benchmarks/extractive_answers.py --min-confidence 0.55
+"""
+import argparse
+import os
+import time
+
+from common import setup_paths, summarize, format_summary, save_results, load_eval_queries, RAG_DIR
+
+setup_paths()
+os.environ.setdefault("VERTEX_PROJECT", "benchmark")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from extractive import ExtractiveAnswerer, EXTRACTIVE_MIN_CONFIDENCE, detect_question_kind
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-confidence", type=float, default=EXTRACTIVE_MIN_CONFIDENCE)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(RAG_DIR)
+    from rag import FaissRAGGemini
+
+    rag = FaissRAGGemini(warmup=False)
+    rag.warm_up()
+    answerer = ExtractiveAnswerer(min_confidence=args.min_confidence)
+    queries = [q["query"] for q in load_eval_queries() if q["expected_type"] == "rag"]
+
+    latencies, answers = [], {}
+    for round_index in range(args.rounds):
+        for query in queries:
+            docs = rag.retrieve(query, k=args.k)
+            start = time.perf_counter()
+            result = answerer.answer(rag.model, query, docs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if round_index == 0:
+                answers[query] = {
+                    "kind": detect_question_kind(query),
+                    "answer": result["answer"] if result else None,
+                    "confidence": result["confidence"] if result else None,
+                }
+
+    print("\nQuestions traitées sans LLM :")
+    for query, answer in answers.items():
+        if answer["answer"]:
+            print(f"- [{answer['kind']} {answer['confidence']:.2f}] {query}\n    {answer['answer']}")
+
+    report = {
+        "min_confidence": args.min_confidence,
+        "questions": len(queries),
+        "llm_avoided_rate": answerer.llm_avoided_rate,
+        "latency": summarize(latencies),
+        "answers": answers,
+    }
+    print(f"\nAppels LLM évités : {report['llm_avoided_rate']:.1%} ({answerer.stats})")
+    print(format_summary("Chemin extractif", report["latency"]))
+    print(f"\nRésultats: {save_results('extractive_answers', report)}")
+
+
+if __name__ == "__main__":
+    main()
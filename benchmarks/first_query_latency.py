@@ -0,0 +1,93 @@
+"""
+Latence de la première requête après un démarrage à froid, avec et sans préchauffage
+
+Chaque mesure lance un processus neuf qui construit FaissRAGGemini, attend
+--idle secondes (temps avant l'arrivée du premier visiteur) puis chronomètre
+le premier retrieve().
+
+Usage:
+    python benchmarks/first_query_latency.py --runs 10 --idle 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import setup_paths, summarize, format_summary, save_results
+
+QUERY = "Quels sont les frais de scolarité à l'ESILV ?"
+
+
+def run_child(warmup: bool, idle: float):
+    """Mesure exécutée dans le processus neuf"""
+    setup_paths()
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Back", "app", "rag"))
+
+    from rag import FaissRAGGemini
+
+    start = time.perf_counter()
+    rag = FaissRAGGemini(warmup=warmup)
+    init_ms = (time.perf_counter() - start) * 1000
+
+    time.sleep(idle)
+
+    start = time.perf_counter()
+    rag.retrieve(QUERY, k=5)
+    first_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    rag.retrieve(QUERY, k=5)
+    second_ms = (time.perf_counter() - start) * 1000
+
+    print("__RESULT__" + json.dumps({"init_ms": init_ms, "first_ms": first_ms, "second_ms": second_ms}))
+
+
+def measure(warmup: bool, runs: int, idle: float):
+    results = []
+    for i in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child",
+             "--warmup", "1" if warmup else "0", "--idle", str(idle)],
+            capture_output=True, text=True
+        )
+        line = next((l for l in output.stdout.splitlines() if l.startswith("__RESULT__")), None)
+        if line is None:
+            print(f"  Run {i + 1} en échec:\n{output.stderr[-2000:]}")
+            continue
+        results.append(json.loads(line[len("__RESULT__"):]))
+        print(f"  Run {i + 1}/{runs}: première requête {results[-1]['first_ms']:.0f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--idle", type=float, default=5.0)
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--warmup", default="1")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.warmup == "1", args.idle)
+        return
+
+    report = {"runs": args.runs, "idle_s": args.idle, "query": QUERY}
+    for label, warmup in (("lazy", False), ("warmup", True)):
+        print(f"\nMode {label}:")
+        results = measure(warmup, args.runs, args.idle)
+        report[label] = {
+            "first_query": summarize([r["first_ms"] for r in results]),
+            "second_query": summarize([r["second_ms"] for r in results]),
+            "init": summarize([r["init_ms"] for r in results]),
+        }
+
+    print()
+    for label in ("lazy", "warmup"):
+        print(format_summary(f"Première requête ({label})", report[label]["first_query"]))
+    print(f"\nRésultats: {save_results('first_query_latency', report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Remplissage du formulaire de contact : appels LLM évités et latence par tour
+
+Rejoue des conversations de formulaire types (--rounds fois) avec
+FormExtractor branché sur le client LLM (LLM_BACKEND=stub par défaut). Chaque
+tour appelait auparavant le LLM ; on compte les tours traités localement, les
+réponses du cache et les champs extraits qui diffèrent de la valeur attendue
+(hors champs demandés au LLM, que le stub laisse vides).
+
+Usage:
+    python benchmarks/form_extraction.py --rounds 5
+"""
+import argparse
+import os
+import time
+
+from common import setup_paths, summarize, format_summary, save_results
+
+setup_paths()
+os.environ.setdefault("VERTEX_PROJECT", "benchmark")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from form_extractor import FormExtractor, FORM_FIELDS
+from llm_client import get_llm_client
+
+# (message, champs attendus) pour chaque tour
+CONVERSATIONS = [
+    [
+        ("Jean Dupont, jean.dupont@gmail.com, 06 12 34 56 78", {"prenom": "Jean", "nom": "Dupont", "email": "jean.dupont@gmail.com", "telephone": "06 12 34 56 78"}),
+        ("objet: Admission en bachelor\nmessage: Quelles sont les dates du concours Avenir ?", {"objet": "Admission en bachelor", "message": "Quelles sont les dates du concours Avenir ?"}),
+    ],
+    [
+        ("Bonjour, je m'appelle Marie Curie et mon mail est marie.curie@ex.fr", {"prenom": "Marie", "nom": "Curie", "email": "marie.curie@ex.fr"}),
+        ("Stage de 4e année", None),
+        ("Je cherche une entreprise pour mon stage de 4e année en data science", None),
+    ],
+    [
+        ("Prénom: Lucas\nNom: Martin\nEmail: lucas.martin@ex.fr\nTéléphone: +33 6 11 22 33 44", {"prenom": "Lucas", "nom": "Martin", "email": "lucas.martin@ex.fr", "telephone": "+33 6 11 22 33 44"}),
+        ("Sujet : échange international", {"objet": "échange international"}),
+        ("Je voudrais partir un semestre au Canada, quelles universités partenaires ?", {"message": "Je voudrais partir un semestre au Canada, quelles universités partenaires ?"}),
+    ],
+    [
+        ("emma.leroy@ex.fr", {"email": "emma.leroy@ex.fr"}),
+        ("Emma Leroy", {"prenom": "Emma", "nom": "Leroy"}),
+        ("Je souhaite des informations sur la rentrée décalée en janvier", None),
+    ],
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5, help="Répétitions des conversations (les suivantes touchent le cache)")
+    args = parser.parse_args()
+
+    extractor = FormExtractor(get_llm_client())
+    latencies, mismatches, turns = [], [], 0
+
+    for _ in range(args.rounds):
+        for conversation in CONVERSATIONS:
+            fields = {field: None for field in FORM_FIELDS}
+            for message, expected in conversation:
+                start = time.perf_counter()
+                found = extractor.extract(message, fields)
+                latencies.append((time.perf_counter() - start) * 1000)
+                turns += 1
+                for field, value in (expected or {}).items():
+                    if found.get(field) != value:
+                        mismatches.append({"message": message, "field": field, "expected": value, "found": found.get(field)})
+                fields.update({k: v for k, v in found.items() if v})
+
+    stats = dict(extractor.stats)
+    report = {
+        "turns": turns,
+        "previous_llm_calls": turns,
+        "stats": stats,
+        "llm_avoided_rate": extractor.llm_avoided_rate,
+        "latency_ms": summarize(latencies),
+        "mismatches": mismatches[:20],
+    }
+    print(format_summary("extract", report["latency_ms"]))
+    print(f"{turns} tours : {stats['llm_calls']} appels LLM (avant : {turns}), {stats['local_only']} traités localement, "
+          f"{stats['cache_hits']} depuis le cache, {len(mismatches)} champs différents de l'attendu")
+    for mismatch in mismatches[:5]:
+        print(f"  - {mismatch['field']}: attendu {mismatch['expected']!r}, obtenu {mismatch['found']!r}")
+
+    print(f"\nRésultats: {save_results('form_extraction', report)}")
+
+
+if __name__ == "__main__":
+    main()
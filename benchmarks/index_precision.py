@@ -0,0 +1,103 @@
+"""
+Mémoire, latence de recherche et recall@5 des formats de stockage FAISS (flat, fp16, sq8)
+
+Les vecteurs sont relus depuis les index livrés (reconstruct_n) puis réindexés
+dans chaque format ; le recall@5 est mesuré contre l'index float32 exact, avec
+des requêtes tirées du corpus (vecteurs de chunks) pour ne pas dépendre du
+modèle d'embedding.
+
+Usage:
+    python benchmarks/index_precision.py --queries 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import setup_paths, summarize, format_summary, save_results, PROJECT_ROOT, RAG_DIR
+
+setup_paths()
+
+import faiss
+import numpy as np
+from vector_index import build_faiss_index, INDEX_TYPES
+
+SHIPPED_INDEXES = {
+    "rag": os.path.join(RAG_DIR, "data", "faiss_index.bin"),
+    "pdf": os.path.join(PROJECT_ROOT, "data", "faiss_index.bin"),
+}
+
+
+def index_size_bytes(index):
+    """Taille sérialisée de l'index (proche de sa mémoire résidente)"""
+    with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as tmp:
+        path = tmp.name
+    try:
+        faiss.write_index(index, path)
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+def bench_corpus(name, path, n_queries, k, seed):
+    source = faiss.read_index(path)
+    vectors = source.reconstruct_n(0, source.ntotal).astype("float32")
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    # Petit bruit pour que la requête ne soit pas exactement un vecteur de l'index
+    queries = vectors[picks] + rng.normal(0, 0.02, size=(len(picks), vectors.shape[1])).astype("float32")
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    k = min(k, len(vectors))
+    reference = build_faiss_index(vectors, "flat")
+    _, exact_ids = reference.search(queries, k)
+
+    print(f"\nIndex {name}: {len(vectors)} vecteurs, dimension {vectors.shape[1]}")
+    results = {}
+    for index_type in INDEX_TYPES:
+        index = build_faiss_index(vectors, index_type)
+
+        latencies = []
+        found_ids = []
+        for query in queries:
+            start = time.perf_counter()
+            _, ids = index.search(query[None, :], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found_ids.append(ids[0])
+
+        recall = np.mean([
+            len(set(found) & set(exact)) / k
+            for found, exact in zip(found_ids, exact_ids)
+        ])
+
+        results[index_type] = {
+            "bytes": index_size_bytes(index),
+            "search": summarize(latencies),
+            f"recall@{k}": float(recall),
+        }
+        print(f"  {index_type:5s} | {results[index_type]['bytes'] / 1024:8.1f} KB | recall@{k} {recall:.3f}")
+        print("        " + format_summary("recherche", results[index_type]["search"]))
+
+    return {"vectors": len(vectors), "dimension": int(vectors.shape[1]), "formats": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = {"queries": args.queries, "k": args.k, "indexes": {}}
+    for name, path in SHIPPED_INDEXES.items():
+        if not os.path.exists(path):
+            print(f"Index {name} absent: {path}")
+            continue
+        report["indexes"][name] = bench_corpus(name, path, args.queries, args.k, args.seed)
+
+    print(f"\nRésultats: {save_results('index_precision', report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Statistiques de l'index pour l'interface admin : manifeste vs chargement complet
+
+Construit un index FAISS et un mapping synthétiques de --chunks chunks dans un
+dossier temporaire, puis compare le temps de get_index_stats avec le
+manifeste faiss_stats.json et l'ancien calcul (lecture du mapping JSON et de
+l'index à chaque appel).
+
+Usage:
+    python benchmarks/index_stats.py --chunks 50000 --repeat 20
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import setup_paths, summarize, format_summary, save_results
+
+setup_paths()
+
+import faiss
+import admin_indexer
+from index_manifest import write_index_stats, index_stats_path
+
+
+def full_load_stats(index_path, mapping_path):
+    """Ancien get_index_stats : mapping et index relus entièrement"""
+    with open(mapping_path, "r", encoding="utf-8") as f:
+        mapping = json.load(f)
+    index = faiss.read_index(index_path)
+    return {
+        "chunk_count": len(mapping.get("texts", [])),
+        "document_count": len(set(mapping.get("doc_indices", []))),
+        "embedding_dim": index.d,
+    }
+
+
+def timed(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="index_stats_")
+    index_path = os.path.join(tmp, "faiss_index.bin")
+    mapping_path = os.path.join(tmp, "faiss_mapping.json")
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((args.chunks, args.dim)).astype("float32")
+    faiss.normalize_L2(embeddings)
+    index = faiss.IndexFlatIP(args.dim)
+    index.add(embeddings)
+    faiss.write_index(index, index_path)
+
+    urls = [f"https://www.esilv.fr/page-{i // 10}" for i in range(args.chunks)]
+    doc_indices = [i // 10 for i in range(args.chunks)]
+    with open(mapping_path, "w", encoding="utf-8") as f:
+        json.dump({"urls": urls, "texts": ["texte du chunk " * 60] * args.chunks, "doc_indices": doc_indices}, f, indent=2)
+    write_index_stats(index, urls, doc_indices, index_path, mapping_path)
+
+    admin_indexer.INDEX_PATH = index_path
+    admin_indexer.MAPPING_PATH = mapping_path
+
+    report = {
+        "chunks": args.chunks,
+        "mapping_mb": os.path.getsize(mapping_path) / 1e6,
+        "full_load_ms": timed(lambda: full_load_stats(index_path, mapping_path), args.repeat),
+        "manifest_ms": timed(admin_indexer.get_index_stats, args.repeat),
+    }
+    print(f"Index : {args.chunks} chunks, mapping {report['mapping_mb']:.0f} Mo, "
+          f"manifeste {os.path.getsize(index_stats_path(index_path))} octets")
+    print(format_summary("full_load", report["full_load_ms"]))
+    print(format_summary("manifest", report["manifest_ms"]))
+
+    print(f"\nRésultats: {save_results('index_stats', report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Précision et latence de l'analyse d'intention de l'orchestrateur
+
+Compare, sur les questions du notebook d'évaluation :
+- "llm"        : mots-clés puis LLM (comportement historique)
+- "classifier" : mots-clés puis classifieur local, LLM seulement sous le seuil
+
+Le LLM est remplacé par le stub local (llm_client.StubLLMBackend) à latence fixe
+(--llm-latency), qui compte ses appels et répond "information" ; la mesure isole ainsi le coût du routage.
+
+Usage:
+    python benchmarks/intent_routing.py --llm-latency 0.4
+"""
+import argparse
+import os
+import time
+
+from common import setup_paths, summarize, format_summary, save_results, load_eval_queries
+
+setup_paths()
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from orchestrator import OrchestratorAgent
+from llm_client import LLMClient, StubLLMBackend
+
+EXPECTED_INTENT = {"rag": "information", "contact": "contact"}
+
+
+class NoClassifier:
+    """Classifieur désactivé : confiance nulle, le LLM décide"""
+
+    def classify(self, query):
+        return "other", 0.0
+
+
+def run_mode(name, orchestrator, queries):
+    llm = orchestrator.llm.backend
+    llm.calls = 0
+    latencies, rows = [], []
+
+    for item in queries:
+        start = time.perf_counter()
+        intent = orchestrator._analyze_intent(item["query"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        expected = EXPECTED_INTENT[item["expected_type"]]
+        rows.append({"query": item["query"], "expected": expected, "intent": intent, "correct": intent == expected})
+
+    accuracy = sum(r["correct"] for r in rows) / len(rows)
+    print(f"\nMode {name}: précision {accuracy:.0%} | appels LLM {llm.calls}/{len(rows)}")
+    print("  " + format_summary("Latence intention", summarize(latencies)))
+    for r in rows:
+        if not r["correct"]:
+            print(f"  ✗ {r['query']} -> {r['intent']} (attendu {r['expected']})")
+
+    return {"accuracy": accuracy, "llm_calls": llm.calls, "latency": summarize(latencies), "queries": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Latence simulée d'un appel LLM (s)")
+    args = parser.parse_args()
+
+    queries = load_eval_queries()
+    orchestrator = OrchestratorAgent()
+    orchestrator.llm = LLMClient(StubLLMBackend(ttft_s=args.llm_latency, tokens=1))
+
+    # Centroïdes calculés hors mesure (fait une fois au démarrage en production)
+    classifier = orchestrator.intent_classifier
+    classifier.ensure_fitted()
+
+    report = {"llm_latency_s": args.llm_latency, "modes": {}}
+
+    orchestrator.intent_classifier = NoClassifier()
+    report["modes"]["llm"] = run_mode("llm", orchestrator, queries)
+
+    orchestrator.intent_classifier = classifier
+    report["modes"]["classifier"] = run_mode("classifier", orchestrator, queries)
+
+    print(f"\nRésultats: {save_results('intent_routing', report)}")
+
+
+if __name__ == "__main__":
+    main()
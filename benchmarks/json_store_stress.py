@@ -0,0 +1,106 @@
+"""
+Ecrivains concurrents sur un même fichier JSON : ancienne écriture directe vs JsonStore
+
+--processes processus lancent chacun --threads threads qui ajoutent --updates
+entrées au même fichier de métadonnées. Le mode "naive" reproduit l'ancien
+code (lecture du fichier, modification, réécriture avec indent=2, sans verrou) ;
+le mode "store" passe par json_store.JsonStore. On compte les mises à jour
+perdues, le débit et le nombre d'écritures disque.
+
+Usage:
+    python benchmarks/json_store_stress.py --processes 4 --threads 8 --updates 50
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from multiprocessing import Process, Queue
+
+from common import setup_paths, save_results
+
+setup_paths()
+
+from json_store import get_json_store, read_json
+
+
+def naive_update(path, key, value):
+    data = read_json(path, {})
+    if not isinstance(data, dict):
+        data = {}
+    data[key] = value
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def worker(mode, path, process_index, threads, updates, results):
+    store = get_json_store(path) if mode == "store" else None
+    errors = []
+
+    def run(thread_index):
+        for i in range(updates):
+            key = f"doc_{process_index}_{thread_index}_{i}"
+            value = {"id": key, "filename": f"{key}.pdf", "indexed_at": datetime.now().isoformat(), "indexed": False}
+            try:
+                if store is not None:
+                    store.update(lambda data: data.__setitem__(key, value))
+                else:
+                    naive_update(path, key, value)
+            except Exception as e:
+                errors.append(str(e))
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put({"errors": len(errors), "writes": store.writes if store is not None else threads * updates})
+
+
+def run_mode(mode, processes, threads, updates):
+    path = os.path.join(tempfile.mkdtemp(prefix="json_store_"), "documents_metadata.json")
+    results = Queue()
+    start = time.perf_counter()
+    procs = [Process(target=worker, args=(mode, path, p, threads, updates, results)) for p in range(processes)]
+    for p in procs:
+        p.start()
+    reports = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    expected = processes * threads * updates
+    stored = len(read_json(path, {}) or {})
+    return {
+        "expected": expected,
+        "stored": stored,
+        "lost_updates": expected - stored,
+        "errors": sum(r["errors"] for r in reports),
+        "disk_writes": sum(r["writes"] for r in reports),
+        "updates_per_s": expected / elapsed,
+        "file_bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--updates", type=int, default=50, help="Mises à jour par thread")
+    args = parser.parse_args()
+
+    report = {"processes": args.processes, "threads": args.threads, "updates": args.updates, "modes": {}}
+    for mode in ("naive", "store"):
+        result = run_mode(mode, args.processes, args.threads, args.updates)
+        report["modes"][mode] = result
+        print(f"{mode}: {result['stored']}/{result['expected']} entrées ({result['lost_updates']} perdues, "
+              f"{result['errors']} erreurs), {result['updates_per_s']:.0f} màj/s, "
+              f"{result['disk_writes']} écritures, fichier {result['file_bytes'] / 1024:.0f} Ko")
+
+    print(f"\nRésultats: {save_results('json_store_stress', report)}")
+
+
+if __name__ == "__main__":
+    main()
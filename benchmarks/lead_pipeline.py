@@ -0,0 +1,197 @@
+"""
+Soumission des formulaires de contact : enregistrement synchrone vs file LeadQueue
+
+--sessions threads soumettent chacun --forms formulaires. Le mode "sync"
+reproduit l'ancien ContactAgent (add_lead pendant la requête) ; le mode
+"queue" passe par lead_queue.LeadQueue avec un SmtpNotifier pointant vers un
+serveur SMTP local minimal lancé par le script. On mesure la latence vue par
+l'utilisateur, puis on vérifie que tous les leads sont en base et que tous les
+emails ont été reçus. Enfin, les --failures premiers lots échouent pour
+vérifier la reprise depuis le fichier de secours.
+
+Usage:
+    python benchmarks/lead_pipeline.py --sessions 8 --forms 50 --failures 3
+"""
+import argparse
+import os
+import socketserver
+import tempfile
+import threading
+import time
+
+from common import setup_paths, summarize, format_summary, save_results
+
+setup_paths()
+
+import leads_manager
+from lead_queue import LeadQueue, SmtpNotifier
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    """Sous-ensemble de SMTP suffisant pour smtplib (EHLO, MAIL, RCPT, DATA, QUIT)"""
+
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self.reply("220 localhost SMTP stand-in")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith("EHLO") or command.startswith("HELO"):
+                self.reply("250 localhost")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data)
+                self.server.messages.append(b"".join(lines))
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class LocalSmtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SmtpHandler)
+        self.messages = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+def form(session, i):
+    return {
+        "service": "admissions",
+        "service_email": "admissions@esilv.fr",
+        "nom": f"Session{session}",
+        "prenom": f"Form{i}",
+        "email": f"s{session}.f{i}@example.com",
+        "telephone": "",
+        "objet": "Admissions",
+        "message": "Bonjour, je souhaite des informations sur les admissions.",
+    }
+
+
+def use_database(tmp, name):
+    leads_manager.LEADS_DIR = tmp
+    leads_manager.LEADS_FILE = os.path.join(tmp, f"{name}.json")
+    leads_manager.LEADS_DB = os.path.join(tmp, f"{name}.db")
+
+
+def submit_all(sessions, forms, submit):
+    latencies = []
+    lock = threading.Lock()
+
+    def run(session):
+        local = []
+        for i in range(forms):
+            start = time.perf_counter()
+            submit(form(session, i))
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=run, args=(s,)) for s in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+
+def sync_submit(form_data):
+    leads_manager.add_lead(
+        name=f"{form_data['prenom']} {form_data['nom']}",
+        email=form_data["email"],
+        program_of_interest=form_data["objet"],
+        message=form_data["message"]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--forms", type=int, default=50, help="Formulaires par session")
+    parser.add_argument("--failures", type=int, default=3, help="Lots en échec simulés (0 pour ignorer)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="lead_pipeline_")
+    expected = args.sessions * args.forms
+    report = {"sessions": args.sessions, "forms": args.forms}
+
+    use_database(tmp, "sync")
+    latencies, elapsed = submit_all(args.sessions, args.forms, sync_submit)
+    report["sync"] = {"submit_ms": summarize(latencies), "stored": leads_manager.get_leads_count(), "elapsed_s": elapsed}
+    print(format_summary("sync", report["sync"]["submit_ms"]))
+
+    smtp = LocalSmtpServer()
+    use_database(tmp, "queue")
+    lead_queue = LeadQueue(
+        notifier=SmtpNotifier(host="127.0.0.1", port=smtp.port),
+        spool_path=os.path.join(tmp, "queue_pending.ndjson")
+    )
+    latencies, elapsed = submit_all(args.sessions, args.forms, lead_queue.submit)
+    lead_queue.flush()
+    report["queue"] = {
+        "submit_ms": summarize(latencies),
+        "stored": leads_manager.get_leads_count(),
+        "emails": len(smtp.messages),
+        "elapsed_s": elapsed,
+        "stats": dict(lead_queue.stats),
+    }
+    print(format_summary("queue", report["queue"]["submit_ms"]))
+    print(f"  {report['queue']['stored']}/{expected} leads en base, {report['queue']['emails']} emails reçus")
+
+    if args.failures:
+        # Les premiers lots échouent : ils doivent être écrits dans le fichier de secours puis rejoués
+        use_database(tmp, "recovery")
+        remaining = {"failures": args.failures}
+
+        def flaky_writer(leads):
+            if remaining["failures"] > 0:
+                remaining["failures"] -= 1
+                raise IOError("base indisponible (simulé)")
+            return leads_manager.add_leads(leads)
+
+        recovery = LeadQueue(
+            writer=flaky_writer,
+            spool_path=os.path.join(tmp, "recovery_pending.ndjson"),
+            retry_interval=0.2
+        )
+        for i in range(args.failures):
+            recovery.submit(form(0, i))
+            recovery.flush()
+        time.sleep(0.5)
+        recovery.flush()
+        report["recovery"] = {
+            "submitted": args.failures,
+            "stored": leads_manager.get_leads_count(),
+            "spool_left": os.path.exists(recovery.spool_path),
+            "stats": dict(recovery.stats),
+        }
+        print(f"Reprise : {report['recovery']['stored']}/{args.failures} leads enregistrés après "
+              f"{args.failures} échecs, fichier de secours restant : {report['recovery']['spool_left']}")
+
+    smtp.shutdown()
+    print(f"\nRésultats: {save_results('lead_pipeline', report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Latence des opérations sur les leads : base SQLite (leads_manager) vs ancien fichier JSON
+
+La base est remplie avec --leads leads synthétiques puis chaque opération
+(add_lead, get_lead_by_email, search_leads, update_lead, delete_lead,
+get_leads_count) est répétée --ops fois. Le stockage JSON d'origine (lecture
+du fichier entier à chaque opération, réécriture à chaque modification) est
+mesuré sur le même volume avec --json-ops répétitions. Enfin --writers threads
+ajoutent des leads en parallèle pour vérifier l'unicité des IDs.
+
+Usage:
+    python benchmarks/leads_store.py --leads 100000 --ops 200 --json-ops 5
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from common import setup_paths, summarize, format_summary, save_results
+
+setup_paths()
+
+import leads_manager
+
+PROGRAMS = ["Data & IA", "Cybersécurité", "Fintech", "Informatique", "Énergie", None]
+FIRST_NAMES = ["Jean", "Marie", "Lucas", "Emma", "Hugo", "Léa", "Louis", "Chloé", "Nathan", "Inès"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy", "Moreau"]
+
+
+def synthetic_leads(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for i in range(n):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield {
+            "id": i + 1,
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}{i}@example.com",
+            "education": None,
+            "program_of_interest": rng.choice(PROGRAMS),
+            "message": "Bonjour, je souhaite des informations sur la formation.",
+            "created_at": (start + timedelta(minutes=i)).isoformat(),
+        }
+
+
+class JsonLeadStore:
+    """Stockage d'origine : tout le fichier est relu à chaque opération et réécrit à chaque modification"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, leads):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(leads, f, ensure_ascii=False, indent=2)
+
+    def add_lead(self, name, email, program_of_interest=None):
+        leads = self.load()
+        leads.append({"id": len(leads) + 1, "name": name, "email": email,
+                      "program_of_interest": program_of_interest, "created_at": datetime.now().isoformat()})
+        self.save(leads)
+
+    def get_lead_by_email(self, email):
+        return next((l for l in self.load() if l["email"].lower() == email.lower()), None)
+
+    def search_leads(self, query):
+        query = query.lower()
+        return [l for l in self.load() if query in l["name"].lower() or query in l["email"].lower()]
+
+    def update_lead(self, lead_id, **kwargs):
+        leads = self.load()
+        for lead in leads:
+            if lead["id"] == lead_id:
+                lead.update(kwargs)
+        self.save(leads)
+
+    def delete_lead(self, lead_id):
+        leads = self.load()
+        self.save([l for l in leads if l["id"] != lead_id])
+
+    def get_leads_count(self):
+        return len(self.load())
+
+
+def time_ops(label, fn, args_list):
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    summary = summarize(latencies)
+    print("  " + format_summary(label, summary))
+    return summary
+
+
+def operations(store, n, total, rng):
+    ids = [rng.randint(1, total) for _ in range(n)]
+    emails = [f"jean.martin{rng.randint(0, total - 1)}@example.com" for _ in range(n)]
+    return {
+        "add_lead": (store.add_lead, [("Nouveau Lead", f"new{i}@example.com") for i in range(n)]),
+        "get_lead_by_email": (store.get_lead_by_email, [(e,) for e in emails]),
+        "search_leads": (store.search_leads, [(rng.choice(LAST_NAMES).lower(),) for _ in range(n)]),
+        "update_lead": (lambda i: store.update_lead(i, message="Relancé"), [(i,) for i in ids]),
+        "delete_lead": (store.delete_lead, [(i,) for i in ids]),
+        "get_leads_count": (store.get_leads_count, [() for _ in range(n)]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=100000)
+    parser.add_argument("--ops", type=int, default=200, help="Répétitions par opération (SQLite)")
+    parser.add_argument("--json-ops", type=int, default=5, help="Répétitions par opération (JSON, 0 pour ignorer)")
+    parser.add_argument("--writers", type=int, default=8)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="leads_bench_")
+    leads_manager.LEADS_DIR = tmp
+    leads_manager.LEADS_FILE = os.path.join(tmp, "leads.json")
+    leads_manager.LEADS_DB = os.path.join(tmp, "leads.db")
+    rng = random.Random(1)
+
+    start = time.perf_counter()
+    leads_manager.save_leads(list(synthetic_leads(args.leads)))
+    print(f"SQLite : {args.leads} leads insérés en {time.perf_counter() - start:.1f}s")
+
+    report = {"leads": args.leads, "sqlite": {}, "json": {}}
+    print("\nSQLite")
+    for name, (fn, calls) in operations(leads_manager, args.ops, args.leads, rng).items():
+        report["sqlite"][name] = time_ops(name, fn, calls)
+
+    if args.json_ops:
+        store = JsonLeadStore(os.path.join(tmp, "legacy_leads.json"))
+        store.save(list(synthetic_leads(args.leads)))
+        print(f"\nJSON ({os.path.getsize(store.path) / 1e6:.1f} Mo)")
+        for name, (fn, calls) in operations(store, args.json_ops, args.leads, rng).items():
+            report["json"][name] = time_ops(name, fn, calls)
+
+    # Ajouts concurrents : chaque lead doit recevoir un ID distinct
+    created = []
+    lock = threading.Lock()
+
+    def writer(w):
+        ids = [leads_manager.add_lead(f"Writer {w}", f"writer{w}.{i}@example.com")["id"] for i in range(100)]
+        with lock:
+            created.extend(ids)
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(args.writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    report["concurrent_writes"] = {
+        "writers": args.writers,
+        "leads": len(created),
+        "unique_ids": len(set(created)),
+        "leads_per_s": len(created) / elapsed,
+    }
+    print(f"\n{args.writers} écrivains : {len(created)} leads, {len(set(created))} IDs distincts, "
+          f"{len(created) / elapsed:.0f} leads/s")
+
+    print(f"\nRésultats: {save_results('leads_store', report)}")
+
+
+if __name__ == "__main__":
+    main()
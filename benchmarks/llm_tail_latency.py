@@ -0,0 +1,100 @@
+"""
+Latence de queue des appels LLM : sans délai, avec délais maximaux, avec requêtes couvertes
+
+Le LLM est le stub local (llm_client.StubLLMBackend) : --ttft secondes avant le
+premier token, sauf pour une proportion --slow-rate d'appels qui attendent
+--slow-ttft secondes (latence de queue injectée). Chaque requête est un
+streaming consommé entièrement, --concurrency requêtes à la fois.
+
+Modes :
+- baseline : aucun délai effectif, on attend toujours la réponse
+- deadline : LLM_FIRST_TOKEN_TIMEOUT = --first-token-timeout ; au-delà, réponse de secours
+- hedged   : même délai, plus une seconde requête après le p95 observé
+
+Usage:
+    python benchmarks/llm_tail_latency.py --requests 400 --slow-rate 0.05 --slow-ttft 5
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import setup_paths, summarize, format_summary, save_results
+
+setup_paths()
+os.environ.setdefault("VERTEX_PROJECT", "benchmark")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from llm_client import LLMClient, LLMTimeout, StubLLMBackend
+
+
+def one_request(llm):
+    start = time.perf_counter()
+    first = None
+    fallback = False
+    try:
+        for _ in llm.stream("Quels sont les frais de scolarité ?"):
+            if first is None:
+                first = time.perf_counter()
+    except LLMTimeout:
+        # Le RAG répondrait ici avec les extraits des documents (instantané)
+        fallback = True
+    end = time.perf_counter()
+    return ((first or end) - start) * 1000, (end - start) * 1000, fallback
+
+
+def run_mode(llm, requests, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: one_request(llm), range(requests)))
+    return {
+        "ttft": summarize([r[0] for r in results]),
+        "total": summarize([r[1] for r in results]),
+        "fallback_rate": sum(r[2] for r in results) / len(results),
+        "hedges_fired": llm.hedges_fired,
+        "llm_calls": llm.backend.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--token-interval", type=float, default=0.01)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ttft", type=float, default=5.0)
+    parser.add_argument("--first-token-timeout", type=float, default=2.0)
+    parser.add_argument("--hedge-delay", type=float, default=0.6, help="Délai de couverture avant 20 mesures")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    modes = {
+        "baseline": dict(timeout=3600, first_token_timeout=3600, hedge=False),
+        "deadline": dict(first_token_timeout=args.first_token_timeout, hedge=False),
+        "hedged": dict(first_token_timeout=args.first_token_timeout, hedge=True, hedge_delay=args.hedge_delay),
+    }
+
+    report = {"args": vars(args), "modes": {}}
+    for mode, options in modes.items():
+        backend = StubLLMBackend(
+            ttft_s=args.ttft,
+            tokens=args.tokens,
+            token_interval_s=args.token_interval,
+            slow_rate=args.slow_rate,
+            slow_ttft_s=args.slow_ttft,
+            seed=args.seed
+        )
+        result = run_mode(LLMClient(backend, **options), args.requests, args.concurrency)
+        report["modes"][mode] = result
+
+        print(f"\n{mode}: {result['fallback_rate']:.1%} réponses de secours, "
+              f"{result['hedges_fired']} requêtes couvertes, {result['llm_calls']} appels LLM")
+        print("  " + format_summary("Premier token", result["ttft"]))
+        print("  " + format_summary("Total", result["total"]))
+
+    print(f"\nRésultats: {save_results('llm_tail_latency', report)}")
+
+
+if __name__ == "__main__":
+    main()
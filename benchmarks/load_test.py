@@ -0,0 +1,273 @@
+"""
+Test de charge : sessions de chat simultanées et rapport de capacité d'une instance
+
+Chaque utilisateur simulé est un thread (comme une session Streamlit) qui
+enchaîne --turns questions d'évaluation à travers OrchestratorAgent.route_stream,
+avec un temps de réflexion aléatoire (--think s en moyenne) entre deux
+messages, et garde l'historique de sa conversation en mémoire. Le LLM est le
+stub local (--ttft, --token-rate tokens/s, --tokens) ; l'embedding et la
+recherche FAISS sont réels, sur les index livrés, sans accès réseau.
+
+--sessions choisit ce que possède chaque utilisateur :
+- per-user (défaut) : comme initialize_agents dans Front/streamlit_app.py, un
+  orchestrateur, un agent RAG (avec ses index) et un agent de contact par
+  session, créés à l'ouverture de la session (hors mesure de latence) et
+  gardés jusqu'à la fin du palier
+- shared : un seul orchestrateur pour toutes les sessions (borne basse de la
+  mémoire, seul l'historique est propre à chaque session)
+- both : les deux, rapportés séparément
+
+Pour chaque palier de --users, mesure :
+- temps jusqu'au premier token et durée totale de chaque réponse
+- débit (réponses/s)
+- CPU du processus en cœurs utilisés (moyenne et pic sur 1 s) et saturation
+  par rapport à --vcpu
+- mémoire résidente au pic et croissance par session
+
+Le rapport de capacité retient le plus grand palier qui respecte le SLO
+(--slo-ttft-p95) sans saturer le CPU, et extrapole le nombre de sessions que
+tient la mémoire de l'instance (--memory-mb). --vcpu et --memory-mb reprennent
+par défaut le dimensionnement Cloud Run de cloudbuild.yaml (2 vCPU, 2 Gio).
+
+Usage:
+    python benchmarks/load_test.py --users 1 4 16 32 64 --turns 3 --think 2
+    python benchmarks/load_test.py --sessions both
+"""
+import argparse
+import gc
+import os
+import random
+import threading
+import time
+
+from common import (
+    setup_paths, summarize, format_summary, save_results, load_eval_queries,
+    rss_mb, build_offline_orchestrator,
+)
+
+setup_paths()
+os.environ.setdefault("VERTEX_PROJECT", "benchmark")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from llm_client import LLMClient, StubLLMBackend
+
+# Part d'un vCPU au-delà de laquelle l'instance est considérée saturée
+CPU_SATURATION = 0.85
+
+
+class ResourceMonitor:
+    """Echantillonne la mémoire résidente et le temps CPU du processus dans un thread"""
+
+    def __init__(self, interval_s: float = 0.25):
+        self.interval_s = interval_s
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.samples = [(time.perf_counter(), time.process_time(), rss_mb())]
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="load-test-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append((time.perf_counter(), time.process_time(), rss_mb()))
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.samples.append((time.perf_counter(), time.process_time(), rss_mb()))
+
+    def summary(self):
+        """Cœurs utilisés (moyenne, pic sur ~1 s) et mémoire résidente (début, pic, fin)"""
+        (w0, c0, r0), (w1, c1, r1) = self.samples[0], self.samples[-1]
+        window = max(1, int(round(1.0 / self.interval_s)))
+        peaks = [
+            (self.samples[i][1] - self.samples[i - window][1]) / (self.samples[i][0] - self.samples[i - window][0])
+            for i in range(window, len(self.samples))
+        ]
+        return {
+            "cores_mean": (c1 - c0) / (w1 - w0) if w1 > w0 else 0.0,
+            "cores_peak": max(peaks) if peaks else (c1 - c0) / max(w1 - w0, 1e-9),
+            "rss_start_mb": r0,
+            "rss_peak_mb": max(r for _, _, r in self.samples),
+            "rss_end_mb": r1,
+        }
+
+
+def simulated_user(orchestrator, queries, turns, think_s, rng, results, lock):
+    """Une session : turns questions, historique gardé comme st.session_state.messages"""
+    history = []
+    for turn in range(turns):
+        if turn:
+            time.sleep(rng.expovariate(1.0 / think_s) if think_s > 0 else 0)
+        query = rng.choice(queries)
+        history.append({"role": "user", "content": query})
+
+        start = time.perf_counter()
+        first = None
+        parts = []
+        for chunk in orchestrator.route_stream(query, {"k": 5}):
+            if chunk.get("chunk"):
+                if first is None:
+                    first = time.perf_counter()
+                parts.append(chunk["chunk"])
+        end = time.perf_counter()
+
+        history.append({"role": "assistant", "content": "".join(parts)})
+        with lock:
+            results.append((((first or end) - start) * 1000, (end - start) * 1000))
+    return history
+
+
+def run_level(session_factory, queries, users, turns, think_s, seed):
+    """
+    Un palier de users sessions simultanées
+
+    Args:
+        session_factory: Fonction appelée au début de chaque session, qui retourne
+                         l'orchestrateur de la session
+    """
+    results, lock = [], threading.Lock()
+    # Etat de chaque session (orchestrateur, historique) gardé jusqu'à la fin du palier
+    sessions = [None] * users
+
+    def run(i):
+        rng = random.Random(seed * 100003 + i)
+        orchestrator = session_factory()
+        sessions[i] = (orchestrator, simulated_user(orchestrator, queries, turns, think_s, rng, results, lock))
+
+    threads = [threading.Thread(target=run, args=(i,), name=f"user-{i}") for i in range(users)]
+    gc.collect()
+    with ResourceMonitor() as monitor:
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall_s = time.perf_counter() - start
+
+    resources = monitor.summary()
+    return {
+        "users": users,
+        "responses": len(results),
+        "wall_s": wall_s,
+        "responses_per_s": len(results) / wall_s,
+        "ttft": summarize([r[0] for r in results]),
+        "total": summarize([r[1] for r in results]),
+        **resources,
+        # Sessions (et leurs agents en mode per-user) encore en mémoire au pic
+        "rss_per_session_mb": max(0.0, resources["rss_peak_mb"] - resources["rss_start_mb"]) / users,
+    }
+
+
+def capacity_report(levels, baseline_mb, args):
+    """Plus grand palier acceptable et nombre de sessions que tient la mémoire de l'instance"""
+    cpu_limit = args.vcpu * CPU_SATURATION
+    for level in levels:
+        reasons = []
+        if level["ttft"]["p95_ms"] > args.slo_ttft_p95 * 1000:
+            reasons.append("latence")
+        if level["cores_peak"] > cpu_limit:
+            reasons.append("cpu")
+        if level["rss_peak_mb"] > args.memory_mb:
+            reasons.append("mémoire")
+        level["limits"] = reasons
+
+    first_failing = next((level for level in levels if level["limits"]), None)
+    passing = levels[:levels.index(first_failing)] if first_failing else levels
+
+    # Estimation la moins bruitée : palier le plus chargé
+    growth = levels[-1]["rss_per_session_mb"] if levels else 0.0
+    memory_sessions = int((args.memory_mb - baseline_mb) / growth) if growth > 0 else None
+
+    return {
+        "vcpu": args.vcpu,
+        "memory_mb": args.memory_mb,
+        "slo_ttft_p95_s": args.slo_ttft_p95,
+        "baseline_rss_mb": baseline_mb,
+        "max_users_within_slo": passing[-1]["users"] if passing else 0,
+        "first_failing_users": first_failing["users"] if first_failing else None,
+        "limited_by": first_failing["limits"] if first_failing else [],
+        "rss_per_session_mb": growth,
+        "memory_bound_sessions": memory_sessions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16, 32, 64], help="Paliers d'utilisateurs simultanés")
+    parser.add_argument("--turns", type=int, default=3, help="Questions par session")
+    parser.add_argument("--think", type=float, default=2.0, help="Temps de réflexion moyen entre deux messages (s)")
+    parser.add_argument("--ttft", type=float, default=0.5, help="Délai du stub LLM avant le premier token (s)")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Tokens émis par seconde")
+    parser.add_argument("--tokens", type=int, default=150, help="Tokens par réponse")
+    parser.add_argument("--vcpu", type=float, default=2.0)
+    parser.add_argument("--memory-mb", type=float, default=2048.0)
+    parser.add_argument("--slo-ttft-p95", type=float, default=2.0, help="Premier token au p95 (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sessions", choices=["per-user", "shared", "both"], default="per-user",
+                        help="Un orchestrateur par utilisateur (comme Streamlit) ou un seul partagé")
+    args = parser.parse_args()
+
+    llm = LLMClient(StubLLMBackend(
+        ttft_s=args.ttft, tokens=args.tokens, token_interval_s=1.0 / args.token_rate, seed=args.seed
+    ))
+    # Modèle d'embedding, index et classifieur chargés, une réponse complète hors mesure
+    shared, _ = build_offline_orchestrator(llm, contact=False)
+    queries = [q["query"] for q in load_eval_queries() if q["expected_type"] == "rag"]
+    for _ in shared.route_stream(queries[0]):
+        pass
+    gc.collect()
+    baseline_mb = rss_mb()
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"Mémoire après chargement : {baseline_mb:.0f} Mo | {cpus} cœurs disponibles (instance cible : {args.vcpu:g} vCPU)")
+    if cpus < args.vcpu:
+        print("  Attention : moins de cœurs que l'instance cible, la saturation CPU sera atteinte plus tôt")
+
+    factories = {
+        # Comme initialize_agents : orchestrateur, agent RAG et agent de contact par session
+        "per-user": lambda: build_offline_orchestrator(llm, contact=True)[0],
+        "shared": lambda: shared,
+    }
+    modes = ["per-user", "shared"] if args.sessions == "both" else [args.sessions]
+
+    report = {
+        "config": {
+            "turns": args.turns, "think_s": args.think, "seed": args.seed, "cpus_available": cpus,
+            "llm": {"ttft_s": args.ttft, "token_rate": args.token_rate, "tokens": args.tokens},
+        },
+        "modes": {},
+    }
+    for mode in modes:
+        print(f"\n=== Sessions {mode} ===")
+        levels = []
+        for users in sorted(set(args.users)):
+            level = run_level(factories[mode], queries, users, args.turns, args.think, args.seed)
+            gc.collect()
+            levels.append(level)
+            print(f"\n{users} utilisateur(s) : {level['responses_per_s']:.2f} réponses/s | "
+                  f"CPU {level['cores_mean']:.2f} cœurs (pic {level['cores_peak']:.2f}) | "
+                  f"RSS pic {level['rss_peak_mb']:.0f} Mo (+{level['rss_per_session_mb']:.2f} Mo/session)")
+            print("  " + format_summary("Premier token", level["ttft"]))
+            print("  " + format_summary("Total", level["total"]))
+
+        capacity = capacity_report(levels, baseline_mb, args)
+        print(f"\nCapacité d'une instance, sessions {mode} ({args.vcpu:g} vCPU, {args.memory_mb:.0f} Mo, "
+              f"premier token p95 <= {args.slo_ttft_p95:g} s) :")
+        print(f"  {capacity['max_users_within_slo']} utilisateurs simultanés tenus")
+        if capacity["first_failing_users"] is not None:
+            print(f"  échec à {capacity['first_failing_users']} utilisateurs : {', '.join(capacity['limited_by'])}")
+        else:
+            print("  aucun palier en échec : augmenter --users pour trouver la limite")
+        if capacity["memory_bound_sessions"] is not None:
+            print(f"  mémoire : ~{capacity['memory_bound_sessions']} sessions ({capacity['rss_per_session_mb']:.2f} Mo par session)")
+        report["modes"][mode] = {"levels": levels, "capacity": capacity}
+
+    print(f"\nRésultats: {save_results('load_test', report)}")
+
+
+if __name__ == "__main__":
+    main()
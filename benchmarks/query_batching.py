@@ -0,0 +1,90 @@
+"""
+Débit et latence de l'encodage + recherche FAISS avec et sans regroupement en micro-lots
+
+Pour chaque nombre de clients simultanés, chaque client enchaîne --requests
+recherches (FaissRAGGemini._search : embedding de la question puis recherche
+dans les deux index). Le mode "single" encode et cherche chaque requête seule,
+le mode "batched" passe par MicroBatcher.
+
+Usage:
+    python benchmarks/query_batching.py --clients 1 8 32 --requests 50
+"""
+import argparse
+import os
+import threading
+import time
+
+from common import setup_paths, summarize, format_summary, save_results, load_eval_queries, RAG_DIR
+
+setup_paths()
+os.environ.setdefault("VERTEX_PROJECT", "benchmark")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from batching import MicroBatcher, QUERY_BATCH_SIZE, QUERY_BATCH_WAIT_MS
+
+
+def run_clients(rag, queries, clients, requests_per_client):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        local = []
+        for i in range(requests_per_client):
+            query = queries[(offset + i) % len(queries)]
+            start = time.perf_counter()
+            rag._search(query, 5)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - start
+    return latencies, wall_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=50, help="Recherches par client")
+    parser.add_argument("--batch-size", type=int, default=max(QUERY_BATCH_SIZE, 2))
+    parser.add_argument("--wait-ms", type=float, default=QUERY_BATCH_WAIT_MS)
+    args = parser.parse_args()
+
+    os.chdir(RAG_DIR)
+    from rag import FaissRAGGemini, _search_pending
+
+    rag = FaissRAGGemini(warmup=False)
+    rag.warm_up()
+    queries = [q["query"] for q in load_eval_queries()]
+    batcher = MicroBatcher(_search_pending, max_batch=args.batch_size, max_wait_ms=args.wait_ms, name="bench-batcher")
+
+    report = {"batch_size": args.batch_size, "wait_ms": args.wait_ms, "requests_per_client": args.requests, "clients": {}}
+    for clients in args.clients:
+        level = {}
+        for mode in ("single", "batched"):
+            rag._batcher = batcher if mode == "batched" else None
+            batcher.batch_sizes.clear()
+
+            latencies, wall_s = run_clients(rag, queries, clients, args.requests)
+            level[mode] = {
+                "queries_per_s": len(latencies) / wall_s,
+                "latency": summarize(latencies),
+            }
+            if mode == "batched" and batcher.batch_sizes:
+                level[mode]["mean_batch_size"] = sum(batcher.batch_sizes) / len(batcher.batch_sizes)
+
+            print(f"\n{clients} client(s), {mode}: {level[mode]['queries_per_s']:.1f} requêtes/s"
+                  + (f", lot moyen {level[mode]['mean_batch_size']:.1f}" if "mean_batch_size" in level[mode] else ""))
+            print("  " + format_summary("Latence", level[mode]["latency"]))
+        report["clients"][str(clients)] = level
+
+    print(f"\nRésultats: {save_results('query_batching', report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Qualité et vitesse du retrieve sur des jugements de pertinence annotés
+
+Pour chaque configuration (découpage --chunk-size/--overlap, format d'index
+--index-type, backend d'embedding --backend ; produit cartésien des valeurs
+données), reconstruit l'index sur le corpus livré puis mesure, sur les
+questions de --judgments (benchmarks/data/relevance_judgments.json par défaut) :
+- recall@k, MRR et nDCG@k (pertinence graduée 0/1/2) au niveau du document :
+  les chunks retrouvés (--depth) sont ramenés à la liste des documents dans
+  l'ordre de leur meilleur chunk
+- p50/p95 de l'encodage de la question et de la recherche FAISS (--repeat passages)
+
+La configuration "shipped" évalue les index livrés tels que rag.py les charge
+(index des pages et index des PDFs interrogés séparément puis fusionnés par score).
+
+Corpus des configurations reconstruites : pages de Back/app/rag/data/scraped_data.json
+et PDFs du mapping data/ (texte reconstitué à partir des chunks livrés).
+
+Usage:
+    python benchmarks/retrieval_quality.py
+    python benchmarks/retrieval_quality.py --chunk-size 500 1000 1500 --index-type flat sq8 --backend torch onnx
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import time
+import unicodedata
+
+from common import setup_paths, summarize, save_results, DATA_DIR, PROJECT_ROOT, RAG_DIR
+
+setup_paths()
+
+import numpy as np
+from chunker import chunk_documents
+from embeddings import get_embedding_backend, EMBEDDING_BACKEND
+from vector_index import build_faiss_index, load_faiss_index, INDEX_TYPES
+
+JUDGMENTS_PATH = os.path.join(DATA_DIR, "relevance_judgments.json")
+SCRAPED_PATH = os.path.join(RAG_DIR, "data", "scraped_data.json")
+SHIPPED_INDEXES = [
+    (os.path.join(RAG_DIR, "data", "faiss_index.bin"), os.path.join(RAG_DIR, "data", "faiss_mapping.json")),
+    (os.path.join(PROJECT_ROOT, "data", "faiss_index.bin"), os.path.join(PROJECT_ROOT, "data", "faiss_mapping.json")),
+]
+# Mêmes valeurs que indexer.py
+MIN_CHUNK_SIZE = 150
+
+
+def doc_id(url: str) -> str:
+    """Identifiant de document comparable (les noms de PDF uploadés depuis macOS sont en NFD)"""
+    return unicodedata.normalize("NFC", url)
+
+
+def load_judgments(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        (item["query"], {doc_id(url): grade for url, grade in item["relevant"].items() if grade > 0})
+        for item in data["judgments"]
+    ]
+
+
+def load_corpus():
+    """Documents {url: texte} : pages scrapées et PDFs reconstitués depuis leurs chunks"""
+    with open(SCRAPED_PATH, "r", encoding="utf-8") as f:
+        documents = dict(json.load(f))
+
+    _, pdf_mapping = SHIPPED_INDEXES[1]
+    if os.path.exists(pdf_mapping):
+        with open(pdf_mapping, "r", encoding="utf-8") as f:
+            mapping = json.load(f)
+        pdfs = {}
+        for url, text in zip(mapping["urls"], mapping["texts"]):
+            pdfs.setdefault(url, []).append(text)
+        documents.update({url: " ".join(texts) for url, texts in pdfs.items()})
+    return documents
+
+
+def ranked_documents(hits):
+    """Documents dans l'ordre de leur meilleur chunk ; hits = [(score, url)]"""
+    ranked, seen = [], set()
+    for _, url in sorted(hits, key=lambda hit: hit[0], reverse=True):
+        key = doc_id(url)
+        if key not in seen:
+            seen.add(key)
+            ranked.append(key)
+    return ranked
+
+
+def score_ranking(ranked, relevant, ks):
+    """recall@k et nDCG@k pour chaque k, rang réciproque du premier document pertinent"""
+    scores = {}
+    ideal = sorted(relevant.values(), reverse=True)
+    for k in ks:
+        found = [d for d in ranked[:k] if d in relevant]
+        dcg = sum((2 ** relevant[d] - 1) / math.log2(rank + 2) for rank, d in enumerate(ranked[:k]) if d in relevant)
+        idcg = sum((2 ** grade - 1) / math.log2(rank + 2) for rank, grade in enumerate(ideal[:k]))
+        scores[f"recall@{k}"] = len(found) / len(relevant)
+        scores[f"ndcg@{k}"] = dcg / idcg if idcg else 0.0
+    first = next((rank for rank, d in enumerate(ranked) if d in relevant), None)
+    scores["mrr"] = 1.0 / (first + 1) if first is not None else 0.0
+    return scores
+
+
+def evaluate(name, config, backend, search, judgments, ks, depth, repeat):
+    """
+    Mesure une configuration
+
+    Args:
+        search: Fonction (vecteur de la question (1, d), depth) -> [(score, url)]
+
+    Returns:
+        Métriques moyennes, latences et détail par question
+    """
+    per_query, encode_ms, search_ms = [], [], []
+    for pass_index in range(repeat):
+        for query, relevant in judgments:
+            start = time.perf_counter()
+            q_emb = backend.encode([query])
+            encode_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            hits = search(q_emb, depth)
+            search_ms.append((time.perf_counter() - start) * 1000)
+
+            if pass_index == 0:
+                ranked = ranked_documents(hits)
+                per_query.append({"query": query, "top": ranked[:max(ks)], **score_ranking(ranked, relevant, ks)})
+
+    metrics = {key: sum(q[key] for q in per_query) / len(per_query) for key in per_query[0] if key not in ("query", "top")}
+    return {
+        "name": name,
+        "config": config,
+        "metrics": metrics,
+        "encode_ms": summarize(encode_ms),
+        "search_ms": summarize(search_ms),
+        "queries": per_query,
+    }
+
+
+def shipped_search():
+    """Recherche dans les index livrés, fusionnée par score comme FaissRAGGemini.retrieve"""
+    indexes = []
+    for index_path, mapping_path in SHIPPED_INDEXES:
+        if os.path.exists(index_path) and os.path.exists(mapping_path):
+            with open(mapping_path, "r", encoding="utf-8") as f:
+                indexes.append((load_faiss_index(index_path), json.load(f)["urls"]))
+
+    def search(q_emb, depth):
+        hits = []
+        for index, urls in indexes:
+            scores, ids = index.search(q_emb, min(depth, index.ntotal))
+            hits.extend((float(s), urls[i]) for s, i in zip(scores[0], ids[0]) if i != -1)
+        return hits
+
+    return search, sum(index.ntotal for index, _ in indexes)
+
+
+def rebuilt_search(index, urls):
+    def search(q_emb, depth):
+        scores, ids = index.search(q_emb, min(depth, index.ntotal))
+        return [(float(s), urls[i]) for s, i in zip(scores[0], ids[0]) if i != -1]
+    return search
+
+
+def pareto_front(results, quality_key):
+    """Configurations qu'aucune autre ne bat à la fois en qualité et en latence p95"""
+    def cost(r):
+        return r["encode_ms"]["p95_ms"] + r["search_ms"]["p95_ms"]
+
+    front = []
+    for r in results:
+        dominated = any(
+            o is not r
+            and o["metrics"][quality_key] >= r["metrics"][quality_key] and cost(o) <= cost(r)
+            and (o["metrics"][quality_key] > r["metrics"][quality_key] or cost(o) < cost(r))
+            for o in results
+        )
+        if not dominated:
+            front.append(r["name"])
+    return front
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--judgments", default=JUDGMENTS_PATH)
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[1000])
+    parser.add_argument("--overlap", type=int, nargs="+", default=[100])
+    parser.add_argument("--index-type", nargs="+", default=["flat"], choices=INDEX_TYPES)
+    parser.add_argument("--backend", nargs="+", default=[EMBEDDING_BACKEND], choices=["torch", "onnx"])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--depth", type=int, default=30, help="Chunks récupérés avant regroupement par document")
+    parser.add_argument("--repeat", type=int, default=3, help="Passages pour les mesures de latence")
+    parser.add_argument("--no-shipped", action="store_true", help="Ne pas évaluer les index livrés")
+    args = parser.parse_args()
+
+    judgments = load_judgments(args.judgments)
+    ks = sorted(set(args.k))
+    print(f"{len(judgments)} questions annotées, k={ks}, profondeur {args.depth} chunks")
+
+    results = []
+    if not args.no_shipped:
+        backend = get_embedding_backend(EMBEDDING_BACKEND)
+        search, total = shipped_search()
+        results.append(evaluate(
+            "shipped", {"backend": backend.name, "chunks": total},
+            backend, search, judgments, ks, args.depth, args.repeat
+        ))
+
+    documents = load_corpus()
+    for chunk_size, overlap in itertools.product(args.chunk_size, args.overlap):
+        urls, chunks, _ = chunk_documents(documents, chunk_size=chunk_size, overlap=overlap, min_chunk_size=MIN_CHUNK_SIZE)
+        evaluated_backends = set()
+        for backend_name in args.backend:
+            backend = get_embedding_backend(backend_name)
+            # onnx indisponible : get_embedding_backend retombe sur torch
+            if backend.name in evaluated_backends:
+                continue
+            evaluated_backends.add(backend.name)
+            start = time.perf_counter()
+            embeddings = backend.encode(chunks)
+            embed_s = time.perf_counter() - start
+            for index_type in args.index_type:
+                index = build_faiss_index(np.asarray(embeddings, dtype="float32"), index_type)
+                name = f"c{chunk_size}-o{overlap}-{backend.name}-{index_type}"
+                config = {
+                    "chunk_size": chunk_size, "overlap": overlap, "backend": backend.name,
+                    "index_type": index_type, "chunks": len(chunks), "corpus_embed_s": embed_s,
+                }
+                results.append(evaluate(name, config, backend, rebuilt_search(index, urls), judgments, ks, args.depth, args.repeat))
+
+    k_main = 5 if 5 in ks else ks[-1]
+    front = pareto_front(results, f"ndcg@{k_main}")
+    print(f"\n{'configuration':<28}{'chunks':>7}{f'R@{k_main}':>8}{'MRR':>7}{f'nDCG@{k_main}':>9}"
+          f"{'enc p50':>9}{'enc p95':>9}{'rech p50':>10}{'rech p95':>10}")
+    for r in results:
+        m = r["metrics"]
+        print(f"{r['name']:<28}{r['config']['chunks']:>7}{m[f'recall@{k_main}']:>8.3f}{m['mrr']:>7.3f}{m[f'ndcg@{k_main}']:>9.3f}"
+              f"{r['encode_ms']['p50_ms']:>9.2f}{r['encode_ms']['p95_ms']:>9.2f}"
+              f"{r['search_ms']['p50_ms']:>10.3f}{r['search_ms']['p95_ms']:>10.3f}"
+              + ("  *" if r["name"] in front else ""))
+    print(f"\n* front de Pareto (nDCG@{k_main} / latence p95 encodage + recherche)")
+
+    report = {
+        "judgments": os.path.relpath(args.judgments, PROJECT_ROOT),
+        "questions": len(judgments),
+        "k": ks,
+        "depth": args.depth,
+        "pareto": front,
+        "configs": results,
+    }
+    print(f"\nRésultats: {save_results('retrieval_quality', report)}")
+
+
+if __name__ == "__main__":
+    main()
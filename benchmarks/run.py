@@ -0,0 +1,283 @@
+"""
+Suite de benchmarks hors ligne du pipeline complet (orchestrateur + RAG + stub LLM)
+
+Rejoue les questions d'évaluation (ou --queries) à travers
+OrchestratorAgent.route puis route_stream, sur les index livrés, avec le LLM
+local déterministe (llm_client.StubLLMBackend, --ttft/--tokens/--token-interval)
+et sans accès réseau. Mesure :
+- latence de bout en bout de route et route_stream (premier token et total)
+- latence par étape (traces de telemetry.py : intent, embed, search, merge,
+  extractive, prompt_build, fallback_scrape, llm_ttft, llm_total)
+- débit en requêtes/s, en série pour route et avec --concurrency sessions
+  pour route_stream
+- mémoire résidente (après chargement, en fin de suite)
+- recall@k de retrieve() contre une recherche exacte (float32) sur les mêmes index
+
+Les résultats (avec le commit courant) sont enregistrés dans benchmarks/results/.
+--compare compare à un résultat précédent et sort en erreur si une métrique se
+dégrade au-delà de --tolerance.
+
+Usage:
+    python benchmarks/run.py --rounds 2 --concurrency 4
+    python benchmarks/run.py --compare benchmarks/results/suite_20250101_120000.json
+    python benchmarks/run.py --compare ancien.json nouveau.json   # sans relancer la suite
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import (
+    setup_paths, summarize, format_summary, save_results, load_eval_queries,
+    rss_mb, build_offline_orchestrator,
+)
+
+setup_paths()
+os.environ.setdefault("VERTEX_PROJECT", "benchmark")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+# (chemin dans le rapport, True si une valeur plus grande est meilleure)
+COMPARED_METRICS = [
+    ("route.latency.p50_ms", False),
+    ("route.latency.p95_ms", False),
+    ("route.queries_per_s", True),
+    ("route_stream.ttft.p50_ms", False),
+    ("route_stream.ttft.p95_ms", False),
+    ("route_stream.latency.p95_ms", False),
+    ("route_stream.queries_per_s", True),
+    ("recall.recall_at_k", True),
+    ("memory.rss_after_load_mb", False),
+    ("memory.rss_end_mb", False),
+]
+
+
+def stage_percentiles():
+    """p50/p95/p99 (ms) de chaque étape enregistrée par telemetry depuis le dernier reset"""
+    from telemetry import metrics_json
+
+    return {
+        h["labels"]["stage"]: {key: h[key] for key in ("count", "p50_ms", "p95_ms", "p99_ms")}
+        for h in metrics_json()["histograms"]
+        if h["name"] == "stage"
+    }
+
+
+def run_route(orchestrator, queries, rounds, k):
+    from telemetry import registry
+
+    registry.reset()
+    latencies, agents = [], {}
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            t0 = time.perf_counter()
+            result = orchestrator.route(query, {"k": k})
+            latencies.append((time.perf_counter() - t0) * 1000)
+            agent = result.get("agent_used", "none")
+            agents[agent] = agents.get(agent, 0) + 1
+    wall_s = time.perf_counter() - start
+
+    return {
+        "queries": len(latencies),
+        "queries_per_s": len(latencies) / wall_s,
+        "latency": summarize(latencies),
+        "agents": agents,
+        "stages": stage_percentiles(),
+    }
+
+
+def run_stream(orchestrator, queries, rounds, k, concurrency):
+    from telemetry import registry
+
+    registry.reset()
+    ttfts, latencies = [], []
+    lock = threading.Lock()
+
+    def session(query):
+        t0 = time.perf_counter()
+        first = None
+        for chunk in orchestrator.route_stream(query, {"k": k}):
+            if first is None and chunk.get("chunk"):
+                first = time.perf_counter()
+        end = time.perf_counter()
+        with lock:
+            ttfts.append(((first or end) - t0) * 1000)
+            latencies.append((end - t0) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(session, [query for _ in range(rounds) for query in queries]))
+    wall_s = time.perf_counter() - start
+
+    return {
+        "queries": len(latencies),
+        "concurrency": concurrency,
+        "queries_per_s": len(latencies) / wall_s,
+        "ttft": summarize(ttfts),
+        "latency": summarize(latencies),
+        "stages": stage_percentiles(),
+    }
+
+
+def exact_neighbours(rag, query, k):
+    """k meilleurs chunks (source, id) par recherche exacte sur les vecteurs des index livrés"""
+    import faiss
+    import numpy as np
+
+    if not hasattr(rag, "_exact_indexes"):
+        exact = []
+        for index, source in ((rag.rag_index, "URL"), (rag.pdf_index, "PDF")):
+            if index is None or index.ntotal == 0:
+                continue
+            flat = faiss.IndexFlatIP(index.d)
+            flat.add(index.reconstruct_n(0, index.ntotal).astype("float32"))
+            exact.append((flat, source))
+        rag._exact_indexes = exact
+
+    q_emb = np.asarray(rag.model.encode([query]), dtype="float32")
+    found = []
+    for flat, source in rag._exact_indexes:
+        scores, ids = flat.search(q_emb, min(k, flat.ntotal))
+        found.extend((float(s), (source, int(i))) for s, i in zip(scores[0], ids[0]) if i != -1)
+    found.sort(key=lambda item: item[0], reverse=True)
+    return [key for _, key in found[:k]]
+
+
+def run_recall(rag, queries, k):
+    """recall@k de retrieve() (index stockés, batching) contre la recherche exacte"""
+    per_query = []
+    for query in queries:
+        expected = exact_neighbours(rag, query, k)
+        if not expected:
+            continue
+        retrieved = {(r["source"], r["chunk_id"]) for r in rag.retrieve(query, k=k)}
+        per_query.append(len(retrieved.intersection(expected)) / len(expected))
+
+    return {
+        "k": k,
+        "queries": len(per_query),
+        "recall_at_k": sum(per_query) / len(per_query) if per_query else 0.0,
+        "min_recall": min(per_query) if per_query else 0.0,
+    }
+
+
+def lookup(report, path):
+    value = report
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(baseline, current, tolerance):
+    """
+    Compare deux rapports de la suite
+
+    Returns:
+        Liste des métriques dégradées au-delà de la tolérance
+    """
+    print(f"\nComparaison {baseline.get('commit', '?')} ({baseline.get('created_at', '?')}) "
+          f"-> {current.get('commit', '?')} ({current.get('created_at', '?')})")
+    regressions = []
+    for path, higher_is_better in COMPARED_METRICS:
+        old, new = lookup(baseline, path), lookup(current, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance:
+            flag = "  ✗ régression"
+            regressions.append({"metric": path, "baseline": old, "current": new, "change": change})
+        elif worse < -tolerance:
+            flag = "  ✓"
+        print(f"  {path:<30} {old:>10.3f} -> {new:>10.3f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", help="Fichier JSON {\"queries\": [{\"query\": ...}]} (défaut : questions d'évaluation)")
+    parser.add_argument("--rounds", type=int, default=2, help="Passages sur la liste de questions")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4, help="Sessions simultanées pour route_stream")
+    parser.add_argument("--ttft", type=float, default=0.2, help="Délai du stub LLM avant le premier token (s)")
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--token-interval", type=float, default=0.01)
+    parser.add_argument("--compare", nargs="+", metavar="RESULTAT", help="Résultat de référence (et résultat à comparer)")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Dégradation relative tolérée")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare prend un ou deux fichiers")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare[0], "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[1], "r", encoding="utf-8") as f:
+            current = json.load(f)
+        sys.exit(1 if compare(baseline, current, args.tolerance) else 0)
+
+    from llm_client import LLMClient, StubLLMBackend
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            items = json.load(f)["queries"]
+    else:
+        items = load_eval_queries()
+    queries = [item["query"] for item in items]
+
+    rss_start = rss_mb()
+    llm = LLMClient(StubLLMBackend(ttft_s=args.ttft, tokens=args.tokens, token_interval_s=args.token_interval, seed=0))
+    orchestrator, rag = build_offline_orchestrator(llm)
+    rss_loaded = rss_mb()
+
+    report = {
+        "config": {
+            "queries": len(queries), "rounds": args.rounds, "k": args.k, "concurrency": args.concurrency,
+            "llm": {"ttft_s": args.ttft, "tokens": args.tokens, "token_interval_s": args.token_interval},
+            "env": {key: os.getenv(key) for key in (
+                "EMBEDDING_BACKEND", "FAISS_INDEX_TYPE", "QUERY_BATCH_SIZE", "SPECULATIVE_RETRIEVAL", "EXTRACTIVE_MIN_CONFIDENCE",
+            ) if os.getenv(key) is not None},
+        },
+    }
+
+    print(f"\nroute : {len(queries)} questions x {args.rounds}")
+    report["route"] = run_route(orchestrator, queries, args.rounds, args.k)
+    print(f"  {report['route']['queries_per_s']:.1f} requêtes/s | agents {report['route']['agents']}")
+    print("  " + format_summary("Latence", report["route"]["latency"]))
+
+    print(f"\nroute_stream : {args.concurrency} sessions simultanées")
+    report["route_stream"] = run_stream(orchestrator, queries, args.rounds, args.k, args.concurrency)
+    print(f"  {report['route_stream']['queries_per_s']:.1f} requêtes/s")
+    print("  " + format_summary("Premier token", report["route_stream"]["ttft"]))
+    print("  " + format_summary("Total", report["route_stream"]["latency"]))
+
+    print("\nÉtapes (route) :")
+    for stage, values in report["route"]["stages"].items():
+        print(f"  {stage:<16} n={values['count']:<5} p50 {values['p50_ms']:.1f} ms | p95 {values['p95_ms']:.1f} ms")
+
+    report["recall"] = run_recall(rag, queries, args.k)
+    print(f"\nrecall@{args.k} vs recherche exacte : {report['recall']['recall_at_k']:.3f} "
+          f"(min {report['recall']['min_recall']:.2f})")
+
+    report["memory"] = {"rss_start_mb": rss_start, "rss_after_load_mb": rss_loaded, "rss_end_mb": rss_mb()}
+    print(f"Mémoire : {rss_loaded:.0f} Mo après chargement, {report['memory']['rss_end_mb']:.0f} Mo en fin de suite")
+
+    path = save_results("suite", report)
+    print(f"\nRésultats: {path}")
+
+    if baseline is not None:
+        with open(path, "r", encoding="utf-8") as f:
+            current = json.load(f)
+        sys.exit(1 if compare(baseline, current, args.tolerance) else 0)
+
+
+if __name__ == "__main__":
+    main()
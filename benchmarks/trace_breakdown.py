@@ -0,0 +1,64 @@
+"""
+Décomposition de la latence par étape (traces de telemetry.py)
+
+Envoie les questions du notebook d'évaluation à l'orchestrateur (route_stream,
+comme l'interface Streamlit) avec le stub LLM (--ttft s avant le premier
+token) ; la recherche FAISS et l'embedding sont réels. Affiche ensuite les
+p50/p95/p99 de chaque étape enregistrés par le registre de métriques
+(intent, embed, search, merge, extractive, prompt_build, fallback_scrape,
+llm_ttft, llm_total) et la durée totale par agent.
+
+Usage:
+    python benchmarks/trace_breakdown.py --rounds 3 --ttft 0.3
+"""
+import argparse
+import os
+
+from common import setup_paths, save_results, load_eval_queries
+
+setup_paths()
+os.environ.setdefault("VERTEX_PROJECT", "benchmark")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from orchestrator import OrchestratorAgent
+from rag_agent import RAGAgent
+from llm_client import LLMClient, StubLLMBackend
+from telemetry import metrics_json, recent_traces, registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--ttft", type=float, default=0.3, help="Délai simulé avant le premier token (s)")
+    args = parser.parse_args()
+
+    llm = LLMClient(StubLLMBackend(ttft_s=args.ttft))
+    orchestrator = OrchestratorAgent()
+    orchestrator.llm = llm
+    rag_agent = RAGAgent()
+    if not rag_agent.rag_system:
+        raise SystemExit("RAG indisponible (index FAISS ?)")
+    rag_agent.rag_system.llm = llm
+    orchestrator.register_agent(rag_agent)
+
+    queries = load_eval_queries()
+    orchestrator.route(queries[0]["query"])  # chargement du modèle d'embedding hors mesure
+    registry.reset()
+
+    for _ in range(args.rounds):
+        for item in queries:
+            for _ in orchestrator.route_stream(item["query"]):
+                pass
+
+    metrics = metrics_json()
+    print(f"{'étape':<18}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for h in metrics["histograms"]:
+        label = h["labels"].get("stage") or f"{h['name']} {h['labels'].get('agent', '')}".strip()
+        print(f"{label:<18}{h['count']:>6}{h['p50_ms']:>10.1f}{h['p95_ms']:>10.1f}{h['p99_ms']:>10.1f}")
+
+    report = {"rounds": args.rounds, "ttft_s": args.ttft, "metrics": metrics, "traces": recent_traces(50)}
+    print(f"\nRésultats: {save_results('trace_breakdown', report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,8 @@ ARCHIVE_DIR = DATA_DIR / "archive"
 FAISS_INDEX_PATH = DATA_DIR / "faiss_index.bin"
 FAISS_MAPPING_PATH = DATA_DIR / "faiss_mapping.json"
 DOCUMENTS_METADATA_PATH = DATA_DIR / "documents_metadata.json"
-LEADS_FILE_PATH = LEADS_DATA_DIR / "leads.json"
+LEADS_FILE_PATH = LEADS_DATA_DIR / "leads.json"  # Ancien format, migré vers LEADS_DB_PATH
+LEADS_DB_PATH = Path(os.getenv("LEADS_DB_PATH", str(LEADS_DATA_DIR / "leads.db")))
 PROCESSED_DOCUMENTS_PATH = DATA_DIR / "processed_documents.json"
 
 # Scraped data
@@ -66,6 +67,7 @@ def get_admin_paths():
     return {
         "leads_dir": str(LEADS_DATA_DIR),
         "leads_file": str(LEADS_FILE_PATH),
+        "leads_db": str(LEADS_DB_PATH),
         "uploads_dir": str(UPLOADS_DIR),
         "documents_metadata": str(DOCUMENTS_METADATA_PATH),
         "processed_documents": str(PROCESSED_DOCUMENTS_PATH),
@@ -1,77 +1,154 @@
-"""Télécharge les données depuis Google Cloud Storage au démarrage."""
+"""Télécharge les données depuis Google Cloud Storage au démarrage.
+
+Les index et mappings (ensemble minimal pour servir) sont téléchargés en parallèle
+et vérifiés avant de rendre la main à Streamlit. Les autres fichiers et le modèle
+d'embedding continuent en arrière-plan dans un processus détaché ; un fichier
+marqueur signale au RAG que le modèle est en cours de téléchargement.
+"""
 import os
-from google.cloud import storage
-
-BUCKET_NAME = "esilv-chatbot-data"
-
-def download_from_gcs(bucket_name, source_blob_name, destination_file_name):
-    """Télécharge un fichier depuis GCS."""
-    os.makedirs(os.path.dirname(destination_file_name), exist_ok=True)
-    
-    # Si le fichier existe déjà, pas besoin de le télécharger
-    if os.path.exists(destination_file_name):
-        print(f"✓ {destination_file_name} existe déjà")
-        return
-    
-    try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(source_blob_name)
-        blob.download_to_filename(destination_file_name)
-        print(f"✓ Téléchargé {source_blob_name} vers {destination_file_name}")
-    except Exception as e:
-        print(f"✗ Erreur lors du téléchargement de {source_blob_name}: {e}")
-
-def download_directory_from_gcs(bucket_name, source_prefix, destination_dir):
-    """Télécharge un dossier complet depuis GCS."""
-    if os.path.exists(destination_dir) and os.listdir(destination_dir):
-        print(f"✓ {destination_dir} existe déjà")
-        return
-    
-    print(f"Téléchargement du dossier {source_prefix}...")
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Back", "app"))
+
+from cloud_sync import pull_files, get_default_backend
+
+# Téléchargements simultanés et nombre de tentatives par fichier
+MAX_WORKERS = int(os.getenv("BOOTSTRAP_MAX_WORKERS", "8"))
+MAX_ATTEMPTS = int(os.getenv("BOOTSTRAP_MAX_ATTEMPTS", "3"))
+
+# Ensemble minimal : l'application peut répondre dès que ces fichiers sont présents
+MINIMAL_FILES = {
+    "data/faiss_index.bin": "/app/data/faiss_index.bin",
+    "data/faiss_mapping.json": "/app/data/faiss_mapping.json",
+    "rag/faiss_index.bin": "/app/Back/app/rag/data/faiss_index.bin",
+    "rag/faiss_mapping.json": "/app/Back/app/rag/data/faiss_mapping.json",
+}
+
+# Fichiers non bloquants pour le démarrage
+BACKGROUND_FILES = {
+    "data/processed_documents.json": "/app/data/processed_documents.json",
+    "rag/scraped_data.json": "/app/Back/app/rag/data/scraped_data.json",
+    "rag/url_routes.npz": "/app/Back/app/rag/data/url_routes.npz",
+    "data/faiss_stats.json": "/app/data/faiss_stats.json",
+}
+
+MODEL_PREFIX = "model/86741b4e3f5cb7765a600d3a3d55a0f6a6cb443d/"
+MODEL_PATH = "/root/.cache/huggingface/hub/models--sentence-transformers--paraphrase-multilingual-MiniLM-L12-v2/snapshots/86741b4e3f5cb7765a600d3a3d55a0f6a6cb443d"
+# Présent tant que le modèle est en cours de téléchargement (contient le PID)
+MODEL_PENDING_MARKER = MODEL_PATH + ".downloading"
+
+
+def _report(statuses):
+    for source, status in statuses.items():
+        mark = "✓" if status in ("up-to-date", "downloaded") else "✗"
+        print(f"{mark} {source}: {status}")
+
+
+def download_files(files, backend, remote_info=None):
+    """
+    Télécharge des fichiers en parallèle avec vérification des checksums,
+    en réessayant ceux qui ont échoué
+
+    Returns:
+        Dictionnaire {nom distant: statut} des fichiers en échec (vide si tout est prêt)
+    """
+    pending = dict(files)
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            statuses = pull_files(pending, backend=backend, max_workers=MAX_WORKERS, remote_info=remote_info)
+        except Exception as e:
+            statuses = {name: f"error: {e}" for name in pending}
+
+        _report(statuses)
+        pending = {
+            name: path for name, path in pending.items()
+            if statuses.get(name) not in ("up-to-date", "downloaded")
+        }
+
+        if not pending:
+            return {}
+
+        if attempt < MAX_ATTEMPTS:
+            print(f"Nouvelle tentative pour {len(pending)} fichier(s)...")
+            time.sleep(attempt)
+
+    return {name: statuses.get(name) for name in pending}
+
+
+def download_model(backend):
+    """Télécharge le modèle d'embedding (fichiers absents ou périmés uniquement)."""
+    print(f"Téléchargement du modèle {MODEL_PREFIX}...")
     try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        blobs = bucket.list_blobs(prefix=source_prefix)
-        
-        for blob in blobs:
-            if blob.name.endswith('/'):
-                continue
-            
-            # Construire le chemin de destination
-            relative_path = blob.name[len(source_prefix):].lstrip('/')
-            destination_file = os.path.join(destination_dir, relative_path)
-            
-            os.makedirs(os.path.dirname(destination_file), exist_ok=True)
-            blob.download_to_filename(destination_file)
-            print(f"  ✓ {relative_path}")
-        
-        print(f"✓ Dossier {source_prefix} téléchargé")
+        # Le listing fournit le MD5 de chaque fichier et sert de manifeste
+        listing = {info["name"]: info for info in backend.list(MODEL_PREFIX)}
+        files = {
+            name: os.path.join(MODEL_PATH, *name[len(MODEL_PREFIX):].split("/"))
+            for name in listing
+        }
+        failed = download_files(files, backend, remote_info=listing)
+
+        if failed:
+            print(f"✗ Modèle incomplet ({len(failed)} fichier(s) en échec)")
+        else:
+            print(f"✓ Modèle prêt ({len(files)} fichiers)")
     except Exception as e:
-        print(f"✗ Erreur lors du téléchargement du dossier {source_prefix}: {e}")
+        print(f"✗ Erreur lors du téléchargement du modèle: {e}")
+    finally:
+        if os.path.exists(MODEL_PENDING_MARKER):
+            os.remove(MODEL_PENDING_MARKER)
+
+
+def download_background_data():
+    """Partie non bloquante du démarrage (processus détaché)."""
+    backend = get_default_backend()
+    download_files(BACKGROUND_FILES, backend)
+    download_model(backend)
+
+
+def start_background_download():
+    """Lance le téléchargement du modèle dans un processus détaché."""
+    os.makedirs(os.path.dirname(MODEL_PENDING_MARKER), exist_ok=True)
+
+    # Le marqueur existe avant le lancement : le RAG ne peut pas le manquer
+    with open(MODEL_PENDING_MARKER, "w") as f:
+        f.write("")
+
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--background"],
+        start_new_session=True
+    )
+
+    if os.path.exists(MODEL_PENDING_MARKER):
+        with open(MODEL_PENDING_MARKER, "w") as f:
+            f.write(str(process.pid))
+
+    print(f"Téléchargement du modèle poursuivi en arrière-plan (PID {process.pid})")
+
 
 def download_all_data():
-    """Télécharge toutes les données nécessaires."""
+    """Télécharge l'ensemble minimal puis délègue le reste à l'arrière-plan.
+
+    Returns:
+        True si l'ensemble minimal est présent et vérifié
+    """
     print("Téléchargement des données depuis Cloud Storage...")
-    
-    # Télécharger les fichiers de données
-    files_to_download = [
-        ("data/faiss_index.bin", "/app/data/faiss_index.bin"),
-        ("data/faiss_mapping.json", "/app/data/faiss_mapping.json"),
-        ("data/processed_documents.json", "/app/data/processed_documents.json"),
-        ("rag/faiss_index.bin", "/app/Back/app/rag/data/faiss_index.bin"),
-        ("rag/faiss_mapping.json", "/app/Back/app/rag/data/faiss_mapping.json"),
-        ("rag/scraped_data.json", "/app/Back/app/rag/data/scraped_data.json"),
-    ]
-    
-    for source, destination in files_to_download:
-        download_from_gcs(BUCKET_NAME, source, destination)
-    
-    # Télécharger le modèle d'embedding
-    model_path = "/root/.cache/huggingface/hub/models--sentence-transformers--paraphrase-multilingual-MiniLM-L12-v2/snapshots/86741b4e3f5cb7765a600d3a3d55a0f6a6cb443d"
-    download_directory_from_gcs(BUCKET_NAME, "model/86741b4e3f5cb7765a600d3a3d55a0f6a6cb443d/", model_path)
-    
-    print("✓ Toutes les données sont prêtes!")
+    start = time.time()
+
+    failed = download_files(MINIMAL_FILES, get_default_backend())
+    if failed:
+        print(f"✗ Index indisponibles après {MAX_ATTEMPTS} tentatives: {', '.join(failed)}")
+        return False
+
+    print(f"✓ Index prêts en {time.time() - start:.1f}s")
+    start_background_download()
+    return True
+
 
 if __name__ == "__main__":
-    download_all_data()
+    if "--background" in sys.argv:
+        download_background_data()
+    else:
+        sys.exit(0 if download_all_data() else 1)